@@ -0,0 +1,230 @@
+"""
+Batched graph insertions.
+
+`Batch` wraps a graph (`networkx.Graph` or `LayeredGraph`) and stages nodes
+and edges added through it. Staged nodes and edges can be read through the
+batch like the ones of the wrapped graph, `flush` inserts them into the wrapped
+graph with one `add_nodes_from` and one `add_edges_from` call. Removals and
+attribute changes of nodes of the wrapped graph are not staged.
+
+    batch = Batch(graph)
+    for match in matches:
+        production.rewrite(batch, match)
+    batch.flush()
+
+See also `Production.apply_many`.
+"""
+import itertools
+from collections.abc import Mapping
+
+
+class Batch:
+    """
+    Graph wrapper which stages added nodes and edges until `flush`.
+
+    Methods and attributes which are not overridden are forwarded to the wrapped graph.
+    """
+
+    # indexes of the wrapped graph do not know staged nodes,
+    # so utilities have to use the generic code paths
+    layer_nodes = None
+    nodes_at = None
+
+    def __init__(self, graph):
+        self.wrapped = graph
+        self.graph = graph.graph
+        self.staged_nodes = {}
+        self.staged_edges = {}
+        self.staged_adjacency = {}
+        self.nodes = BatchNodeView(self)
+        self.__wrapped_nodes = graph.nodes
+        self.__wrapped_layer_neighbors = getattr(graph, 'layer_neighbors', None)
+
+    def flush(self, graph=None):
+        """
+        Inserts staged nodes and edges into the wrapped graph, or into `graph`
+        (e.g. the graph wrapped by a committed `Transaction`).
+        """
+        if graph is None:
+            graph = self.wrapped
+        graph.add_nodes_from(self.staged_nodes.items())
+        graph.add_edges_from(self.staged_edges)
+        self.staged_nodes.clear()
+        self.staged_edges.clear()
+        self.staged_adjacency.clear()
+
+    # ---- forwarded ----
+
+    def __getattr__(self, name):
+        return getattr(self.wrapped, name)
+
+    def __iter__(self):
+        yield from self.wrapped
+        yield from self.staged_nodes
+
+    def __len__(self):
+        return len(self.wrapped) + len(self.staged_nodes)
+
+    def __contains__(self, n):
+        return n in self.staged_nodes or n in self.wrapped
+
+    # ---- nodes ----
+
+    def add_node(self, node_for_adding, **attr):
+        if node_for_adding in self.staged_nodes:
+            self.staged_nodes[node_for_adding].update(attr)
+        elif node_for_adding in self.wrapped:
+            self.wrapped.nodes[node_for_adding].update(attr)
+        else:
+            self.staged_nodes[node_for_adding] = attr
+
+    def add_nodes_from(self, nodes_for_adding, **attr):
+        for n in nodes_for_adding:
+            if isinstance(n, tuple) and len(n) == 2 and isinstance(n[1], Mapping):
+                (n, node_attr) = n
+                self.add_node(n, **attr)
+                self.add_node(n, **node_attr)
+            else:
+                self.add_node(n, **attr)
+
+    def remove_node(self, n):
+        for neighbor in self.staged_adjacency.pop(n, ()):
+            del self.staged_adjacency[neighbor][n]
+            self.__pop_staged_edge(n, neighbor)
+        if n in self.staged_nodes:
+            del self.staged_nodes[n]
+        else:
+            self.wrapped.remove_node(n)
+
+    def remove_nodes_from(self, nodes):
+        for n in list(nodes):
+            if n in self:
+                self.remove_node(n)
+
+    def neighbors(self, n):
+        staged = self.staged_adjacency.get(n, ())
+        if n in self.staged_nodes:
+            return iter(staged)
+        neighbors = self.wrapped.neighbors(n)
+        return itertools.chain(neighbors, staged) if staged else neighbors
+
+    def layer_neighbors(self, n, layer) -> list:
+        """
+        Returns neighbors of `n` on `layer`, like `get_neighbors_at`.
+        """
+        nodes = self.nodes
+        staged = [v for v in self.staged_adjacency.get(n, ()) if nodes[v]['layer'] == layer]
+        if n in self.staged_nodes:
+            return staged
+        if self.__wrapped_layer_neighbors is not None:
+            return self.__wrapped_layer_neighbors(n, layer) + staged
+        wrapped_nodes = self.__wrapped_nodes
+        return [v for v in self.wrapped.neighbors(n) if wrapped_nodes[v]['layer'] == layer] + staged
+
+    # ---- edges ----
+
+    def has_edge(self, u, v):
+        if v in self.staged_adjacency.get(u, ()):
+            return True
+        return u not in self.staged_nodes and v not in self.staged_nodes and self.wrapped.has_edge(u, v)
+
+    def add_edge(self, u_of_edge, v_of_edge):
+        staged_nodes = self.staged_nodes
+        u_staged = u_of_edge in staged_nodes
+        v_staged = v_of_edge in staged_nodes
+        if not u_staged and u_of_edge not in self.wrapped:
+            staged_nodes[u_of_edge] = {}
+            u_staged = True
+        if not v_staged and v_of_edge not in self.wrapped:
+            staged_nodes[v_of_edge] = {}
+            v_staged = True
+
+        adjacency = self.staged_adjacency
+        u_adjacency = adjacency.get(u_of_edge)
+        if u_adjacency is None:
+            u_adjacency = adjacency[u_of_edge] = {}
+        elif v_of_edge in u_adjacency:
+            return
+        if not u_staged and not v_staged and self.wrapped.has_edge(u_of_edge, v_of_edge):
+            return
+        self.staged_edges[(u_of_edge, v_of_edge)] = None
+        u_adjacency[v_of_edge] = None
+        adjacency.setdefault(v_of_edge, {})[u_of_edge] = None
+
+    def add_edges_from(self, ebunch_to_add):
+        for u, v in ebunch_to_add:
+            self.add_edge(u, v)
+
+    def remove_edge(self, u, v):
+        if v in self.staged_adjacency.get(u, ()):
+            del self.staged_adjacency[u][v]
+            del self.staged_adjacency[v][u]
+            self.__pop_staged_edge(u, v)
+        else:
+            self.wrapped.remove_edge(u, v)
+
+    def remove_edges_from(self, ebunch):
+        for u, v, *_ in list(ebunch):
+            if self.has_edge(u, v):
+                self.remove_edge(u, v)
+
+    def __pop_staged_edge(self, u, v):
+        if self.staged_edges.pop((u, v), self) is self:
+            del self.staged_edges[(v, u)]
+
+
+class BatchNodeView(Mapping):
+    """
+    `graph.nodes` of a `Batch`, includes staged nodes.
+    """
+
+    def __init__(self, batch: Batch):
+        self.__staged = batch.staged_nodes
+        self.__nodes = batch.wrapped.nodes
+
+    def __call__(self, data=False, default=None):
+        if data is False:
+            return self
+        return BatchNodeDataView(self, data, default)
+
+    data = __call__
+
+    def __getitem__(self, n):
+        attributes = self.__staged.get(n)
+        if attributes is None:
+            return self.__nodes[n]
+        return attributes
+
+    def __iter__(self):
+        yield from self.__nodes
+        yield from self.__staged
+
+    def __len__(self):
+        return len(self.__nodes) + len(self.__staged)
+
+    def __contains__(self, n):
+        return n in self.__staged or n in self.__nodes
+
+
+class BatchNodeDataView:
+    """
+    `graph.nodes(data=...)` of a `Batch`, iterates over `(node, data)` pairs.
+    """
+
+    def __init__(self, nodes: BatchNodeView, data, default):
+        self.__nodes = nodes
+        self.__data = data
+        self.__default = default
+
+    def __getitem__(self, n):
+        attributes = self.__nodes[n]
+        if self.__data is True:
+            return attributes
+        return attributes.get(self.__data, self.__default)
+
+    def __iter__(self):
+        for n in self.__nodes:
+            yield n, self[n]
+
+    def __len__(self):
+        return len(self.__nodes)
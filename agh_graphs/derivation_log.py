@@ -0,0 +1,320 @@
+"""
+Derivation logs.
+
+A `DerivationLog` attached to a graph records every application of a production
+on the graph (production class, input vertices, orientation and keyword
+arguments) in a compact binary format. Before the first application the log
+takes a snapshot of the graph, e.g. the initial node of a derivation:
+
+    log = start_log(graph)
+    derive_e(graph)
+    data = stop_log(graph).to_bytes()
+
+`replay(data)` rebuilds the graph: it restores the snapshot and applies the
+productions again in the `TRUSTED` execution mode (see `agh_graphs.execution`).
+Node ids are allocated in the same order, so the replayed graph has the same
+node ids as the recorded one, on either backend (`networkx.Graph` or
+`LayeredGraph`). Changes made to the graph directly (not by
+productions) after the first application are not recorded, neither are
+applications which raised (e.g. rolled back by `apply_in_transaction`).
+Only productions from `agh_graphs.productions` can be replayed, names of other
+classes are rejected without importing anything.
+
+Format: the magic bytes, the snapshot (graph settings, the first free id,
+nodes with their attributes and edges) and entries. Integers are varints, values
+(node ids, attributes and keyword arguments) are tagged, see `_write_value`.
+Every entry starts with the index of its production class in the table of
+classes, a new class is added to the table by its index followed by its name.
+"""
+import struct
+from typing import List, Union
+
+from networkx import Graph
+
+from agh_graphs import productions
+from agh_graphs.exact import _make, _parts, is_exact
+from agh_graphs.execution import TRUSTED
+from agh_graphs.production import Production
+from agh_graphs.utils import get_id_allocator
+
+MAGIC = b'AGHLOG\x01'
+
+(_NONE, _INT, _FLOAT, _STR, _TUPLE, _EXACT, _TRUE, _FALSE, _LIST, _DICT) = range(10)
+
+_DOUBLE = struct.Struct('<d')
+
+
+class DerivationLog:
+    """
+    Binary log of productions applied on a graph, see `start_log`.
+    """
+
+    def __init__(self):
+        self.snapshot = None
+        self.entries = bytearray()
+        self.count = 0
+        self.__production_indexes = {}
+
+    def take_snapshot(self, graph: Graph):
+        """
+        Takes the snapshot of `graph` if nothing was recorded yet, called by
+        `Production.apply` before the graph is rewritten.
+        """
+        if self.snapshot is None:
+            self.snapshot = _write_snapshot(graph)
+
+    def record(self, graph: Graph, production: Production, prod_input: List, orientation: int, kwargs: dict):
+        """
+        Records an application of `production` on `graph`, called by `Production.apply`
+        after the graph was rewritten.
+        """
+        self.take_snapshot(graph)
+        entries = self.entries
+        production_class = type(production)
+        index = self.__production_indexes.get(production_class)
+        if index is None:
+            index = self.__production_indexes[production_class] = len(self.__production_indexes)
+            _write_varint(entries, index)
+            _write_value(entries, '{}:{}'.format(production_class.__module__, production_class.__qualname__))
+        else:
+            _write_varint(entries, index)
+        _write_varint(entries, _zigzag(orientation))
+        _write_varint(entries, len(prod_input))
+        for v in prod_input:
+            _write_value(entries, v)
+        _write_value(entries, kwargs)
+        self.count += 1
+
+    def to_bytes(self) -> bytes:
+        snapshot = self.snapshot if self.snapshot is not None else _write_snapshot(Graph())
+        return MAGIC + bytes(snapshot) + bytes(self.entries)
+
+
+def start_log(graph: Graph) -> DerivationLog:
+    """
+    Attaches a new `DerivationLog` to `graph`, it is kept in `graph.graph`.
+    """
+    log = graph.graph['derivation_log'] = DerivationLog()
+    return log
+
+
+def stop_log(graph: Graph) -> DerivationLog:
+    """
+    Detaches the `DerivationLog` from `graph` and returns it.
+    """
+    return graph.graph.pop('derivation_log')
+
+
+def replay(data: Union[bytes, DerivationLog], graph: Graph = None) -> Graph:
+    """
+    Rebuilds the graph recorded in `data` (returned by `DerivationLog.to_bytes`)
+    on `graph`, which should be empty. If `graph` is `None` a new `networkx.Graph` is used.
+
+    Returns the graph.
+    """
+    if isinstance(data, DerivationLog):
+        data = data.to_bytes()
+    if not data.startswith(MAGIC):
+        raise ValueError('not a derivation log')
+    if graph is None:
+        graph = Graph()
+    if len(graph):
+        raise ValueError('derivation logs can be replayed only on empty graphs')
+
+    reader = _Reader(data, len(MAGIC))
+    _read_snapshot(reader, graph)
+
+    instances = []
+    while reader.offset < len(data):
+        index = reader.varint()
+        if index == len(instances):
+            instances.append(_production_class(reader.value())())
+        production = instances[index]
+        orientation = _unzigzag(reader.varint())
+        prod_input = [reader.value() for _ in range(reader.varint())]
+        kwargs = reader.value()
+        production.apply(graph, prod_input, orientation, execution_mode=TRUSTED, **kwargs)
+    return graph
+
+
+def _production_class(name: str):
+    """
+    Returns the production class recorded as `name` (`'<module>:<class>'`)
+    if it is a production from `agh_graphs.productions`.
+    """
+    (module, _, class_name) = name.partition(':')
+    if module != '{}.{}'.format(productions.__name__, class_name.lower()):
+        raise ValueError('unknown production {!r}'.format(name))
+    try:
+        production_class = productions.get(class_name)
+    except KeyError:
+        raise ValueError('unknown production {!r}'.format(name)) from None
+    if not (isinstance(production_class, type) and issubclass(production_class, Production)):
+        raise ValueError('{!r} is not a production'.format(name))
+    return production_class
+
+
+def _write_snapshot(graph: Graph) -> bytearray:
+    buffer = bytearray()
+    _write_value(buffer, bool(graph.graph.get('exact_positions')))
+    _write_varint(buffer, get_id_allocator(graph).next_id)
+    _write_varint(buffer, len(graph))
+    for n, attributes in graph.nodes(data=True):
+        _write_value(buffer, n)
+        _write_value(buffer, dict(attributes))
+    edges = _ordered_edges(graph)
+    _write_varint(buffer, len(edges))
+    for u, v in edges:
+        _write_value(buffer, u)
+        _write_value(buffer, v)
+    return buffer
+
+
+def _ordered_edges(graph: Graph) -> list:
+    """
+    Returns edges of `graph` in an order in which adding them to a graph with
+    the same nodes gives every node the same order of neighbors (productions
+    depend on it), if there is such an order.
+    """
+    neighbors = {n: list(graph.neighbors(n)) for n in graph}
+    added = dict.fromkeys(neighbors, 0)
+    edges = []
+    progress = True
+    while progress:
+        progress = False
+        for n, n_neighbors in neighbors.items():
+            while added[n] < len(n_neighbors):
+                v = n_neighbors[added[n]]
+                if neighbors[v][added[v]] != n:
+                    break
+                edges.append((n, v))
+                added[n] += 1
+                added[v] += 1
+                progress = True
+
+    if len(edges) < graph.number_of_edges():
+        known = set(frozenset(edge) for edge in edges)
+        edges.extend((u, v) for u, v in graph.edges() if frozenset((u, v)) not in known)
+    return edges
+
+
+def _read_snapshot(reader: '_Reader', graph: Graph):
+    if reader.value():
+        graph.graph['exact_positions'] = True
+    next_id = reader.varint()
+    graph.add_nodes_from([(reader.value(), reader.value()) for _ in range(reader.varint())])
+    graph.add_edges_from([(reader.value(), reader.value()) for _ in range(reader.varint())])
+    get_id_allocator(graph).next_id = next_id
+
+
+def _zigzag(number: int) -> int:
+    return number << 1 if number >= 0 else (-number << 1) - 1
+
+
+def _unzigzag(number: int) -> int:
+    return number >> 1 if not number & 1 else -((number + 1) >> 1)
+
+
+def _write_varint(buffer: bytearray, number: int):
+    while number >= 0x80:
+        buffer.append(number & 0x7f | 0x80)
+        number >>= 7
+    buffer.append(number)
+
+
+def _write_value(buffer: bytearray, value):
+    """
+    Writes `value` (`None`, a `bool`, an `int`, a `float`, a `str`, an exact number
+    or a `tuple`, `list` or `dict` of these) with a one byte tag.
+    """
+    if value is None:
+        buffer.append(_NONE)
+    elif value is True:
+        buffer.append(_TRUE)
+    elif value is False:
+        buffer.append(_FALSE)
+    elif type(value) is int:
+        buffer.append(_INT)
+        _write_varint(buffer, _zigzag(value))
+    elif type(value) is float:
+        buffer.append(_FLOAT)
+        buffer += _DOUBLE.pack(value)
+    elif type(value) is str:
+        encoded = value.encode()
+        buffer.append(_STR)
+        _write_varint(buffer, len(encoded))
+        buffer += encoded
+    elif is_exact(value):
+        (num, exp, thirds) = _parts(value)
+        buffer.append(_EXACT)
+        _write_varint(buffer, _zigzag(num))
+        _write_varint(buffer, exp)
+        _write_varint(buffer, thirds)
+    elif type(value) in (tuple, list):
+        buffer.append(_TUPLE if type(value) is tuple else _LIST)
+        _write_varint(buffer, len(value))
+        for item in value:
+            _write_value(buffer, item)
+    elif isinstance(value, dict):
+        buffer.append(_DICT)
+        _write_varint(buffer, len(value))
+        for key, item in value.items():
+            _write_value(buffer, key)
+            _write_value(buffer, item)
+    else:
+        raise TypeError('cannot log value {!r}'.format(value))
+
+
+class _Reader:
+    """
+    Reads varints and values written by `_write_varint` and `_write_value`.
+    """
+
+    def __init__(self, data: bytes, offset: int = 0):
+        self.data = data
+        self.offset = offset
+
+    def varint(self) -> int:
+        data = self.data
+        offset = self.offset
+        number = 0
+        shift = 0
+        while True:
+            byte = data[offset]
+            offset += 1
+            number |= (byte & 0x7f) << shift
+            if byte < 0x80:
+                break
+            shift += 7
+        self.offset = offset
+        return number
+
+    def value(self):
+        tag = self.data[self.offset]
+        self.offset += 1
+        if tag == _INT:
+            return _unzigzag(self.varint())
+        if tag == _NONE:
+            return None
+        if tag == _TRUE:
+            return True
+        if tag == _FALSE:
+            return False
+        if tag == _FLOAT:
+            (value,) = _DOUBLE.unpack_from(self.data, self.offset)
+            self.offset += _DOUBLE.size
+            return value
+        if tag == _STR:
+            length = self.varint()
+            value = self.data[self.offset:self.offset + length].decode()
+            self.offset += length
+            return value
+        if tag == _EXACT:
+            return _make(_unzigzag(self.varint()), self.varint(), self.varint())
+        if tag == _TUPLE:
+            return tuple(self.value() for _ in range(self.varint()))
+        if tag == _LIST:
+            return [self.value() for _ in range(self.varint())]
+        if tag == _DICT:
+            return {self.value(): self.value() for _ in range(self.varint())}
+        raise ValueError('unknown tag {} at offset {}'.format(tag, self.offset - 1))
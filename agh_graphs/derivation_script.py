@@ -0,0 +1,199 @@
+"""
+Declarative derivations.
+
+A derivation script is a JSON document with the initial node and a list of
+steps, applications of productions:
+
+    {
+      "name": "derivation_e",
+      "initial": {"name": "initial", "position": [0.5, 0.5]},
+      "steps": [
+        {"production": "P1", "inputs": ["initial"], "outputs": ["a1", "a2"]},
+        {"production": "P2", "inputs": ["a1"], "orientation": 1, "outputs": ["b3", "b2"]},
+        {"production": "P9", "inputs": [{"layer": 1, "position": ["2/3", "1/3"], "label": "I"}]}
+      ]
+    }
+
+Productions are given by names of classes from `agh_graphs.productions` (e.g.
+`"P2"`) or as `"agh_graphs.productions.p2:P2"`; other names are rejected
+without importing anything, so loading a script cannot import arbitrary modules.
+Inputs refer to the initial node or to outputs of earlier
+steps by name (a later output with the same name hides the earlier one), or to
+the vertex with the given `position` on `layer` (and with `label`, if given),
+which is found when the step is applied. Coordinates are numbers or fractions
+written as strings, e.g. `"1/3"`. `orientation` and `outputs` are optional,
+`null` outputs are not named. The top-level `exact_positions` switches the graph
+to exact positions (see `agh_graphs.utils.use_exact_positions`).
+
+`compile_script` checks the script and resolves names to indexes of slots,
+so `Plan.run` applies the steps without looking up names:
+
+    plan = load_plan('agh_graphs/derivations/derivation_e.json')
+    graph = plan.run(LayeredGraph())
+"""
+import json
+from fractions import Fraction
+from typing import List, NamedTuple, Optional, Tuple
+
+from networkx import Graph
+
+from agh_graphs import productions
+from agh_graphs.exact import float_position
+from agh_graphs.production import Production
+from agh_graphs.utils import as_position, gen_name, get_vertices_from_layer, use_exact_positions
+
+
+class Lookup(NamedTuple):
+    """
+    Vertex with `position` on `layer` (and with `label` unless it is `None`), stored in `slot`.
+    """
+    slot: int
+    layer: int
+    position: Tuple[float, float]
+    label: Optional[str]
+
+
+class CompiledStep(NamedTuple):
+    """
+    Step of a `Plan`: vertices found by `lookups` are stored in their slots,
+    then `production` is applied on vertices from `input_slots` and the result
+    is stored in `output_slots` (`None` for results which are not used).
+    """
+    production: Production
+    lookups: Tuple[Lookup, ...]
+    input_slots: Tuple[int, ...]
+    orientation: int
+    output_slots: Tuple[Optional[int], ...]
+
+
+class Plan:
+    """
+    Compiled derivation script, see `compile_script`.
+    """
+
+    def __init__(self, name: str, initial_position, exact_positions: bool, steps: List[CompiledStep],
+                 slot_count: int):
+        self.name = name
+        self.initial_position = initial_position
+        self.exact_positions = exact_positions
+        self.steps = steps
+        self.slot_count = slot_count
+
+    def run(self, graph: Graph = None) -> Graph:
+        """
+        Runs the derivation on `graph`, which should be empty.
+        If `graph` is `None` a new `networkx.Graph` is used.
+        """
+        if graph is None:
+            graph = Graph()
+        if self.exact_positions:
+            use_exact_positions(graph)
+
+        slots = [None] * self.slot_count
+        slots[0] = gen_name(graph)
+        graph.add_node(slots[0], layer=0, position=as_position(graph, self.initial_position), label='E')
+
+        for production, lookups, input_slots, orientation, output_slots in self.steps:
+            for lookup in lookups:
+                slots[lookup.slot] = _find_vertex(graph, lookup)
+            result = production.apply(graph, [slots[slot] for slot in input_slots], orientation)
+            if output_slots:
+                if len(result) != len(output_slots):
+                    raise ValueError('{} returned {} vertices, expected {}'.format(
+                        production, len(result), len(output_slots)))
+                for slot, v in zip(output_slots, result):
+                    if slot is not None:
+                        slots[slot] = v
+        return graph
+
+
+def load_script(path: str) -> dict:
+    """
+    Returns the derivation script from the JSON file at `path`.
+    """
+    with open(path) as file:
+        return json.load(file)
+
+
+def load_plan(path: str) -> Plan:
+    """
+    Returns the compiled derivation script from the JSON file at `path`.
+    """
+    return compile_script(load_script(path))
+
+
+def compile_script(script: dict) -> Plan:
+    """
+    Resolves names of productions and vertices of `script` (see the module
+    documentation), raises `ValueError` if they cannot be resolved.
+    """
+    initial = script['initial']
+    slots = {initial['name']: 0}
+    slot_count = 1
+    instances = {}
+    steps = []
+    for index, step in enumerate(script['steps']):
+        name = step['production']
+        production = instances.get(name)
+        if production is None:
+            production = instances[name] = _production_class(name)()
+
+        lookups = []
+        input_slots = []
+        for ref in step['inputs']:
+            if isinstance(ref, str):
+                if ref not in slots:
+                    raise ValueError('step {}: unknown vertex {!r}'.format(index, ref))
+                input_slots.append(slots[ref])
+            else:
+                position = tuple(Fraction(c) if isinstance(c, str) else c for c in ref['position'])
+                lookups.append(Lookup(slot_count, ref['layer'], position, ref.get('label')))
+                input_slots.append(slot_count)
+                slot_count += 1
+
+        output_slots = []
+        for output in step.get('outputs', ()):
+            if output is None:
+                output_slots.append(None)
+            else:
+                slots[output] = slot_count
+                output_slots.append(slot_count)
+                slot_count += 1
+
+        steps.append(CompiledStep(production, tuple(lookups), tuple(input_slots), step.get('orientation', 0),
+                                  tuple(output_slots)))
+
+    return Plan(script.get('name'), tuple(initial['position']), script.get('exact_positions', False), steps,
+                slot_count)
+
+
+def _production_class(name: str):
+    (module, _, class_name) = name.rpartition(':')
+    if module and module != '{}.{}'.format(productions.__name__, class_name.lower()):
+        raise ValueError('unknown production {!r}'.format(name))
+    try:
+        production_class = productions.get(class_name)
+    except KeyError:
+        raise ValueError('unknown production {!r}'.format(name)) from None
+    if not (isinstance(production_class, type) and issubclass(production_class, Production)):
+        raise ValueError('{!r} is not a production'.format(name))
+    return production_class
+
+
+def _find_vertex(graph: Graph, lookup: Lookup):
+    if graph.graph.get('exact_positions'):
+        position = as_position(graph, lookup.position)
+    else:
+        position = float_position(lookup.position)
+    nodes_at = getattr(graph, 'nodes_at', None)
+    if nodes_at is not None:
+        vertices = nodes_at(lookup.layer, position)
+    else:
+        positions = graph.nodes(data='position')
+        vertices = [v for v in get_vertices_from_layer(graph, lookup.layer) if positions[v] == position]
+    if lookup.label is not None:
+        labels = graph.nodes(data='label')
+        vertices = [v for v in vertices if labels[v] == lookup.label]
+    if len(vertices) != 1:
+        raise ValueError('expected one vertex at {}, found {}'.format(lookup, len(vertices)))
+    return vertices[0]
@@ -1,11 +1,9 @@
-from matplotlib import pyplot
 from networkx import Graph
 
 from agh_graphs.productions.p1 import P1
 from agh_graphs.productions.p12 import P12
 from agh_graphs.productions.p9 import P9
 from agh_graphs.utils import gen_name
-from agh_graphs.visualize import visualize_graph_layer, visualize_graph_3d
 
 
 class DerivationA:
@@ -31,6 +29,10 @@ class DerivationA:
         self.visualize_if_enabled(graph)
 
         if self.visualize:
+            from matplotlib import pyplot
+
+            from agh_graphs.visualize import visualize_graph_layer
+
             visualize_graph_layer(graph, 0)
             pyplot.show()
 
@@ -42,12 +44,16 @@ class DerivationA:
 
     def visualize_if_enabled(self, graph):
         if self.visualize:
+            from matplotlib import pyplot
+
+            from agh_graphs.visualize import visualize_graph_3d
+
             visualize_graph_3d(graph)
             pyplot.show()
 
 
 if __name__ == '__main__':
     graph = Graph()
-    graph.add_node(gen_name(), layer=0, position=(0.5, 0.5), label='E')
+    graph.add_node(gen_name(graph), layer=0, position=(0.5, 0.5), label='E')
     p1_positions = [(0, 0), (1, 0), (0, 1), (1, 1)]
     DerivationA(visualize=True).run(graph, p1_positions)
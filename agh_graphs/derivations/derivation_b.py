@@ -1,4 +1,3 @@
-from matplotlib import pyplot
 from networkx import Graph
 
 from agh_graphs.productions.p1 import P1
@@ -6,12 +5,15 @@ from agh_graphs.productions.p2 import P2
 from agh_graphs.productions.p9 import P9
 from agh_graphs.productions.p10 import P10
 from agh_graphs.utils import gen_name
-from agh_graphs.visualize import visualize_graph_layer, visualize_graph_3d
 
 
 def derive_b():
+    from matplotlib import pyplot
+
+    from agh_graphs.visualize import visualize_graph_3d
+
     graph = Graph()
-    initial_node_name = gen_name()
+    initial_node_name = gen_name(graph)
     graph.add_node(initial_node_name, layer=0, position=(0.5, 0.5), label='E')
 
     visualize_graph_3d(graph)
@@ -1,4 +1,3 @@
-from matplotlib import pyplot
 from networkx import Graph
 
 from agh_graphs.productions.p1 import P1
@@ -8,12 +7,16 @@ from agh_graphs.productions.p2 import P2
 from agh_graphs.productions.p6 import P6
 from agh_graphs.productions.p9 import P9
 from agh_graphs.utils import gen_name
-from agh_graphs.visualize import visualize_graph_3d, visualize_graph_layer
 
 
-def derive_e():
-    g = Graph()
-    initial_node_name = gen_name()
+def derive_e(g: Graph = None):
+    """
+    Runs the derivation E on `g`, which should be empty.
+    If `g` is `None` a new `networkx.Graph` is used.
+    """
+    if g is None:
+        g = Graph()
+    initial_node_name = gen_name(g)
     g.add_node(initial_node_name, layer=0, position=(0.5, 0.5), label='E')
 
     # Layer 1
@@ -206,6 +209,10 @@ def derive_e():
 
 
 if __name__ == '__main__':
+    from matplotlib import pyplot
+
+    from agh_graphs.visualize import visualize_graph_3d, visualize_graph_layer
+
     graph = derive_e()
 
     visualize_graph_3d(graph)
@@ -4,17 +4,19 @@ If you want to test something you can use it.
 It's better to copy-paste this file as `test.py` in order
 not to accidentally commit this file.
 """
-from matplotlib import pyplot
 from networkx import Graph
 
 from agh_graphs.productions.p1 import P1
 from agh_graphs.productions.p2 import P2
 from agh_graphs.utils import gen_name
-from agh_graphs.visualize import visualize_graph_layer, visualize_graph_3d
 
 if __name__ == '__main__':
+    from matplotlib import pyplot
+
+    from agh_graphs.visualize import visualize_graph_layer, visualize_graph_3d
+
     graph = Graph()
-    initial_node_name = gen_name()
+    initial_node_name = gen_name(graph)
     graph.add_node(initial_node_name, layer=0, position=(0.5, 0.5), label='E')
 
     [i1, i2] = P1().apply(graph, [initial_node_name])
@@ -0,0 +1,301 @@
+"""
+Exact coordinates.
+
+Every position created by the grammar is a corner given to P1, a midpoint
+of two positions or a centroid of three positions. If corners are dyadic
+rationals (an integer divided by a power of two, which includes every
+`float`), midpoints are dyadic as well and centroids are dyadic rationals
+divided by three.
+
+`Dyadic` and `DyadicThird` represent these numbers exactly. They compare and
+hash equal to `int`, `float` and `fractions.Fraction` of the same value, so
+positions built of them can be compared with `==` and used as dictionary keys.
+Use `float()` or `float_position` to get an approximation, e.g. for drawing.
+"""
+import math
+import operator
+import sys
+from fractions import Fraction
+
+_HASH_MODULUS = sys.hash_info.modulus
+
+
+class _Exact:
+    """
+    Number equal to `num / (2 ** exp * 3 ** _thirds)`, `exp` is not negative.
+    """
+    __slots__ = ('num', 'exp')
+    _thirds = 0
+
+    def __new__(cls, num: int, exp: int = 0):
+        if exp < 0:
+            return _make(num << -exp, 0, cls._thirds)
+        return _make(num, exp, cls._thirds)
+
+    def _parts(self):
+        return self.num, self.exp, self._thirds
+
+    def _denominator(self):
+        return (3 if self._thirds else 1) << self.exp
+
+    def as_fraction(self) -> Fraction:
+        return Fraction(self.num, self._denominator())
+
+    # ---- conversions ----
+
+    def __float__(self):
+        if self._thirds:
+            return math.ldexp(self.num / 3, -self.exp)
+        return math.ldexp(self.num, -self.exp)
+
+    def __floor__(self):
+        return (self.num // 3 if self._thirds else self.num) >> self.exp
+
+    def __ceil__(self):
+        return -(-self).__floor__()
+
+    def __trunc__(self):
+        return self.__floor__() if self.num >= 0 else self.__ceil__()
+
+    def __round__(self, ndigits=None):
+        return round(self.as_fraction(), ndigits)
+
+    def __bool__(self):
+        return self.num != 0
+
+    def __reduce__(self):
+        return _make, self._parts()
+
+    def __hash__(self):
+        # the same as `Fraction.__hash__`, so equal numbers of all types have equal hashes
+        dinv = pow(self._denominator(), -1, _HASH_MODULUS)
+        hash_ = hash(hash(abs(self.num)) * dinv)
+        result = hash_ if self.num >= 0 else -hash_
+        return -2 if result == -1 else result
+
+    def __repr__(self):
+        return '{}({}, {})'.format(type(self).__name__, self.num, self.exp)
+
+    def __str__(self):
+        return str(self.as_fraction())
+
+    # ---- comparisons ----
+
+    def _compare(self, other, op):
+        parts = _parts(other)
+        if parts is None:
+            if isinstance(other, float):
+                return op(float(self), other)
+            return NotImplemented
+        (a, b, _, _) = _align(self._parts(), parts)
+        return op(a, b)
+
+    def __eq__(self, other):
+        return self._compare(other, operator.eq)
+
+    def __lt__(self, other):
+        return self._compare(other, operator.lt)
+
+    def __le__(self, other):
+        return self._compare(other, operator.le)
+
+    def __gt__(self, other):
+        return self._compare(other, operator.gt)
+
+    def __ge__(self, other):
+        return self._compare(other, operator.ge)
+
+    # ---- arithmetic ----
+
+    def __neg__(self):
+        return _make(-self.num, self.exp, self._thirds)
+
+    def __pos__(self):
+        return self
+
+    def __abs__(self):
+        return -self if self.num < 0 else self
+
+    def __add__(self, other):
+        parts = _parts(other)
+        if parts is None:
+            return float(self) + other if isinstance(other, float) else NotImplemented
+        (a, b, exp, thirds) = _align(self._parts(), parts)
+        return _make(a + b, exp, thirds)
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        parts = _parts(other)
+        if parts is None:
+            return float(self) - other if isinstance(other, float) else NotImplemented
+        (a, b, exp, thirds) = _align(self._parts(), parts)
+        return _make(a - b, exp, thirds)
+
+    def __rsub__(self, other):
+        parts = _parts(other)
+        if parts is None:
+            return other - float(self) if isinstance(other, float) else NotImplemented
+        (a, b, exp, thirds) = _align(parts, self._parts())
+        return _make(a - b, exp, thirds)
+
+    def __mul__(self, other):
+        parts = _parts(other)
+        if parts is None:
+            return float(self) * other if isinstance(other, float) else NotImplemented
+        (num, exp, thirds) = parts
+        return _make(self.num * num, self.exp + exp, self._thirds + thirds)
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other):
+        parts = _parts(other)
+        if parts is None:
+            return float(self) / other if isinstance(other, float) else NotImplemented
+        return _divide(self._parts(), parts)
+
+    def __rtruediv__(self, other):
+        parts = _parts(other)
+        if parts is None:
+            return other / float(self) if isinstance(other, float) else NotImplemented
+        return _divide(parts, self._parts())
+
+    def __pow__(self, power):
+        if isinstance(power, int) and power >= 0:
+            return _make(self.num ** power, self.exp * power, self._thirds * power)
+        return float(self) ** power
+
+    def __rpow__(self, other):
+        return other ** float(self)
+
+
+class Dyadic(_Exact):
+    """
+    Exact number `num / 2 ** exp`.
+    """
+    __slots__ = ()
+
+
+class DyadicThird(_Exact):
+    """
+    Exact number `num / (3 * 2 ** exp)`, e.g. a coordinate of a centroid.
+    """
+    __slots__ = ()
+    _thirds = 1
+
+
+def is_exact(value) -> bool:
+    """
+    Returns `True` if `value` is a `Dyadic` or a `DyadicThird`.
+    """
+    return isinstance(value, _Exact)
+
+
+def to_exact(value):
+    """
+    Returns `value` (an `int`, a finite `float` or a `Fraction` with a denominator
+    of the form `2 ** k` or `3 * 2 ** k`) as a `Dyadic` or a `DyadicThird`.
+    """
+    parts = _parts(value)
+    if parts is None:
+        raise ValueError('{!r} cannot be represented exactly'.format(value))
+    return _make(*parts)
+
+
+def exact_position(position):
+    """
+    Returns `position` with exact coordinates, see `to_exact`.
+    """
+    return tuple(to_exact(c) for c in position)
+
+
+def float_position(position):
+    """
+    Returns `position` with `float` coordinates.
+    """
+    return tuple(float(c) for c in position)
+
+
+def _make(num, exp, thirds):
+    while thirds and num % 3 == 0:
+        num //= 3
+        thirds -= 1
+    if thirds > 1:
+        return Fraction(num, 3 ** thirds << exp)
+
+    if num == 0:
+        exp = 0
+    elif exp > 0:
+        shift = min(exp, (num & -num).bit_length() - 1)
+        num >>= shift
+        exp -= shift
+
+    number = object.__new__(DyadicThird if thirds else Dyadic)
+    number.num = num
+    number.exp = exp
+    return number
+
+
+def _parts(value):
+    """
+    Returns `(num, exp, thirds)` of `value` or `None` if `value` is not
+    a number which can be represented exactly.
+    """
+    if isinstance(value, _Exact):
+        return value.num, value.exp, value._thirds
+    if isinstance(value, int):
+        return int(value), 0, 0
+    if isinstance(value, float):
+        if not math.isfinite(value):
+            return None
+        (num, den) = value.as_integer_ratio()
+        return num, den.bit_length() - 1, 0
+    if isinstance(value, Fraction):
+        den = value.denominator
+        thirds = 1 if den % 3 == 0 else 0
+        if thirds:
+            den //= 3
+        if den & (den - 1):
+            return None
+        return value.numerator, den.bit_length() - 1, thirds
+    return None
+
+
+def _align(a, b):
+    """
+    Returns numerators of `a` and `b` over their common denominator
+    and the denominator as `(exp, thirds)`.
+    """
+    (a_num, a_exp, a_thirds) = a
+    (b_num, b_exp, b_thirds) = b
+    exp = max(a_exp, b_exp)
+    a_num <<= exp - a_exp
+    b_num <<= exp - b_exp
+    if a_thirds != b_thirds:
+        if a_thirds:
+            b_num *= 3
+        else:
+            a_num *= 3
+    return a_num, b_num, exp, max(a_thirds, b_thirds)
+
+
+def _divide(a, b):
+    (a_num, a_exp, a_thirds) = a
+    (b_num, b_exp, b_thirds) = b
+    if b_num == 0:
+        raise ZeroDivisionError('division by zero')
+
+    # a / b = a_num * 3 ** b_thirds * 2 ** b_exp / (b_num * 2 ** a_exp * 3 ** a_thirds)
+    twos = (b_num & -b_num).bit_length() - 1
+    odd = b_num >> twos
+    thirds = a_thirds
+    if odd % 3 == 0:
+        odd //= 3
+        thirds += 1
+    num = a_num * 3 ** b_thirds
+    if abs(odd) != 1:
+        return Fraction(num << b_exp, odd * (3 ** thirds << (a_exp + twos)))
+    exp = a_exp + twos - b_exp
+    if exp < 0:
+        (num, exp) = (num << -exp, 0)
+    return _make(num * odd, exp, thirds)
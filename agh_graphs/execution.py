@@ -0,0 +1,106 @@
+"""
+Execution modes of productions.
+
+Before a production rewrites the graph, `Production.match` checks that
+the production can be applied. For derivations which are known to be valid
+the check can be skipped:
+
+* `STRICT` (default) - every application is checked,
+* `SAMPLED` - a random sample of applications is checked,
+* `TRUSTED` - applications are not checked, vertices are only resolved.
+
+The mode is set per graph with `set_execution_mode`, or per call with the
+`execution_mode` keyword argument of `Production.apply`:
+
+    set_execution_mode(graph, TRUSTED)
+    P2().apply(graph, [i])
+    P6().apply(graph, interiors, execution_mode=STRICT)
+    print(get_execution_mode(graph).summary())
+"""
+import random
+
+from networkx import Graph
+
+STRICT = 'strict'
+SAMPLED = 'sampled'
+TRUSTED = 'trusted'
+
+MODES = (STRICT, SAMPLED, TRUSTED)
+
+
+class ExecutionMode:
+    """
+    Execution mode of a graph, also keeps statistics of matched productions:
+    how many were validated and how long matching took with and without validation.
+    """
+
+    def __init__(self, mode: str = STRICT, sample_rate: float = 0.1, seed=None):
+        if mode not in MODES:
+            raise ValueError('unknown execution mode: {}'.format(mode))
+        self.mode = mode
+        self.sample_rate = sample_rate
+        self.random = random.Random(seed)
+
+        self.validated = 0
+        self.validation_time = 0.0
+        self.trusted = 0
+        self.trusted_time = 0.0
+
+    def should_validate(self, mode: str = None) -> bool:
+        """
+        Returns `True` if the next application should be validated in
+        `mode`, or in the mode of this object if `mode` is `None`.
+        """
+        mode = self.mode if mode is None else mode
+        if mode == STRICT:
+            return True
+        if mode == TRUSTED:
+            return False
+        if mode == SAMPLED:
+            return self.random.random() < self.sample_rate
+        raise ValueError('unknown execution mode: {}'.format(mode))
+
+    def record(self, validated: bool, seconds: float):
+        """
+        Records a match which took `seconds`.
+        """
+        if validated:
+            self.validated += 1
+            self.validation_time += seconds
+        else:
+            self.trusted += 1
+            self.trusted_time += seconds
+
+    def copy(self) -> 'ExecutionMode':
+        """
+        Returns a copy with the same mode, state of sampling and statistics.
+        """
+        execution_mode = ExecutionMode(self.mode, self.sample_rate)
+        execution_mode.random.setstate(self.random.getstate())
+        (execution_mode.validated, execution_mode.validation_time) = (self.validated, self.validation_time)
+        (execution_mode.trusted, execution_mode.trusted_time) = (self.trusted, self.trusted_time)
+        return execution_mode
+
+    def summary(self) -> str:
+        return '{}: {} validated matches in {:.3f} ms, {} trusted matches in {:.3f} ms'.format(
+            self.mode, self.validated, self.validation_time * 1000, self.trusted, self.trusted_time * 1000)
+
+
+def get_execution_mode(graph: Graph) -> ExecutionMode:
+    """
+    Returns the execution mode of `graph`, it is kept in `graph.graph`.
+    Graphs are in the `STRICT` mode by default.
+    """
+    mode = graph.graph.get('execution_mode')
+    if mode is None:
+        mode = graph.graph['execution_mode'] = ExecutionMode()
+    return mode
+
+
+def set_execution_mode(graph: Graph, mode: str, sample_rate: float = 0.1, seed=None) -> ExecutionMode:
+    """
+    Sets the execution mode of `graph`. In the `SAMPLED` mode every application
+    is validated with probability `sample_rate`, `seed` seeds the sampling.
+    """
+    execution_mode = graph.graph['execution_mode'] = ExecutionMode(mode, sample_rate, seed)
+    return execution_mode
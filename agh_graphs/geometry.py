@@ -0,0 +1,163 @@
+"""
+Geometric predicates on arrays of triangles.
+
+Functions of this module take NumPy arrays (or anything `numpy.asarray`
+accepts) whose last axis holds `(x, y)` coordinates. Triangles are arrays of
+shape `(..., 3, 2)`, so the same function works on one triangle and on all
+triangles of a layer, e.g.:
+
+    (interiors, corners, triangles) = layer_triangles(graph, layer)
+    longest = longest_edges(triangles)
+    is_ccw = orientation(triangles[:, 0], triangles[:, 1], triangles[:, 2]) > 0
+
+Edge `k` of a triangle joins corners `k` and `(k + 1) % 3`. Angles are not
+computed, directions are compared by signs of cross products, so predicates
+on exact positions (see `agh_graphs.exact`, they are kept in arrays of objects)
+are exact.
+
+`cache_layer_geometry` fills the cache of `agh_graphs.utils.get_triangle_geometry`
+for a whole layer at once.
+"""
+import numpy as np
+from networkx import Graph
+
+from agh_graphs.utils import TriangleGeometry, get_neighbors_at, get_vertices_from_layer
+
+
+def as_points(points) -> np.ndarray:
+    """
+    Returns `points` as an array of floats, or of objects if they are exact.
+    """
+    array = np.asarray(points)
+    if array.dtype == object:
+        return array
+    return array.astype(float, copy=False)
+
+
+def cross(u, v) -> np.ndarray:
+    """
+    Returns cross products of vectors `u` and `v`.
+    """
+    u = as_points(u)
+    v = as_points(v)
+    return u[..., 0] * v[..., 1] - u[..., 1] * v[..., 0]
+
+
+def orientation(a, b, c) -> np.ndarray:
+    """
+    Returns 1 where `a`, `b`, `c` are in counterclockwise order, -1 where they are
+    in clockwise order and 0 where they are collinear.
+    """
+    a = as_points(a)
+    products = cross(as_points(b) - a, as_points(c) - a)
+    return np.asarray(products > 0, dtype=int) - np.asarray(products < 0, dtype=int)
+
+
+def midpoints(a, b) -> np.ndarray:
+    """
+    Returns midpoints of segments from `a` to `b`.
+    """
+    return (as_points(a) + as_points(b)) / 2
+
+
+def centroids(triangles) -> np.ndarray:
+    """
+    Returns centroids of `triangles`, shape `(..., 2)`.
+    """
+    triangles = as_points(triangles)
+    return (triangles[..., 0, :] + triangles[..., 1, :] + triangles[..., 2, :]) / 3
+
+
+def squared_lengths(triangles) -> np.ndarray:
+    """
+    Returns squared lengths of edges of `triangles`, shape `(..., 3)`.
+    """
+    triangles = as_points(triangles)
+    delta = triangles - np.roll(triangles, -1, axis=-2)
+    return delta[..., 0] * delta[..., 0] + delta[..., 1] * delta[..., 1]
+
+
+def longest_edges(triangles) -> np.ndarray:
+    """
+    Returns indexes of the longest edges of `triangles` (the first one if there are more).
+    """
+    return np.argmax(squared_lengths(triangles), axis=-1)
+
+
+def ccw_order(triangles) -> np.ndarray:
+    """
+    Returns indexes of corners of `triangles` in counterclockwise order,
+    starting with the first corner, shape `(..., 3)`.
+    """
+    triangles = as_points(triangles)
+    turns = orientation(triangles[..., 0, :], triangles[..., 1, :], triangles[..., 2, :])
+    return np.where((turns >= 0)[..., None], [0, 1, 2], [0, 2, 1])
+
+
+def angle_order(vectors) -> np.ndarray:
+    """
+    Returns indexes which sort `vectors` (shape `(..., k, 2)`) by their angle
+    with the x axis modulo 180 degrees, like `agh_graphs.utils.angle_with_x_axis`.
+    Vectors with equal angles keep their order, vectors should not be zero.
+    """
+    vectors = as_points(vectors)
+    # directions in the upper half-plane, angles in [0, 180)
+    flip = (vectors[..., 1] < 0) | ((vectors[..., 1] == 0) & (vectors[..., 0] < 0))
+    directions = np.where(flip[..., None], -vectors, vectors)
+    # products[..., i, j] > 0 if the angle of i is smaller than the angle of j
+    products = cross(directions[..., :, None, :], directions[..., None, :, :])
+    index = np.arange(vectors.shape[-2])
+    before = (products > 0) | ((products == 0) & (index[:, None] < index[None, :]))
+    return np.argsort(before.sum(axis=-2), axis=-1, kind='stable')
+
+
+def triangle_orders(triangles):
+    """
+    Returns orders used by `TriangleGeometry` for `triangles`: indexes of
+    corners by angle from the centroid, indexes of edges by angle, squared lengths
+    of edges and indexes of the longest edges.
+    """
+    triangles = as_points(triangles)
+    corner_order = angle_order(triangles - centroids(triangles)[..., None, :])
+    edge_order = angle_order(np.roll(triangles, -1, axis=-2) - triangles)
+    lengths = squared_lengths(triangles)
+    return corner_order, edge_order, lengths, longest_edges(triangles)
+
+
+def layer_triangles(graph: Graph, layer: int, label: str = 'I'):
+    """
+    Returns interiors with `label` from `layer` which have three corners,
+    their corners (in the order of `get_neighbors_at`) and positions of corners,
+    shape `(n, 3, 2)`.
+    """
+    node_positions = graph.nodes(data='position')
+    interiors = []
+    corners = []
+    for interior in get_vertices_from_layer(graph, layer, label):
+        interior_corners = get_neighbors_at(graph, interior, layer)
+        if len(interior_corners) == 3:
+            interiors.append(interior)
+            corners.append(tuple(interior_corners))
+    positions = [[node_positions[v] for v in triangle] for triangle in corners]
+    return interiors, corners, as_points(positions).reshape(len(interiors), 3, 2)
+
+
+def cache_layer_geometry(graph: Graph, layer: int, label: str = 'I') -> int:
+    """
+    Computes geometries of triangles of interiors with `label` from `layer`
+    in one batch and caches them for `get_triangle_geometry`.
+
+    Returns the number of cached geometries.
+    """
+    (interiors, corners, triangles) = layer_triangles(graph, layer, label)
+    if not interiors:
+        return 0
+    (corner_order, edge_order, lengths, longest) = triangle_orders(triangles)
+    node_positions = graph.nodes(data='position')
+    cache = graph.graph.setdefault('geometry', {})
+    for interior, triangle, ccw, ranks, triangle_lengths, k in zip(
+            interiors, corners, corner_order.tolist(), edge_order.tolist(), lengths.tolist(), longest.tolist()):
+        cache[interior] = TriangleGeometry(triangle, tuple(node_positions[v] for v in triangle),
+                                           tuple(triangle[i] for i in ccw), tuple(triangle_lengths), k, tuple(ranks))
+    return len(interiors)
+
@@ -0,0 +1,610 @@
+"""
+Columnar graph backend for layered graphs.
+
+`LayeredGraph` is an alternative to `networkx.Graph` which keeps the node
+attributes used by the grammar (`layer`, `position` and `label`) in NumPy
+columns instead of per-node dictionaries. Adjacency is kept in growable
+integer arrays, one row of neighbor slots per node. Neighbors of each node
+are partitioned into the ones on the same layer, on upper layers and on
+lower layers, see `layer_neighbors`.
+
+The class implements the subset of the `networkx.Graph` API used by the
+productions and the `agh_graphs.utils` module, so both backends can be used
+interchangeably, e.g.:
+
+    graph = LayeredGraph()
+    graph.add_node(gen_name(graph), layer=0, position=(0.5, 0.5), label='E')
+    P1().apply(graph, ...)
+
+Attributes other than `layer`, `position` and `label` are supported, but they
+are stored in a regular dictionary.
+
+Nodes are indexed by layer and by (layer, label), see `layer_nodes`.
+There is also a spatial hash of node positions on each layer, see `nodes_at`.
+Exact positions (see `agh_graphs.exact`) are kept as they are, the columns
+hold their float approximations.
+
+It is not the faster backend: every attribute read and adjacency change goes
+through a NumPy element access, which costs more than the dictionary lookups
+of `networkx.Graph`, so `derive_e()` runs about 2.5x slower on it, with about
+16% less memory (see `benchmarks.backend`). Reads of whole layers, e.g.
+`agh_graphs.geometry.cache_layer_geometry`, and the layer and spatial indexes
+are where it gains.
+"""
+from collections.abc import Mapping, MutableMapping
+
+import networkx
+import numpy as np
+from networkx import NetworkXError
+
+from agh_graphs.exact import is_exact
+from agh_graphs.node_index import NodeIndex
+from agh_graphs.utils import copy_graph_attributes
+
+_HAS_LAYER = 1
+_HAS_POSITION = 2
+_HAS_LABEL = 4
+
+_COLUMN_ATTRIBUTES = ('layer', 'position', 'label')
+
+# adjacency partitions: neighbors on the same layer, on upper (smaller) layers and on lower (greater) layers
+_SAME = 0
+_UPPER = 1
+_LOWER = 2
+_PARTITIONS = (_SAME, _UPPER, _LOWER)
+
+
+class LayeredGraph:
+    def __init__(self, capacity: int = 64, max_degree: int = 8):
+        # graph attributes, the same as `networkx.Graph.graph`
+        self.graph = {}
+
+        self._slots = {}
+        self._names = []
+        self._free = []
+        self._size = 0
+
+        self._layer = np.zeros(capacity, dtype=np.int32)
+        self._x = np.zeros(capacity, dtype=np.float64)
+        self._y = np.zeros(capacity, dtype=np.float64)
+        self._label = np.zeros(capacity, dtype=np.uint8)
+        self._flags = np.zeros(capacity, dtype=np.uint8)
+        self._labels = []
+        self._label_codes = {}
+        self._extra = {}
+        # exact positions (see `agh_graphs.exact`), columns keep their float approximations
+        self._exact = {}
+
+        # only interiors have neighbors on other layers, usually a parent and a few children
+        self._adj = [np.zeros((capacity, max_degree if part == _SAME else 2), dtype=np.int32)
+                     for part in _PARTITIONS]
+        self._degree = np.zeros((capacity, len(_PARTITIONS)), dtype=np.int32)
+        self._edge_count = 0
+
+        # layer, (layer, label) and spatial indexes
+        self._node_index = NodeIndex()
+
+    # ---- views ----
+
+    @property
+    def nodes(self):
+        return NodeView(self)
+
+    @property
+    def edges(self):
+        return EdgeView(self)
+
+    def __iter__(self):
+        return iter(self._slots)
+
+    def __len__(self):
+        return len(self._slots)
+
+    def __contains__(self, n):
+        try:
+            return n in self._slots
+        except TypeError:
+            return False
+
+    def number_of_nodes(self):
+        return len(self._slots)
+
+    def number_of_edges(self):
+        return self._edge_count
+
+    def has_node(self, n):
+        return n in self
+
+    def layer_nodes(self, layer: int, label: str = None) -> list:
+        """
+        Returns nodes which lay on `layer`, in the order they were added.
+        If `label` is not `None` only nodes with this label are returned.
+        """
+        return self._node_index.layer_nodes(layer, label)
+
+    def layer_neighbors(self, n, layer: int) -> list:
+        """
+        Returns neighbors of `n` which lay on `layer`.
+
+        Only the adjacency partition which contains `layer` is read, so
+        e.g. neighbors on the layer of `n` are returned without any filtering.
+        """
+        slot = self._slot(n)
+        names = self._names
+        if not self._flags[slot] & _HAS_LAYER:
+            return [names[s] for s in self._neighbor_slots(slot)
+                    if self._flags[s] & _HAS_LAYER and self._layer[s] == layer]
+
+        node_layer = self._layer[slot]
+        if layer == node_layer:
+            part = _SAME
+        elif layer < node_layer:
+            part = _UPPER
+        else:
+            part = _LOWER
+        slots = self._adj[part][slot, :self._degree[slot, part]]
+        if part != _SAME:
+            slots = slots[self._layer[slots] == layer]
+        return [names[s] for s in slots.tolist()]
+
+    def nodes_at(self, layer: int, position, rel_tol: float = None) -> list:
+        """
+        Returns nodes on `layer` at `position`.
+
+        If `rel_tol` is `None` positions are compared exactly, otherwise
+        positions are compared coordinate-wise using `math.isclose(..., rel_tol=rel_tol)`.
+        Cells within the tolerance are read, unless there are more of them than
+        nodes on `layer` (far from the origin), then the layer is scanned.
+        """
+        return self._node_index.nodes_at(layer, position, rel_tol, self._position)
+
+    # ---- nodes ----
+
+    def add_node(self, node_for_adding, **attr):
+        slot = self._slots.get(node_for_adding)
+        if slot is None:
+            if node_for_adding is None:
+                raise ValueError('None cannot be a node')
+            slot = self._new_slot(node_for_adding)
+        for key, value in attr.items():
+            self._set_attribute(slot, key, value)
+
+    def add_nodes_from(self, nodes_for_adding, **attr):
+        for n in nodes_for_adding:
+            if isinstance(n, tuple) and len(n) == 2 and isinstance(n[1], Mapping):
+                (n, node_attr) = n
+                self.add_node(n, **attr)
+                self.add_node(n, **node_attr)
+            else:
+                self.add_node(n, **attr)
+
+    def remove_node(self, n):
+        slot = self._slot(n)
+        self._edge_count -= len(self._detach(slot))
+        self._unindex(slot, 'layer')
+        self._flags[slot] = 0
+        self._extra.pop(slot, None)
+        self._exact.pop(slot, None)
+        self._names[slot] = None
+        self._free.append(slot)
+        del self._slots[n]
+
+    def remove_nodes_from(self, nodes):
+        for n in nodes:
+            if n in self._slots:
+                self.remove_node(n)
+
+    # ---- edges ----
+
+    def add_edge(self, u_of_edge, v_of_edge):
+        u = self._slots.get(u_of_edge)
+        if u is None:
+            self.add_node(u_of_edge)
+            u = self._slots[u_of_edge]
+        v = self._slots.get(v_of_edge)
+        if v is None:
+            self.add_node(v_of_edge)
+            v = self._slots[v_of_edge]
+        if self._linked(u, v):
+            return
+        self._link(u, v)
+        self._edge_count += 1
+
+    def add_edges_from(self, ebunch_to_add):
+        for (u, v) in ebunch_to_add:
+            self.add_edge(u, v)
+
+    def remove_edge(self, u, v):
+        u_slot = self._slots.get(u)
+        v_slot = self._slots.get(v)
+        if u_slot is None or v_slot is None or not self._linked(u_slot, v_slot):
+            raise NetworkXError('The edge {}-{} is not in the graph'.format(u, v))
+        self._unlink(u_slot, v_slot)
+        self._edge_count -= 1
+
+    def remove_edges_from(self, ebunch):
+        for (u, v) in ebunch:
+            if self.has_edge(u, v):
+                self.remove_edge(u, v)
+
+    def has_edge(self, u, v):
+        u_slot = self._slots.get(u)
+        v_slot = self._slots.get(v)
+        if u_slot is None or v_slot is None:
+            return False
+        return self._linked(u_slot, v_slot)
+
+    def neighbors(self, n):
+        names = self._names
+        return iter([names[s] for s in self._neighbor_slots(self._slot(n))])
+
+    def reorder_neighbors(self, n, order):
+        """
+        Sorts neighbors of `n` within every adjacency part by their index in
+        `order`, neighbors which are not in `order` are kept after the others.
+        Used to restore the order of neighbors, see `agh_graphs.transaction`.
+        """
+        slot = self._slot(n)
+        slots = self._slots
+        ranks = {slots[v]: rank for rank, v in enumerate(order) if v in slots}
+        for part in _PARTITIONS:
+            degree = self._degree.item(slot, part)
+            row = self._adj[part][slot]
+            row[:degree] = sorted(row[:degree].tolist(), key=lambda s: ranks.get(s, len(ranks)))
+
+    # ---- conversion ----
+
+    def copy(self):
+        graph = LayeredGraph(capacity=max(len(self), 1))
+        graph.graph = copy_graph_attributes(self.graph)
+        graph.add_nodes_from((n, dict(self.nodes[n])) for n in self)
+        graph.add_edges_from(self.edges())
+        return graph
+
+    def to_networkx(self, nodes=None) -> networkx.Graph:
+        """
+        Returns a `networkx.Graph` with the same nodes, attributes and edges.
+
+        If `nodes` is not `None` the subgraph induced by `nodes` is returned.
+        """
+        graph = networkx.Graph()
+        graph.graph.update(self.graph)
+        if nodes is None:
+            graph.add_nodes_from((n, dict(self.nodes[n])) for n in self)
+            graph.add_edges_from(self.edges())
+        else:
+            nodes = set(nodes)
+            graph.add_nodes_from((n, dict(self.nodes[n])) for n in nodes)
+            graph.add_edges_from((u, v) for u in nodes for v in self.neighbors(u) if v in nodes)
+        return graph
+
+    @staticmethod
+    def from_networkx(graph: networkx.Graph) -> 'LayeredGraph':
+        """
+        Returns a `LayeredGraph` with the same nodes, attributes and edges as `graph`.
+        """
+        layered = LayeredGraph(capacity=max(len(graph), 1))
+        layered.graph.update(graph.graph)
+        layered.add_nodes_from(graph.nodes(data=True))
+        layered.add_edges_from(graph.edges())
+        return layered
+
+    # ---- internals ----
+
+    def _slot(self, n):
+        try:
+            return self._slots[n]
+        except (KeyError, TypeError):
+            raise NetworkXError('The node {} is not in the graph.'.format(n))
+
+    def _new_slot(self, n):
+        if self._free:
+            slot = self._free.pop()
+            self._names[slot] = n
+        else:
+            slot = self._size
+            if slot == len(self._layer):
+                self._grow_rows(max(2 * slot, 1))
+            self._size += 1
+            self._names.append(n)
+        self._slots[n] = slot
+        return slot
+
+    def _grow_rows(self, capacity):
+        self._layer = _resized(self._layer, capacity)
+        self._x = _resized(self._x, capacity)
+        self._y = _resized(self._y, capacity)
+        self._label = _resized(self._label, capacity)
+        self._flags = _resized(self._flags, capacity)
+        self._degree = _resized(self._degree, capacity)
+        self._adj = [_resized(adj, capacity) for adj in self._adj]
+
+    def _part(self, u, v):
+        """
+        Returns the partition of the adjacency of `u` which contains `v`.
+        """
+        flags = self._flags
+        if not flags.item(u) & flags.item(v) & _HAS_LAYER:
+            return _SAME
+        u_layer = self._layer.item(u)
+        v_layer = self._layer.item(v)
+        if u_layer == v_layer:
+            return _SAME
+        return _UPPER if v_layer < u_layer else _LOWER
+
+    def _neighbor_slots(self, slot):
+        degree = self._degree[slot]
+        if not degree[_UPPER] and not degree[_LOWER]:
+            return self._adj[_SAME][slot, :degree[_SAME]].tolist()
+        return [s for part in _PARTITIONS for s in self._adj[part][slot, :degree[part]].tolist()]
+
+    def _linked(self, u, v):
+        part = self._part(u, v)
+        degree = self._degree.item(u, part)
+        return degree > 0 and v in self._adj[part][u, :degree].tolist()
+
+    def _link(self, u, v):
+        part = self._part(u, v)
+        self._append(u, v, part)
+        if u != v:
+            self._append(v, u, _SAME if part == _SAME else _UPPER + _LOWER - part)
+
+    def _append(self, u, v, part):
+        adj = self._adj[part]
+        degree = self._degree[u, part]
+        if degree == adj.shape[1]:
+            adj = np.zeros((len(adj), degree + max(degree // 2, 1)), dtype=adj.dtype)
+            adj[:, :degree] = self._adj[part]
+            self._adj[part] = adj
+        adj[u, degree] = v
+        self._degree[u, part] = degree + 1
+
+    def _unlink(self, u, v):
+        part = self._part(u, v)
+        self._pop(u, v, part)
+        if u != v:
+            self._pop(v, u, _SAME if part == _SAME else _UPPER + _LOWER - part)
+
+    def _pop(self, u, v, part):
+        # the following neighbors are shifted left, so neighbors stay in the order
+        # they were added, like in `networkx.Graph`
+        row = self._adj[part][u]
+        last = self._degree.item(u, part) - 1
+        i = row[:last + 1].tolist().index(v)
+        row[i:last] = row[i + 1:last + 1]
+        self._degree[u, part] = last
+
+    def _detach(self, slot):
+        """
+        Removes all edges of `slot` and returns its neighbors.
+        """
+        neighbors = self._neighbor_slots(slot)
+        for neighbor in neighbors:
+            self._unlink(slot, neighbor)
+        return neighbors
+
+    def _label_code(self, label):
+        code = self._label_codes.get(label)
+        if code is None:
+            code = len(self._labels)
+            self._labels.append(label)
+            self._label_codes[label] = code
+        return code
+
+    def _get_attribute(self, slot, key):
+        flags = self._flags[slot]
+        if key == 'layer':
+            if flags & _HAS_LAYER:
+                return int(self._layer[slot])
+        elif key == 'position':
+            if flags & _HAS_POSITION:
+                if self._exact and slot in self._exact:
+                    return self._exact[slot]
+                return float(self._x[slot]), float(self._y[slot])
+        elif key == 'label':
+            if flags & _HAS_LABEL:
+                return self._labels[self._label[slot]]
+        elif slot in self._extra:
+            return self._extra[slot][key]
+        raise KeyError(key)
+
+    def _set_attribute(self, slot, key, value):
+        if key == 'layer':
+            self._unindex(slot, key)
+            neighbors = self._detach(slot)
+            self._layer[slot] = value
+            self._flags[slot] |= _HAS_LAYER
+            for neighbor in neighbors:
+                self._link(slot, neighbor)
+            self._index(slot, key)
+        elif key == 'position':
+            self._unindex(slot, key)
+            (x, y) = value
+            (self._x[slot], self._y[slot]) = (float(x), float(y))
+            if is_exact(x) or is_exact(y):
+                self._exact[slot] = (x, y)
+            else:
+                self._exact.pop(slot, None)
+            self._flags[slot] |= _HAS_POSITION
+            self._index(slot, key)
+        elif key == 'label':
+            self._unindex(slot, key)
+            self._label[slot] = self._label_code(value)
+            self._flags[slot] |= _HAS_LABEL
+            self._index(slot, key)
+        else:
+            self._extra.setdefault(slot, {})[key] = value
+
+    def _del_attribute(self, slot, key):
+        if key in _COLUMN_ATTRIBUTES:
+            flag = _HAS_LAYER if key == 'layer' else _HAS_POSITION if key == 'position' else _HAS_LABEL
+            if not self._flags[slot] & flag:
+                raise KeyError(key)
+            self._unindex(slot, key)
+            neighbors = self._detach(slot) if key == 'layer' else []
+            if key == 'position':
+                self._exact.pop(slot, None)
+            self._flags[slot] &= 0xFF ^ flag
+            for neighbor in neighbors:
+                self._link(slot, neighbor)
+        else:
+            del self._extra.get(slot, {})[key]
+
+    def _index_keys(self, slot, attribute):
+        """
+        Returns pairs (index, key) of the entries of `slot` in the node index
+        which depend on `attribute`, see `NodeIndex.keys`.
+        """
+        flags = self._flags[slot]
+        if not flags & _HAS_LAYER:
+            return []
+        label = self._labels[self._label[slot]] if flags & _HAS_LABEL else None
+        position = (self._x[slot], self._y[slot]) if flags & _HAS_POSITION else None
+        return self._node_index.keys(int(self._layer[slot]), label, position, attribute)
+
+    def _index(self, slot, attribute):
+        self._node_index.add(self._names[slot], self._index_keys(slot, attribute))
+
+    def _unindex(self, slot, attribute):
+        self._node_index.remove(self._names[slot], self._index_keys(slot, attribute))
+
+    def _position(self, n):
+        slot = self._slots[n]
+        return self._get_attribute(slot, 'position') if self._flags[slot] & _HAS_POSITION else None
+
+    def _attribute_keys(self, slot):
+        flags = self._flags[slot]
+        keys = [key for key, flag in zip(_COLUMN_ATTRIBUTES, (_HAS_LAYER, _HAS_POSITION, _HAS_LABEL))
+                if flags & flag]
+        return keys + list(self._extra.get(slot, ()))
+
+
+def _resized(array, capacity):
+    resized = np.zeros((capacity,) + array.shape[1:], dtype=array.dtype)
+    resized[:len(array)] = array
+    return resized
+
+
+class NodeAttributes(MutableMapping):
+    """
+    Attributes of a single node, backed by the columns of `LayeredGraph`.
+    """
+
+    __slots__ = ('_graph', '_slot')
+
+    def __init__(self, graph: LayeredGraph, slot: int):
+        self._graph = graph
+        self._slot = slot
+
+    def __getitem__(self, key):
+        return self._graph._get_attribute(self._slot, key)
+
+    def __setitem__(self, key, value):
+        self._graph._set_attribute(self._slot, key, value)
+
+    def __delitem__(self, key):
+        self._graph._del_attribute(self._slot, key)
+
+    def __iter__(self):
+        return iter(self._graph._attribute_keys(self._slot))
+
+    def __len__(self):
+        return len(self._graph._attribute_keys(self._slot))
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class NodeView(Mapping):
+    """
+    Equivalent of `networkx.classes.reportviews.NodeView`.
+    """
+
+    __slots__ = ('_graph',)
+
+    def __init__(self, graph: LayeredGraph):
+        self._graph = graph
+
+    def __call__(self, data=False, default=None):
+        if data is False:
+            return self
+        return NodeDataView(self._graph, data, default)
+
+    def __getitem__(self, n):
+        return NodeAttributes(self._graph, self._graph._slot(n))
+
+    def __iter__(self):
+        return iter(self._graph._slots)
+
+    def __len__(self):
+        return len(self._graph._slots)
+
+    def __contains__(self, n):
+        return n in self._graph
+
+
+class NodeDataView:
+    """
+    Equivalent of `networkx.classes.reportviews.NodeDataView`.
+    """
+
+    __slots__ = ('_graph', '_data', '_default')
+
+    def __init__(self, graph: LayeredGraph, data, default):
+        self._graph = graph
+        self._data = data
+        self._default = default
+
+    def __len__(self):
+        return len(self._graph)
+
+    def __contains__(self, n):
+        return n in self._graph
+
+    def __iter__(self):
+        for n, slot in self._graph._slots.items():
+            yield n, self._value(slot)
+
+    def __getitem__(self, n):
+        return self._value(self._graph._slot(n))
+
+    def _value(self, slot):
+        if self._data is True:
+            return NodeAttributes(self._graph, slot)
+        try:
+            return self._graph._get_attribute(slot, self._data)
+        except KeyError:
+            return self._default
+
+
+class EdgeView:
+    """
+    Equivalent of `networkx.classes.reportviews.EdgeView`, every edge
+    is reported once.
+    """
+
+    __slots__ = ('_graph',)
+
+    def __init__(self, graph: LayeredGraph):
+        self._graph = graph
+
+    def __call__(self):
+        return self
+
+    def __len__(self):
+        return self._graph._edge_count
+
+    def __iter__(self):
+        graph = self._graph
+        names = graph._names
+        for n, u in graph._slots.items():
+            # edges between layers are reported by the node on the upper layer
+            for v in graph._adj[_SAME][u, :graph._degree[u, _SAME]].tolist():
+                if u <= v:
+                    yield n, names[v]
+            for v in graph._adj[_LOWER][u, :graph._degree[u, _LOWER]].tolist():
+                yield n, names[v]
+
+    def __contains__(self, edge):
+        (u, v) = edge
+        return self._graph.has_edge(u, v)
@@ -0,0 +1,167 @@
+"""
+Automatic matching of stitching productions.
+
+P6, P7, P12 and P13 join vertices of a layer which were copied from the same
+edge of the layer above, but by refinements of two different interiors.
+`find_matches` finds every place between `layer` and `layer + 1` where one of
+these productions can be applied, `stitch` applies them until nothing is left:
+
+    P2().apply(graph, [i1])
+    P2().apply(graph, [i2])
+    stitch(graph)
+
+Matching does not try combinations of interiors. Pairs of `i` interiors which
+share an edge are found by grouping interiors by their edges, then children
+of every interior are split by positions of their vertices on the shared edge.
+"""
+from itertools import combinations
+from typing import Iterator, List, Tuple
+
+from networkx import Graph
+
+from agh_graphs.production import Match, Production
+from agh_graphs.productions.p6 import P6
+from agh_graphs.productions.p7 import P7
+from agh_graphs.productions.p12 import P12
+from agh_graphs.productions.p13 import P13
+from agh_graphs.utils import get_neighbors_at, get_vertices_from_layer, join_vertices
+
+STITCHING = (P6, P7, P12, P13)
+
+
+def find_matches(graph: Graph, layer: int, productions=STITCHING) -> Iterator[Match]:
+    """
+    Yields matches of `productions` (classes from `STITCHING`) which join
+    vertices of `layer + 1` under pairs of `i` interiors from `layer`.
+
+    Whether matches are validated depends on the execution mode of `graph`
+    (see `agh_graphs.execution`). Matches are valid until `graph` is changed.
+    """
+    instances = {production: production() for production in productions}
+
+    for upper_interiors, (children1, line1), (children2, line2) in _sites(graph, layer):
+        merged = sum(1 for position, v in line1.items() if line2[position] == v)
+        if len(children1) == 1:
+            production = {0: P12, 1: P13}.get(merged)
+        else:
+            production = {0: P6, 1: P7}.get(merged)
+        if production not in instances:
+            continue
+
+        prod_input = list(upper_interiors) + children1 + children2
+        yield instances[production].match_input(graph, prod_input)
+
+
+def shared_edges(graph: Graph, layer: int) -> Iterator[Tuple[Tuple[str, str], List[str]]]:
+    """
+    Yields edges of `layer` shared by two `i` interiors, as `((v1, v2), [i1, i2])`.
+    """
+    interiors_by_edge = {}
+    for interior in get_vertices_from_layer(graph, layer, 'i'):
+        for v1, v2 in combinations(get_neighbors_at(graph, interior, layer), 2):
+            interiors = interiors_by_edge.setdefault(frozenset((v1, v2)), [])
+            if not interiors:
+                interiors.append((v1, v2))
+            interiors.append(interior)
+
+    for [edge, *interiors] in interiors_by_edge.values():
+        if len(interiors) == 2 and graph.has_edge(*edge):
+            yield edge, interiors
+
+
+def conformize(graph: Graph, layer: int) -> int:
+    """
+    Joins vertices of `layer + 1` which stitching productions would join,
+    like `stitch(graph, [layer])`, but all at once: vertices on both sides
+    of every shared edge are grouped by position, groups which share vertices
+    (e.g. ends of two edges) are united, and edges of all joined vertices are
+    moved to the kept ones in one pass (see `join_vertices`).
+
+    Sites are recognized like in `find_matches`, but not validated by the productions.
+
+    Returns the number of removed vertices.
+    """
+    pairs = []
+    for _, (_, line1), (_, line2) in _sites(graph, layer):
+        pairs.extend((v1, line2[position]) for position, v1 in line1.items())
+    return len(join_vertices(graph, pairs, layer + 1))
+
+
+def stitch(graph: Graph, layers: List[int] = None, productions=STITCHING) -> int:
+    """
+    Applies matches of `productions` (see `find_matches`) on pairs of `layers`,
+    from the top one, until there are no more matches.
+    By default all layers of `graph` are stitched.
+
+    Returns the number of applied productions.
+    """
+    if layers is None:
+        layers = sorted(set(layer for _, layer in graph.nodes(data='layer')))
+
+    applied = 0
+    for layer in layers:
+        while True:
+            rewritten = set()
+            applied_on_layer = 0
+            for match in list(find_matches(graph, layer, productions)):
+                production = match.production
+                vertices = production.rewritten_vertices(match)
+                if rewritten.intersection(vertices):
+                    # an earlier match changed these vertices, match them again
+                    continue
+                rewritten.update(vertices)
+                production.apply(graph, match)
+                applied_on_layer += 1
+            if applied_on_layer == 0:
+                break
+            applied += applied_on_layer
+    return applied
+
+
+def _sites(graph: Graph, layer: int):
+    """
+    Yields edges of `layer` shared by two `i` interiors, whose children on
+    `layer + 1` can be stitched, as `(interiors, side1, side2)`, where sides
+    are results of `_edge_side` with the same number of children.
+    """
+    node_positions = graph.nodes(data='position')
+    for (v1, v2), upper_interiors in shared_edges(graph, layer):
+        pos_v1 = node_positions[v1]
+        pos_v2 = node_positions[v2]
+        pos_center = ((pos_v1[0] + pos_v2[0]) / 2, (pos_v1[1] + pos_v2[1]) / 2)
+        sides = [_edge_side(graph, interior, layer + 1, (pos_v1, pos_v2, pos_center))
+                 for interior in upper_interiors]
+        if None in sides or len(sides[0][0]) != len(sides[1][0]):
+            continue
+        yield upper_interiors, sides[0], sides[1]
+
+
+def _edge_side(graph: Graph, interior, lower_layer: int, line_positions):
+    """
+    Returns children of `interior` on `lower_layer` which touch the edge with
+    `line_positions` (its ends and center) and their vertices on the edge
+    by position, or `None` if the children cannot be stitched.
+    """
+    node_positions = graph.nodes(data='position')
+    node_labels = graph.nodes(data='label')
+    children = []
+    line = {}
+    for child in get_neighbors_at(graph, interior, lower_layer):
+        on_line = {}
+        for v in get_neighbors_at(graph, child, lower_layer):
+            position = node_positions[v]
+            if position in line_positions:
+                on_line[position] = v
+        if len(on_line) < 2:
+            continue
+        if node_labels[child] != 'I':
+            return None
+        children.append(child)
+        line.update(on_line)
+
+    (pos_v1, pos_v2, pos_center) = line_positions
+    if len(children) == 1 and pos_center not in line:
+        return children, line
+    if len(children) == 2 and len(line) == 3:
+        return children, line
+    return None
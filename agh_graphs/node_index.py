@@ -0,0 +1,151 @@
+"""
+Indexes of nodes by layer, by (layer, label) and by layer and position.
+
+`NodeIndex` is kept by the backends which see every change of a node:
+`LayeredGraph` and `CompactGraph` (see `agh_graphs.node_record`). They expose
+it as `layer_nodes` and `nodes_at`, which `get_vertices_from_layer` and
+`get_node_at` use instead of scanning all nodes of the graph.
+
+Positions are hashed into square cells on each layer. Exact lookups read one
+cell, lookups with a tolerance read the cells within it, or the whole layer if
+there are more such cells than nodes on it (far from the origin).
+
+Entries are keyed by the attributes they depend on. `keys` returns them for
+one changed attribute, a change of `layer` (or adding and removing a node)
+touches all of them:
+
+    index.remove(n, index.keys(layer, label, position, 'label'))
+    label = new_label
+    index.add(n, index.keys(layer, label, position, 'label'))
+"""
+import math
+
+# side of a cell of the spatial index is 1 / _CELLS_PER_UNIT
+_CELLS_PER_UNIT = 2 ** 20
+
+
+class NodeIndex:
+    """
+    Nodes by layer, by (layer, label) and by (layer, cell x, cell y), in the
+    order they were indexed.
+    """
+
+    def __init__(self):
+        # dicts of nodes are used as ordered sets
+        self.layers = {}
+        self.layer_labels = {}
+        # (layer, cell x, cell y) -> node, almost every cell holds a single node,
+        # cells with more nodes are moved to the overflow index (key -> ordered set)
+        self.cells = {}
+        self.overflow = {}
+
+    def keys(self, layer, label, position, attribute: str) -> list:
+        """
+        Returns pairs (index, key) of the entries of a node which depend on
+        `attribute`, the index is `None` for the spatial index. Missing
+        attributes are `None`, nodes without a layer are not indexed.
+        """
+        if layer is None:
+            return []
+        keys = []
+        if attribute == 'layer':
+            keys.append((self.layers, layer))
+        if label is not None and attribute != 'position':
+            keys.append((self.layer_labels, (layer, label)))
+        if position is not None and attribute != 'label':
+            (x, y) = position
+            keys.append((None, (layer, _cell(float(x)), _cell(float(y)))))
+        return keys
+
+    def add(self, n, keys):
+        for index, key in keys:
+            if index is not None:
+                index.setdefault(key, {})[n] = None
+            elif key in self.overflow:
+                self.overflow[key][n] = None
+            elif key in self.cells:
+                self.overflow[key] = {self.cells.pop(key): None, n: None}
+            else:
+                self.cells[key] = n
+
+    def remove(self, n, keys):
+        for index, key in keys:
+            if index is None:
+                if key in self.cells:
+                    del self.cells[key]
+                    continue
+                index = self.overflow
+            nodes = index[key]
+            del nodes[n]
+            if not nodes:
+                del index[key]
+            elif len(nodes) == 1 and index is self.overflow:
+                [self.cells[key]] = index.pop(key)
+
+    def clear(self):
+        self.layers.clear()
+        self.layer_labels.clear()
+        self.cells.clear()
+        self.overflow.clear()
+
+    def layer_nodes(self, layer: int, label: str = None) -> list:
+        """
+        Returns nodes which lay on `layer`, in the order they were added.
+        If `label` is not `None` only nodes with this label are returned,
+        in the order they were given it.
+        """
+        if label is None:
+            return list(self.layers.get(layer, ()))
+        return list(self.layer_labels.get((layer, label), ()))
+
+    def nodes_at(self, layer: int, position, rel_tol: float, positions) -> list:
+        """
+        Returns nodes on `layer` at `position`, `positions(n)` is the position
+        of `n` or `None`.
+
+        If `rel_tol` is `None` positions are compared exactly, otherwise
+        positions are compared coordinate-wise using `math.isclose(..., rel_tol=rel_tol)`.
+        """
+        (x, y) = position
+        if rel_tol is None:
+            nodes = self._cell_nodes((layer, _cell(float(x)), _cell(float(y))))
+            return [n for n in nodes if positions(n) == position]
+
+        (cells_x, cells_y) = (_cell_range(float(x), rel_tol), _cell_range(float(y), rel_tol))
+        layer_nodes = self.layers.get(layer, ())
+        if len(cells_x) * len(cells_y) > len(layer_nodes):
+            # the tolerance of far coordinates spans many cells, scanning the layer is cheaper
+            candidates = layer_nodes
+        else:
+            candidates = [n for cell_x in cells_x for cell_y in cells_y
+                          for n in self._cell_nodes((layer, cell_x, cell_y))]
+        nodes = []
+        for n in candidates:
+            n_position = positions(n)
+            if n_position is None:
+                continue
+            (n_x, n_y) = n_position
+            if math.isclose(x, n_x, rel_tol=rel_tol) and math.isclose(y, n_y, rel_tol=rel_tol):
+                nodes.append(n)
+        return nodes
+
+    def _cell_nodes(self, key):
+        """
+        Returns nodes in the cell `key` of the spatial index.
+        """
+        n = self.cells.get(key)
+        if n is not None:
+            return (n,)
+        return self.overflow.get(key, ())
+
+
+def _cell(coordinate) -> int:
+    # multiplying by a power of two is exact, so equal coordinates always fall into the same cell
+    return math.floor(coordinate * _CELLS_PER_UNIT)
+
+
+def _cell_range(coordinate, rel_tol):
+    # isclose(a, b) implies |a - b| <= rel_tol * |a| / (1 - rel_tol),
+    # one more cell on each side covers rounding errors
+    distance = rel_tol * abs(coordinate) / (1 - rel_tol)
+    return range(_cell(coordinate - distance) - 1, _cell(coordinate + distance) + 2)
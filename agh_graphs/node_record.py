@@ -0,0 +1,268 @@
+"""
+Compact node attributes for `networkx.Graph`.
+
+By default every node and every edge of a `networkx.Graph` keeps its attributes
+in a new dictionary. `NodeRecord` is a mapping built on `__slots__` which keeps
+`layer`, `position` and an interned `label` in fixed fields, other attributes
+are kept in a dictionary created on demand. Productions do not set attributes
+of edges, so `EdgeRecord` only keeps a dictionary created on demand.
+
+`CompactGraph` is a `networkx.Graph` which uses `NodeRecord` as its
+`node_attr_dict_factory` and `EdgeRecord` as its `edge_attr_dict_factory`:
+
+    graph = CompactGraph()
+    graph.add_node(gen_name(graph), layer=0, position=(0.5, 0.5), label='E')
+    P1().apply(graph, ...)
+
+On `derive_e()` records save about 190 bytes per node, the node index takes
+them back and about 140 more (see `benchmarks.backend`). The rest of the memory of
+a node is its adjacency dictionary and the entries which refer to it in the
+adjacency dictionaries of its neighbors, which `networkx.Graph` needs, and the
+indexes kept in `graph.graph`.
+
+Nodes of `CompactGraph` are kept in `IndexedNodes`, its `node_dict_factory`.
+Records added to it are bound to their node, so changes of `layer`, `label` and
+`position` (by productions, `join_overlapping_vertices`, `pull_vertices_apart`
+or directly) update a `NodeIndex`. `get_vertices_from_layer` reads only one
+layer and `get_node_at` only a few cells of the spatial index, see
+`CompactGraph.layer_nodes` and `CompactGraph.nodes_at`.
+"""
+import sys
+from collections.abc import MutableMapping
+
+import networkx
+
+from agh_graphs.node_index import NodeIndex
+
+_FIELDS = ('layer', 'position', 'label')
+
+
+class NodeRecord(MutableMapping):
+    """
+    Node attributes with slots for `layer`, `position` and `label`.
+
+    A record of a node of `CompactGraph` is bound to its `IndexedNodes`, which
+    is told about changes of these attributes.
+    """
+    __slots__ = ('_layer', '_position', '_label', '_extra', '_nodes', '_node')
+
+    def __init__(self, *args, **kwargs):
+        self._extra = None
+        self._nodes = None
+        if args or kwargs:
+            self.update(*args, **kwargs)
+
+    def __getitem__(self, key):
+        try:
+            if key == 'layer':
+                return self._layer
+            if key == 'position':
+                return self._position
+            if key == 'label':
+                return self._label
+        except AttributeError:
+            raise KeyError(key) from None
+        if self._extra is None:
+            raise KeyError(key)
+        return self._extra[key]
+
+    def __setitem__(self, key, value):
+        if key not in _FIELDS:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+            return
+        nodes = self._nodes
+        if nodes is not None:
+            nodes.unindex(self, key)
+        if key == 'layer':
+            self._layer = value
+        elif key == 'position':
+            self._position = value
+        else:
+            self._label = sys.intern(value) if type(value) is str else value
+        if nodes is not None:
+            nodes.index(self, key)
+
+    def __delitem__(self, key):
+        if key not in _FIELDS:
+            if self._extra is None:
+                raise KeyError(key)
+            del self._extra[key]
+            if not self._extra:
+                self._extra = None
+            return
+        if key not in self:
+            raise KeyError(key)
+        nodes = self._nodes
+        if nodes is not None:
+            nodes.unindex(self, key)
+        delattr(self, '_' + key)
+        if nodes is not None:
+            nodes.index(self, key)
+
+    def __contains__(self, key):
+        if key == 'layer':
+            return hasattr(self, '_layer')
+        if key == 'position':
+            return hasattr(self, '_position')
+        if key == 'label':
+            return hasattr(self, '_label')
+        return self._extra is not None and key in self._extra
+
+    def __iter__(self):
+        for key in _FIELDS:
+            if key in self:
+                yield key
+        if self._extra is not None:
+            yield from self._extra
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def update(self, *args, **kwargs):
+        nodes = self._nodes
+        if nodes is None or hasattr(self, '_layer'):
+            super().update(*args, **kwargs)
+            return
+        # a node without a layer has no entries in the index, e.g. a node just added
+        # by `networkx.Graph.add_node`, so it is indexed once after all attributes are set
+        self._nodes = None
+        try:
+            super().update(*args, **kwargs)
+        finally:
+            self._nodes = nodes
+            nodes.index(self, 'layer')
+
+    def copy(self):
+        return NodeRecord(self)
+
+    def __reduce__(self):
+        # copies are not bound, `IndexedNodes` binds them when they are added
+        return NodeRecord, (dict(self),)
+
+    def __repr__(self):
+        return '{}({})'.format(type(self).__name__, dict(self))
+
+
+class EdgeRecord(MutableMapping):
+    """
+    Edge attributes, the dictionary is created when the first attribute is set.
+    """
+    __slots__ = ('_extra',)
+
+    def __init__(self, *args, **kwargs):
+        self._extra = None
+        if args or kwargs:
+            self.update(*args, **kwargs)
+
+    def __getitem__(self, key):
+        if self._extra is None:
+            raise KeyError(key)
+        return self._extra[key]
+
+    def __setitem__(self, key, value):
+        if self._extra is None:
+            self._extra = {}
+        self._extra[key] = value
+
+    def __delitem__(self, key):
+        if self._extra is None:
+            raise KeyError(key)
+        del self._extra[key]
+        if not self._extra:
+            self._extra = None
+
+    def __iter__(self):
+        return iter(self._extra or ())
+
+    def __len__(self):
+        return len(self._extra) if self._extra is not None else 0
+
+    def copy(self):
+        return EdgeRecord(self)
+
+    def __repr__(self):
+        return '{}({})'.format(type(self).__name__, dict(self))
+
+
+class IndexedNodes(dict):
+    """
+    Node dictionary (node -> `NodeRecord`) which keeps a `NodeIndex` of its nodes.
+
+    `networkx.Graph` adds and removes nodes only by setting and deleting keys of
+    its node dictionary, records are bound to their node when they are set.
+    """
+    __slots__ = ('node_index',)
+
+    def __init__(self):
+        super().__init__()
+        self.node_index = NodeIndex()
+
+    def __setitem__(self, n, record):
+        if n in self:
+            del self[n]
+        super().__setitem__(n, record)
+        record._nodes = self
+        record._node = n
+        self.index(record, 'layer')
+
+    def __delitem__(self, n):
+        record = self[n]
+        self.unindex(record, 'layer')
+        record._nodes = None
+        super().__delitem__(n)
+
+    def clear(self):
+        for record in self.values():
+            record._nodes = None
+        super().clear()
+        self.node_index.clear()
+
+    def __reduce__(self):
+        return IndexedNodes, (), None, None, iter(self.items())
+
+    def index(self, record: NodeRecord, attribute: str):
+        """
+        Adds the entries of `record` which depend on `attribute` to the index.
+        """
+        self.node_index.add(record._node, self._keys(record, attribute))
+
+    def unindex(self, record: NodeRecord, attribute: str):
+        """
+        Removes the entries of `record` which depend on `attribute` from the index.
+        """
+        self.node_index.remove(record._node, self._keys(record, attribute))
+
+    def _keys(self, record, attribute):
+        return self.node_index.keys(getattr(record, '_layer', None), getattr(record, '_label', None),
+                                    getattr(record, '_position', None), attribute)
+
+
+class CompactGraph(networkx.Graph):
+    """
+    `networkx.Graph` which keeps node attributes in `NodeRecord`s and edge
+    attributes in `EdgeRecord`s, and indexes its nodes by layer, label and position.
+    """
+    node_dict_factory = IndexedNodes
+    node_attr_dict_factory = NodeRecord
+    edge_attr_dict_factory = EdgeRecord
+
+    def layer_nodes(self, layer: int, label: str = None) -> list:
+        """
+        Returns nodes which lay on `layer`, in the order they were added.
+        If `label` is not `None` only nodes with this label are returned.
+        """
+        return self._node.node_index.layer_nodes(layer, label)
+
+    def nodes_at(self, layer: int, position, rel_tol: float = None) -> list:
+        """
+        Returns nodes on `layer` at `position`.
+
+        If `rel_tol` is `None` positions are compared exactly, otherwise
+        positions are compared coordinate-wise using `math.isclose(..., rel_tol=rel_tol)`.
+        """
+        return self._node.node_index.nodes_at(layer, position, rel_tol, self._position)
+
+    def _position(self, n):
+        return getattr(self._node[n], '_position', None)
@@ -0,0 +1,180 @@
+"""
+Parallel application of productions.
+
+After P1 everything below every interior is an independent subtree, so
+refinements (P2, P5, P9) of many interiors do not depend on each other.
+`apply_parallel` matches all inputs like `Production.apply_many`, splits the
+matches into shards and rewrites every shard in a process pool:
+
+    apply_parallel(P9(), graph, [[i] for i in interiors], processes=4)
+
+By default one process is used, then it is the same as `apply_many`.
+
+A shard is a small `networkx.Graph` with only the vertices of its matches.
+Rewrites are run on the shard (see `agh_graphs.batch`) and the changes are sent
+back, then merged into `graph` in the order of inputs: new nodes get their ids
+from the id allocator of `graph`, so the graph is the same as after `apply_many`.
+
+Only the changes of vertices of the matches are merged, so productions which
+change vertices outside their input (P6, P7, P8, P10, P12 and P13 merge vertices
+of the layer below and move their edges) are rejected with `ValueError`.
+
+The pool does not pay off for the productions of this package. Rewrites are
+cheap, so the work which stays in the calling process (matching, building shards
+and merging the changes) already takes longer than `apply_many`: with P9 on 480
+inputs 26 ms against 15 ms, on 1920 inputs 118 ms against 63 ms. Then no number
+of cores makes `apply_parallel` faster, see `benchmarks.parallel`, which prints
+the number of cores needed for every size. Processes are used only for
+productions with expensive rewrites, and only with at least
+`min_inputs_per_process` inputs each, so that starting the pool is amortized.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+
+import networkx
+from networkx import Graph
+
+from agh_graphs.batch import Batch
+from agh_graphs.production import Match, Production, _flatten, snapshot_for_log
+from agh_graphs.utils import IdAllocator, get_correspondence, get_id_allocator, get_midpoints
+
+# starting a pool of processes takes about as long as `apply_many` of P9 on 250 inputs
+MIN_INPUTS_PER_PROCESS = 250
+
+# keys of `graph.graph` which are not copied to shards
+_LOCAL_GRAPH_KEYS = ('id_allocator', 'execution_mode', 'derivation_log', 'correspondence', 'midpoints', 'geometry')
+
+
+def apply_parallel(production: Production, graph: Graph, inputs: List[List[str]], orientations=0,
+                   processes: int = 1, min_inputs_per_process: int = MIN_INPUTS_PER_PROCESS,
+                   **kwargs) -> List[List[str]]:
+    """
+    Apply `production` on every input from `inputs`, with the same arguments and
+    result as `Production.apply_many`, in up to `processes` processes (`None` for
+    the number of CPUs). Every process gets at least `min_inputs_per_process`
+    inputs, with one process it is the same as `apply_many`.
+
+    Raises `ValueError` if inputs conflict or, with more than one process, if
+    `production` changes vertices outside its input, then `graph` is not changed.
+    """
+    if processes is None:
+        processes = os.cpu_count() or 1
+    processes = min(processes, len(inputs) // max(min_inputs_per_process, 1))
+    if processes <= 1:
+        return production.apply_many(graph, inputs, orientations, **kwargs)
+
+    execution_mode = kwargs.pop('execution_mode', None)
+    matches = production.match_many(graph, inputs, orientations, execution_mode=execution_mode, **kwargs)
+    for match in matches:
+        outside = [v for v in production.rewritten_vertices(match) if v not in match.prod_input]
+        if outside:
+            raise ValueError('{} changes vertices {} outside of input {}, it cannot be applied in parallel'.format(
+                production, outside, match.prod_input))
+    shards = [_make_shard(graph, part) for part in _partition(matches, processes)]
+    with ProcessPoolExecutor(processes) as executor:
+        rewritten = list(executor.map(_rewrite_shard, shards))
+
+    snapshot_for_log(graph)
+    batch = Batch(graph)
+    results = []
+    try:
+        for changes in rewritten:
+            results.extend(_merge(batch, changes))
+    finally:
+        batch.flush()
+    production.log_matches(graph, matches)
+    return results
+
+
+def _partition(matches: List[Match], parts: int) -> List[List[Match]]:
+    """
+    Splits `matches` into at most `parts` consecutive parts of similar size.
+    """
+    size = -(-len(matches) // parts) if matches else 1
+    return [matches[start:start + size] for start in range(0, len(matches), size)]
+
+
+def _make_shard(graph: Graph, matches: List[Match]):
+    """
+    Returns a picklable shard with vertices of `matches`: graph attributes (with
+    cached geometries of these vertices), nodes with their attributes, edges
+    between them, the first free id and `matches`.
+    """
+    indexes = {}
+    for match in matches:
+        for v in _flatten(list(match.vertices.values())) + list(match.prod_input):
+            indexes.setdefault(v, len(indexes))
+
+    nodes = [(v, dict(graph.nodes[v])) for v in indexes]
+    edges = [(u, v) for u, index in indexes.items() for v in graph.neighbors(u) if indexes.get(v, -1) > index]
+    attributes = {key: value for key, value in graph.graph.items() if key not in _LOCAL_GRAPH_KEYS}
+    geometry = graph.graph.get('geometry', {})
+    attributes['geometry'] = {v: geometry[v] for v in indexes if v in geometry}
+    return attributes, nodes, edges, get_id_allocator(graph).next_id, matches
+
+
+def _rewrite_shard(shard):
+    """
+    Rewrites matches of `shard` (see `_make_shard`) and returns the changes:
+    results and ranges of allocated ids of every match, changed attributes of
+    existing nodes, removed edges and nodes, new nodes and edges in the order
+    in which they were added, entries of the correspondence map and of the midpoint index,
+    and cached geometries of triangles.
+    """
+    (attributes, nodes, edges, next_id, matches) = shard
+    graph = networkx.Graph(**attributes)
+    graph.add_nodes_from(nodes)
+    graph.add_edges_from(edges)
+    allocator = graph.graph['id_allocator'] = IdAllocator(next_id)
+
+    batch = Batch(graph)
+    results = []
+    for match in matches:
+        start = allocator.next_id
+        result = match.production.rewrite(batch, match)
+        results.append((result, start, allocator.next_id))
+
+    changed = []
+    for n, original in nodes:
+        if n in graph and graph.nodes[n] != original:
+            changed.append((n, {key: value for key, value in graph.nodes[n].items() if original.get(key) != value}))
+    removed_edges = [(u, v) for u, v in edges if not graph.has_edge(u, v)]
+    removed_nodes = [n for n, _ in nodes if n not in graph]
+    return results, changed, removed_edges, removed_nodes, batch.staged_nodes, list(batch.staged_edges), \
+        get_correspondence(graph).entries, get_midpoints(graph).entries, graph.graph.get('geometry', {})
+
+
+def _merge(graph, changes) -> List[List[str]]:
+    """
+    Merges `changes` returned by `_rewrite_shard` into `graph`, new nodes
+    get ids from the allocator of `graph`. Returns results with these ids.
+    """
+    (results, changed, removed_edges, removed_nodes, new_nodes, new_edges, correspondence, midpoints, geometry) = changes
+    allocator = get_id_allocator(graph)
+    new_ids = {}
+    for _, start, end in results:
+        for local_id in range(start, end):
+            if local_id in new_nodes:
+                new_ids[local_id] = allocator.allocate(graph)
+
+    for n, attributes in changed:
+        graph.nodes[n].update(attributes)
+    graph.remove_edges_from(removed_edges)
+    graph.remove_nodes_from(removed_nodes)
+    for n, attributes in new_nodes.items():
+        graph.add_node(new_ids.get(n, n), **attributes)
+    graph.add_edges_from((new_ids.get(u, u), new_ids.get(v, v)) for u, v in new_edges)
+    entries = get_correspondence(graph).entries
+    for v, (position, above) in correspondence.items():
+        entries[new_ids.get(v, v)] = (position, new_ids.get(above, above))
+    entries = get_midpoints(graph).entries
+    for edge, v in midpoints.items():
+        entries[frozenset(new_ids.get(u, u) for u in edge)] = new_ids.get(v, v)
+    cache = graph.graph.setdefault('geometry', {})
+    for interior, triangle in geometry.items():
+        cache[new_ids.get(interior, interior)] = triangle._replace(
+            corners=tuple(new_ids.get(v, v) for v in triangle.corners),
+            ccw=tuple(new_ids.get(v, v) for v in triangle.ccw))
+
+    return [[new_ids.get(n, n) for n in result] for result, _, _ in results]
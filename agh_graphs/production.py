@@ -1,16 +1,51 @@
 """
 This module contains the basic code for productions. You can add your own
-production by extending the `Production` class.
+production by extending the `Production` class and implementing its `match`
+and `rewrite` methods.
 """
+import time
 from abc import ABC, abstractmethod
 from typing import List
 
 from networkx import Graph
 
+from agh_graphs.batch import Batch
+from agh_graphs.execution import get_execution_mode
+from agh_graphs.transaction import Transaction
+
+
+class Match:
+    """
+    Result of `Production.match`: the input of a production resolved to
+    the vertices which the production rewrites.
+
+    Besides `prod_input` and `orientation`, a match keeps named vertices
+    (e.g. corners, midpoints or pairs of vertices to merge), which are
+    available as `match['<name>']`, and keyword arguments of the production
+    it was matched with (`kwargs`, set by `Production.apply` and `match_many`).
+    """
+
+    def __init__(self, production: 'Production', prod_input: List[str], orientation: int = 0, **vertices):
+        self.production = production
+        self.prod_input = prod_input
+        self.orientation = orientation
+        self.vertices = vertices
+        self.kwargs = {}
+
+    def __getitem__(self, name):
+        return self.vertices[name]
+
+    def __repr__(self) -> str:
+        return 'Match({}, {}, {})'.format(self.production, self.prod_input, self.vertices)
+
 
 class Production(ABC):
+    # keys of a match with vertices which `rewrite` only reads and with vertices which it
+    # changes (relabels, merges or removes), used by `apply_many` to find conflicting inputs;
+    # if `rewritten_keys` is `None` all vertices of `prod_input` are assumed to be changed
+    read_keys = ()
+    rewritten_keys = None
 
-    @abstractmethod
     def apply(self, graph: Graph, prod_input: List[str], orientation: int = 0, **kwargs) -> List[str]:
         """
         Apply the production on `graph`.
@@ -19,10 +54,194 @@ class Production(ABC):
         It contains ids of `I` or `i` vertexes. Ids of other vertexes (e.g. E)
         can be obtained by checking `I` or `i` neighbours.
 
+        `prod_input` may also be a `Match` returned by `match` or `match_many`,
+        then the input is not checked again and `orientation` and `**kwargs`
+        are ignored, the ones given when the input was matched are used.
+
+        Whether the input is validated depends on the execution mode of `graph`,
+        which may be overridden with the `execution_mode` keyword argument
+        (see `agh_graphs.execution`). If `graph` has a derivation log, the
+        application is recorded (see `agh_graphs.derivation_log`).
+
         This function should return list of vertexes ids that should be used
         in the next production.
         """
+        execution_mode = kwargs.pop('execution_mode', None)
+        if isinstance(prod_input, Match):
+            match = prod_input
+            if type(match.production) is not type(self):
+                raise ValueError('match of {} cannot be applied by {}'.format(match.production, self))
+        else:
+            match = self.__match(graph, prod_input, orientation, execution_mode, kwargs)
+        snapshot_for_log(graph)
+        result = self.rewrite(graph, match)
+        self.log_matches(graph, [match])
+        return result
+
+    def apply_many(self, graph: Graph, inputs: List[List[str]], orientations=0, **kwargs) -> List[List[str]]:
+        """
+        Apply the production on every input from `inputs`, like calling `apply`
+        on each of them in order, but all inputs are matched before `graph` is
+        changed. New nodes and edges are staged and inserted at once (see
+        `agh_graphs.batch`).
+
+        A rewrite raises only if the production has a bug, as inputs are checked
+        first. Then all rewrites are rolled back.
+
+        `orientations` is either one orientation for all inputs or a list of
+        orientations, one per input.
+
+        Raises `ValueError` if inputs conflict, i.e. a vertex changed by
+        the production applied on one input is used by another input.
+
+        Returns the list of results of `apply` for every input.
+        """
+        execution_mode = kwargs.pop('execution_mode', None)
+        matches = self.match_many(graph, inputs, orientations, execution_mode=execution_mode, **kwargs)
+        snapshot_for_log(graph)
+        # only changes of existing vertices are journaled, staged nodes and edges
+        # are inserted after the transaction and dropped if it is rolled back
+        with Transaction(graph) as journaled:
+            batch = Batch(journaled)
+            results = [self.rewrite(batch, match) for match in matches]
+        batch.flush(graph)
+        self.log_matches(graph, matches)
+        return results
+
+    def match_many(self, graph: Graph, inputs: List[List[str]], orientations=0, **kwargs) -> List[Match]:
+        """
+        Match the production on every input from `inputs` without changing `graph`,
+        with the same arguments as `apply_many`.
+
+        Raises `ValueError` if inputs conflict (see `apply_many`).
+        """
+        if isinstance(orientations, int):
+            orientations = [orientations] * len(inputs)
+        elif len(orientations) != len(inputs):
+            raise ValueError('expected {} orientations, got {}'.format(len(inputs), len(orientations)))
+
+        execution_mode = kwargs.pop('execution_mode', None)
+        matches = [self.__match(graph, prod_input, orientation, execution_mode, kwargs)
+                   for prod_input, orientation in zip(inputs, orientations)]
+        self.__check_conflicts(matches)
+        return matches
+
+    def match_input(self, graph: Graph, prod_input: List[str], orientation: int = 0, execution_mode: str = None,
+                    **kwargs) -> Match:
+        """
+        Match the production on `prod_input` like `apply` does: whether the input
+        is validated depends on the execution mode of `graph` (or `execution_mode`),
+        which also records the time of matching (see `agh_graphs.execution`).
+        """
+        return self.__match(graph, prod_input, orientation, execution_mode, kwargs)
+
+    def log_matches(self, graph: Graph, matches: List[Match]):
+        """
+        Records applications of the production on `matches` (with their keyword
+        arguments) in the derivation log of `graph`, if it has one. Called after
+        the matches were rewritten, so failed applications are not recorded.
+        """
+        log = graph.graph.get('derivation_log')
+        if log is not None:
+            for match in matches:
+                log.record(graph, self, match.prod_input, match.orientation, match.kwargs)
+
+    def __match(self, graph, prod_input, orientation, mode, kwargs) -> Match:
+        execution_mode = get_execution_mode(graph)
+        validate = execution_mode.should_validate(mode)
+        start = time.perf_counter()
+        try:
+            match = self.match(graph, prod_input, orientation, validate, **kwargs)
+            match.kwargs = kwargs
+            return match
+        finally:
+            execution_mode.record(validate, time.perf_counter() - start)
+
+    def __check_conflicts(self, matches: List[Match]):
+        changed_by = {}
+        for index, match in enumerate(matches):
+            for v in self.rewritten_vertices(match):
+                other = changed_by.setdefault(v, index)
+                if other != index:
+                    raise self.__conflict(matches[other], match, v)
+
+        for index, match in enumerate(matches):
+            used = _flatten([match[key] for key in self.read_keys])
+            used.extend(match.prod_input)
+            for v in used:
+                other = changed_by.get(v, index)
+                if other != index:
+                    raise self.__conflict(matches[other], match, v)
+
+    def rewritten_vertices(self, match: Match) -> List[str]:
+        """
+        Returns vertices which `rewrite` changes (relabels, merges or removes)
+        when applied on `match`, see `rewritten_keys`.
+        """
+        if self.rewritten_keys is None:
+            return list(match.prod_input)
+        return _flatten([match[key] for key in self.rewritten_keys])
+
+    def __conflict(self, match1: Match, match2: Match, vertex) -> ValueError:
+        return ValueError('inputs {} and {} of {} conflict at vertex {}'.format(
+            match1.prod_input, match2.prod_input, self, vertex))
+
+    @abstractmethod
+    def match(self, graph: Graph, prod_input: List[str], orientation: int = 0, validate: bool = True,
+              **kwargs) -> Match:
+        """
+        Check if the production can be applied on `prod_input` and resolve
+        vertices which are rewritten, without changing `graph`.
+
+        Raises an exception if the production cannot be applied. If `validate`
+        is `False` the input is trusted to be valid and vertices are only resolved.
+        The match is valid until `graph` is changed.
+        """
         pass
 
+    @abstractmethod
+    def rewrite(self, graph: Graph, match: Match) -> List[str]:
+        """
+        Rewrite `graph` using vertices resolved by `match`,
+        returns the same as `apply`.
+        """
+        pass
+
+    def apply_in_transaction(self, graph: Graph, prod_input: List[str], orientation: int = 0,
+                             **kwargs) -> List[str]:
+        """
+        Apply the production on `graph` like `apply`, but if the production
+        raises an exception all changes made to `graph` are rolled back
+        before the exception is propagated.
+
+        Changes are recorded in an undo journal (see `agh_graphs.transaction`),
+        so `graph` does not have to be copied.
+        """
+        with Transaction(graph) as journaled:
+            return self.apply(journaled, prod_input, orientation, **kwargs)
+
     def __str__(self) -> str:
         return self.__class__.__name__
+
+
+def snapshot_for_log(graph: Graph):
+    """
+    Lets the derivation log of `graph` (if it has one) take its snapshot before
+    the first application, called before `graph` is rewritten.
+    """
+    log = graph.graph.get('derivation_log')
+    if log is not None:
+        log.take_snapshot(graph)
+
+
+def _flatten(values: list) -> list:
+    """
+    Returns vertices from `values`, which may be nested in lists and tuples.
+    """
+    vertices = []
+    for value in values:
+        if type(value) in (list, tuple):
+            vertices.extend(_flatten(value))
+        else:
+            vertices.append(value)
+    return vertices
@@ -0,0 +1,47 @@
+"""
+Productions of the graph grammar, every production is a class in a module
+named after it (e.g. `P12` in `agh_graphs.productions.p12`).
+
+`get` returns a production class by its name and imports only its module:
+
+    from agh_graphs import productions
+
+    productions.get('P12')().apply(graph, prod_input)
+"""
+import importlib
+import pkgutil
+import re
+from typing import List
+
+_NAME = re.compile(r'P\d+')
+
+_classes = {}
+
+
+def get(name: str):
+    """
+    Returns the production class named `name` (e.g. `'P12'`), its module is imported on first use.
+
+    Raises `KeyError` if there is no such production.
+    """
+    production_class = _classes.get(name)
+    if production_class is None:
+        if not _NAME.fullmatch(name):
+            raise KeyError(name)
+        module_name = '{}.{}'.format(__name__, name.lower())
+        try:
+            module = importlib.import_module(module_name)
+        except ModuleNotFoundError as error:
+            if error.name != module_name:
+                raise
+            raise KeyError(name) from None
+        production_class = _classes[name] = getattr(module, name)
+    return production_class
+
+
+def names() -> List[str]:
+    """
+    Returns names of all productions, without importing their modules.
+    """
+    names = [module.name.upper() for module in pkgutil.iter_modules(__path__)]
+    return sorted((name for name in names if _NAME.fullmatch(name)), key=lambda name: int(name[1:]))
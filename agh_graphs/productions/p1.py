@@ -2,31 +2,47 @@ from typing import List
 
 from networkx import Graph
 
-from agh_graphs.production import Production
-from agh_graphs.utils import gen_name, add_interior
+from agh_graphs.production import Production, Match
+from agh_graphs.utils import gen_name, add_interior, as_position
 
 
 class P1(Production):
+    rewritten_keys = ('initial_node',)
 
-    def apply(self, graph: Graph, prod_input: List[str], orientation: int = 0, **kwargs) -> List[str]:
+    def match(self, graph: Graph, prod_input: List[str], orientation: int = 0, validate: bool = True,
+              **kwargs) -> Match:
         [initial_node_id] = prod_input
-        initial_node_data = graph.nodes[initial_node_id]
+        positions = kwargs['positions'] if 'positions' in kwargs else None
+
+        if validate:
+            initial_node_data = graph.nodes[initial_node_id]
+
+            if initial_node_data['layer'] != 0:
+                raise ValueError('bad layer')
 
-        if initial_node_data['layer'] != 0:
-            raise ValueError('bad layer')
+            if initial_node_data['label'] != 'E':
+                raise ValueError('bad label')
 
-        if initial_node_data['label'] != 'E':
-            raise ValueError('bad label')
+            positions = self.__get_positions(positions)
+        elif positions is None:
+            positions = self.__get_positions(positions)
+        positions = [as_position(graph, position) for position in positions]
 
-        positions = self.__get_positions(kwargs['positions'] if 'positions' in kwargs else None)
+        return Match(self, prod_input, orientation, initial_node=initial_node_id, positions=positions)
+
+    def rewrite(self, graph: Graph, match: Match) -> List[str]:
+        initial_node_id = match['initial_node']
+        initial_node_data = graph.nodes[initial_node_id]
+        positions = match['positions']
+        orientation = match.orientation
 
         # change label
         initial_node_data['label'] = 'e'
 
-        vx_tl = gen_name()
-        vx_tr = gen_name()
-        vx_bl = gen_name()
-        vx_br = gen_name()
+        vx_tl = gen_name(graph)
+        vx_tr = gen_name(graph)
+        vx_bl = gen_name(graph)
+        vx_br = gen_name(graph)
         graph.add_node(vx_bl, layer=1, position=positions[0], label='E')
         graph.add_node(vx_br, layer=1, position=positions[1], label='E')
         graph.add_node(vx_tl, layer=1, position=positions[2], label='E')
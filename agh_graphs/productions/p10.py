@@ -2,63 +2,63 @@ from typing import List
 
 from networkx import Graph
 
-from agh_graphs.production import Production
+from agh_graphs.production import Production, Match
 from agh_graphs.utils import find_overlapping_vertices, get_neighbors_at, \
-    get_vertices_from_layer, get_node_at, join_overlapping_vertices
+    get_vertex_above, join_vertices
 
 
 class P10(Production):
+    rewritten_keys = ('to_merge', 'to_disconnect')
 
-    def apply(self, graph: Graph, prod_input: List[str], orientation: int = 0, **kwargs) -> List[str]:
-        self.__check_prod_input(graph, prod_input)
+    def match(self, graph: Graph, prod_input: List[str], orientation: int = 0, validate: bool = True,
+              **kwargs) -> Match:
+        if validate:
+            layer, groups, common_I_neighbour_vertices_to_join = self.__check_prod_input(graph, prod_input)
+        else:
+            layer, groups, common_I_neighbour_vertices_to_join = self.__resolve_prod_input(graph, prod_input)
+        return Match(self, prod_input, orientation, layer=layer, to_merge=groups,
+                     to_disconnect=common_I_neighbour_vertices_to_join)
+
+    def rewrite(self, graph: Graph, match: Match) -> List[str]:
+        layer = match['layer']
+        [vertices_to_join_group1, vertices_to_join_group2] = match['to_merge']
+        common_I_neighbour_vertices_to_join = match['to_disconnect']
+
+        if graph.has_edge(common_I_neighbour_vertices_to_join[0], common_I_neighbour_vertices_to_join[1]):
+            graph.remove_edge(common_I_neighbour_vertices_to_join[0], common_I_neighbour_vertices_to_join[1])
+
+        join_vertices(graph, [(vertices_to_join_group1[0], vertices_to_join_group1[1]),
+                              (vertices_to_join_group2[0], vertices_to_join_group2[1])], layer)
 
+        return match.prod_input
+
+    @staticmethod
+    def __resolve_prod_input(graph, prod_input):
         layer = graph.nodes()[prod_input[0]]['layer']
-        overlapping_vertices = find_overlapping_vertices(graph)
+
+        neighbours = {}
+        for interior in prod_input:
+            neighbours.update(dict.fromkeys(get_neighbors_at(graph, interior, layer)))
+
         vertices_to_join = set()
-        for overlapping_vertice1, overlapping_vertice2 in overlapping_vertices:
+        for overlapping_vertice1, overlapping_vertice2 in find_overlapping_vertices(graph, nodes=neighbours):
             vertices_to_join.add(overlapping_vertice1)
             vertices_to_join.add(overlapping_vertice2)
 
         vertices_to_join_group1 = [vertice for vertice in vertices_to_join
-                                   if graph.nodes()[vertice]['position'] == graph.nodes()[list(vertices_to_join)[0]][
-                                       'position']]
+                                   if graph.nodes()[vertice]['position'] == graph.nodes()[list(vertices_to_join)[0]]['position']]
         vertices_to_join_group2 = [vertice for vertice in vertices_to_join if vertice not in vertices_to_join_group1]
 
-        vertice1_group1_neighbours = get_neighbors_at(graph, vertices_to_join_group1[0], layer)
-        vertice2_group1_neighbours = get_neighbors_at(graph, vertices_to_join_group1[1], layer)
-        vertice1_group2_neighbours = get_neighbors_at(graph, vertices_to_join_group2[0], layer)
-        vertice2_group2_neighbours = get_neighbors_at(graph, vertices_to_join_group2[1], layer)
-
-        vertice1_group1_I_neighbours = [neighbour for neighbour in vertice1_group1_neighbours if
-                                graph.nodes()[neighbour]['label'] == "I"]
-        vertice2_group1_I_neighbours = [neighbour for neighbour in vertice2_group1_neighbours if
-                                        graph.nodes()[neighbour]['label'] == "I"]
-        vertice1_group2_I_neighbours = [neighbour for neighbour in vertice1_group2_neighbours if
-                                        graph.nodes()[neighbour]['label'] == "I"]
-        vertice2_group2_I_neighbours = [neighbour for neighbour in vertice2_group2_neighbours if
-                                        graph.nodes()[neighbour]['label'] == "I"]
-
-        common_I_neighbour_vertices_to_join = []
-        if vertice1_group1_I_neighbours == vertice1_group2_I_neighbours:
-            common_I_neighbour_vertices_to_join.append(vertices_to_join_group1[0])
-            common_I_neighbour_vertices_to_join.append(vertices_to_join_group2[0])
-        elif vertice1_group1_I_neighbours == vertice2_group2_I_neighbours:
-            common_I_neighbour_vertices_to_join.append(vertices_to_join_group1[0])
-            common_I_neighbour_vertices_to_join.append(vertices_to_join_group2[1])
-        elif vertice2_group1_I_neighbours == vertice1_group2_I_neighbours:
-            common_I_neighbour_vertices_to_join.append(vertices_to_join_group1[1])
-            common_I_neighbour_vertices_to_join.append(vertices_to_join_group2[0])
-        elif vertice2_group1_I_neighbours == vertice2_group2_I_neighbours:
-            common_I_neighbour_vertices_to_join.append(vertices_to_join_group1[1])
-            common_I_neighbour_vertices_to_join.append(vertices_to_join_group2[1])
+        def I_neighbours(vertice):
+            return [neighbour for neighbour in get_neighbors_at(graph, vertice, layer)
+                    if graph.nodes()[neighbour]['label'] == "I"]
 
-        if graph.has_edge(common_I_neighbour_vertices_to_join[0], common_I_neighbour_vertices_to_join[1]):
-            graph.remove_edge(common_I_neighbour_vertices_to_join[0], common_I_neighbour_vertices_to_join[1])
+        # the pair of vertices (one of each group) which have a common I neighbour
+        common_I_neighbour_vertices_to_join = next(
+            [vertice1, vertice2] for vertice1 in vertices_to_join_group1 for vertice2 in vertices_to_join_group2
+            if I_neighbours(vertice1) == I_neighbours(vertice2))
 
-        join_overlapping_vertices(graph, vertices_to_join_group1[0], vertices_to_join_group1[1], layer)
-        join_overlapping_vertices(graph, vertices_to_join_group2[0], vertices_to_join_group2[1], layer)
-
-        return prod_input
+        return layer, [vertices_to_join_group1, vertices_to_join_group2], common_I_neighbour_vertices_to_join
 
     @staticmethod
     def __check_prod_input(graph, prod_input):
@@ -71,23 +71,21 @@ class P10(Production):
         if any(graph.nodes()[interior]['label'] != 'I' for interior in prod_input):
             raise ValueError('interior vertices must have I label')
 
-        all_I_neighbours = []
+        neighbours = {}
 
         for interior in prod_input:
             interior_neighbours = get_neighbors_at(graph, interior, layer)
             if len(interior_neighbours) not in [2, 3]:
                 raise ValueError('wrongly connected interior vertices')
+            neighbours.update(dict.fromkeys(interior_neighbours))
 
             for neighbour in interior_neighbours:
                 if graph.nodes()[neighbour]['label'] != 'E':
                     raise ValueError('interior vertices can be connect only with E vertices')
 
-                all_I_neighbours.append(neighbour)
-
-        E_vertices = get_vertices_from_layer(graph, layer, "E")
+        # only the neighbourhood of the interiors is checked, not the whole layer
+        E_vertices = list(neighbours)
         E_vertices_position_prev_layer = []
-        if any(E_vertice not in all_I_neighbours for E_vertice in E_vertices):
-            raise ValueError('wrongly connected E vertices')
         for E_vertice in E_vertices:
             E_vertice_neighbours = get_neighbors_at(graph, E_vertice, layer)
             if len([I_node for I_node in E_vertice_neighbours if graph.nodes()[I_node]['label'] == "I"]) not in [1, 2]:
@@ -96,7 +94,7 @@ class P10(Production):
                                       graph.nodes()[neighbour]['label'] == "E"]
             if len(E_vertice_E_neighbours) not in [1, 2, 3]:
                 raise ValueError('each E vertice must be connected with at least one E vertice')
-            corresponding_vertice = get_node_at(graph, layer - 1, graph.nodes()[E_vertice]['position'])
+            corresponding_vertice = get_vertex_above(graph, E_vertice, prod_input)
             if corresponding_vertice is not None:
                 E_vertices_position_prev_layer.append(corresponding_vertice)
 
@@ -116,12 +114,9 @@ class P10(Production):
             if (x, y) not in possible_positions:
                 raise ValueError('position of noncorresponding vertice is incorrect')
 
-        overlapping_vertices = find_overlapping_vertices(graph)
+        overlapping_vertices = find_overlapping_vertices(graph, nodes=neighbours)
 
-        if len(overlapping_vertices) != 4 or \
-                any(overlapping_vertice1 not in set(all_I_neighbours)
-                    or overlapping_vertice2 not in set(all_I_neighbours)
-                    for overlapping_vertice1, overlapping_vertice2 in overlapping_vertices):
+        if len(overlapping_vertices) != 2:
             raise ValueError('incorrect shape of graph')
 
         vertices_to_join = set()
@@ -195,3 +190,5 @@ class P10(Production):
             raise ValueError('vertices to join with non-common I neighbour are connected')
         if len(set(noncommon_vertice1_neighbours).intersection(set(noncommon_vertice2_neighbours))) not in [1, 2]:
             raise ValueError('vertices to join with common I neighbour are wrongly connected')
+
+        return layer, [vertices_to_join_group1, vertices_to_join_group2], common_I_neighbour_vertices_to_join
@@ -2,19 +2,43 @@ from typing import List
 
 from networkx import Graph
 
-from agh_graphs.production import Production
-from agh_graphs.utils import get_neighbors_at, join_overlapping_vertices, get_common_neighbors
+from agh_graphs.production import Production, Match
+from agh_graphs.utils import get_neighbors_at, join_vertices, get_common_neighbors
 
 
 class P12(Production):
+    rewritten_keys = ('to_merge',)
 
-    def apply(self, graph: Graph, prod_input: List[str], orientation: int = 0, **kwargs) -> List[str]:
+    def match(self, graph: Graph, prod_input: List[str], orientation: int = 0, validate: bool = True,
+              **kwargs) -> Match:
         # Production based on P6
-        prod_input = self.__sort_prod_input(graph, prod_input)
-        self.__check_prod_input(graph, prod_input)
+        sorted_prod_input = self.__sort_prod_input(graph, prod_input)
+        if validate:
+            down_layer, to_merge = self.__check_prod_input(graph, sorted_prod_input)
+        else:
+            down_layer, to_merge = self.__resolve_prod_input(graph, sorted_prod_input)
+        return Match(self, prod_input, orientation, layer=down_layer, to_merge=to_merge)
 
+    def rewrite(self, graph: Graph, match: Match) -> List[str]:
+        join_vertices(graph, match['to_merge'], match['layer'])
+
+        return []
+
+    @staticmethod
+    def __sort_prod_input(graph: Graph, prod_input: List[str]):
+        layers = []
+        for interior in prod_input:
+            layers.append(graph.nodes()[interior]['layer'])
+        zipped_vertices = zip(layers, prod_input)
+        sorted_zip = sorted(zipped_vertices, key=lambda item: item[0])
+        sorted_prod_input = [vertex for _, vertex in sorted_zip]
+        return sorted_prod_input
+
+    @staticmethod
+    def __resolve_prod_input(graph: Graph, prod_input: List[str]):
         up_layer = graph.nodes()[prod_input[0]]['layer']
         down_layer = graph.nodes()[prod_input[3]]['layer']
+
         v1_up, v2_up = get_common_neighbors(graph, prod_input[0], prod_input[1], up_layer)
         pos_v1 = graph.nodes()[v1_up]['position']
         pos_v2 = graph.nodes()[v2_up]['position']
@@ -22,25 +46,13 @@ class P12(Production):
         to_merge = [[], []]
         for interior in prod_input[2:]:
             for v in get_neighbors_at(graph, interior, down_layer):
-                if graph.nodes()[v]['position'] == pos_v1:
+                position = graph.nodes()[v]['position']
+                if position == pos_v1:
                     to_merge[0].append(v)
-                elif graph.nodes()[v]['position'] == pos_v2:
+                elif position == pos_v2:
                     to_merge[1].append(v)
 
-        for v1, v2 in to_merge:
-            join_overlapping_vertices(graph, v1, v2, down_layer)
-
-        return []
-
-    @staticmethod
-    def __sort_prod_input(graph: Graph, prod_input: List[str]):
-        layers = []
-        for interior in prod_input:
-            layers.append(graph.nodes()[interior]['layer'])
-        zipped_vertices = zip(layers, prod_input)
-        sorted_zip = sorted(zipped_vertices)
-        sorted_prod_input = [vertex for _, vertex in sorted_zip]
-        return sorted_prod_input
+        return down_layer, to_merge
 
     @staticmethod
     def __check_prod_input(graph: Graph, prod_input: List[str]):
@@ -99,14 +111,17 @@ class P12(Production):
         if not graph.has_edge(v1_up, v2_up):
             raise ValueError('Upper vertices are not connected')
 
-        # Prepare list of vertices in lower layer
+        # Prepare list of vertices in lower layer, and lists of vertices to merge
         pairs_of_lower = [set(), set()]
+        to_merge = [[], []]
         for interior in prod_input[2:]:
             for v in get_neighbors_at(graph, interior, down_layer):
                 if graph.nodes()[v]['position'] == pos_v1:
                     pairs_of_lower[0].add((v, lower_to_upper[interior]))
+                    to_merge[0].append(v)
                 elif graph.nodes()[v]['position'] == pos_v2:
                     pairs_of_lower[1].add((v, lower_to_upper[interior]))
+                    to_merge[1].append(v)
 
         # Check if pair is indeed pair of vertices
         for pair in pairs_of_lower:
@@ -132,3 +147,5 @@ class P12(Production):
         all_vertices = vertices_by_side[prod_input[0]] + vertices_by_side[prod_input[1]] + [v1_up, v2_up]
         if any(graph.nodes()[v]['label'] != 'E' for v in all_vertices):
             raise ValueError('Not all vertices have label E')
+
+        return down_layer, to_merge
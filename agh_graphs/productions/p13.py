@@ -3,21 +3,44 @@ from typing import List
 
 from networkx import Graph
 
-from agh_graphs.production import Production
-from agh_graphs.utils import get_neighbors_at, get_common_neighbors, join_overlapping_vertices
+from agh_graphs.production import Production, Match
+from agh_graphs.utils import get_neighbors_at, get_common_neighbors, join_vertices
 
 
 class P13(Production):
+    rewritten_keys = ('to_merge',)
 
-    def apply(self, graph: Graph, prod_input: List[str], orientation: int = 0, **kwargs) -> List[str]:
-        to_merge = self.__check_prod_input(graph, prod_input)
+    def match(self, graph: Graph, prod_input: List[str], orientation: int = 0, validate: bool = True,
+              **kwargs) -> Match:
+        if validate:
+            to_merge = self.__check_prod_input(graph, prod_input)
+        else:
+            to_merge = self.__resolve_prod_input(graph, prod_input)
         lower_layer = graph.nodes()[prod_input[2]]['layer']
+        return Match(self, prod_input, orientation, layer=lower_layer, to_merge=to_merge)
 
-        v1, v2 = to_merge
-        join_overlapping_vertices(graph, v1, v2, lower_layer)
+    def rewrite(self, graph: Graph, match: Match) -> List[str]:
+        join_vertices(graph, [match['to_merge']], match['layer'])
 
         return []
 
+    @staticmethod
+    def __resolve_prod_input(graph, prod_input):
+        lower_layer = graph.nodes()[prod_input[2]]['layer']
+        if graph.has_edge(prod_input[0], prod_input[2]):
+            lower_i1, lower_i2 = prod_input[2:]
+        else:
+            lower_i2, lower_i1 = prod_input[2:]
+
+        [lower_connected_neighbor] = get_common_neighbors(graph, lower_i1, lower_i2, lower_layer)
+        lower_i1_neighbors = get_neighbors_at(graph, lower_i1, lower_layer)
+        lower_i1_neighbors.remove(lower_connected_neighbor)
+        lower_i2_neighbors = get_neighbors_at(graph, lower_i2, lower_layer)
+        lower_i2_neighbors.remove(lower_connected_neighbor)
+
+        return next((v1, v2) for v1, v2 in itertools.product(lower_i1_neighbors, lower_i2_neighbors)
+                    if graph.nodes()[v1]['position'] == graph.nodes()[v2]['position'])
+
     @staticmethod
     def __check_prod_input(graph, prod_input):
         assert len(prod_input) == 4
@@ -2,28 +2,39 @@ from typing import List
 
 from networkx import Graph
 
-from agh_graphs.production import Production
-from agh_graphs.utils import gen_name, add_interior, get_neighbors_at, sort_segments_by_angle, add_break_in_segment, \
-    sort_vertices_by_coordinates
+from agh_graphs.production import Production, Match
+from agh_graphs.utils import gen_name, add_interior, get_correspondence, get_neighbors_at, add_break_in_segment, \
+    sort_vertices_by_coordinates, get_triangle_geometry, set_triangle_geometry
 
 
 class P2(Production):
+    read_keys = ('i_neighbors',)
+    rewritten_keys = ('i',)
 
-    def apply(self, graph: Graph, prod_input: List[str], orientation: int = 0, **kwargs) -> List[str]:
+    def match(self, graph: Graph, prod_input: List[str], orientation: int = 0, validate: bool = True,
+              **kwargs) -> Match:
         [i] = prod_input
+        if validate:
+            i_neighbors = self.__check_prod_input(graph, prod_input)
+        else:
+            i_neighbors = get_neighbors_at(graph, i, graph.nodes[i]['layer'])
+        return Match(self, prod_input, orientation, i=i, i_neighbors=i_neighbors)
+
+    def rewrite(self, graph: Graph, match: Match) -> List[str]:
+        i = match['i']
         i_data = graph.nodes[i]
-        self.__check_prod_input(graph, prod_input)
+        orientation = match.orientation
 
         i_data['label'] = 'i'
         i_layer = i_data['layer']
         new_layer = i_layer + 1
 
-        i_neighbors = get_neighbors_at(graph, i, i_layer)
+        i_neighbors = match['i_neighbors']
 
         # e1 doesn't mean e1 with (x1, y1)
-        vx_e1 = gen_name()
-        vx_e2 = gen_name()
-        vx_e3 = gen_name()
+        vx_e1 = gen_name(graph)
+        vx_e2 = gen_name(graph)
+        vx_e3 = gen_name(graph)
 
         e1_pos = graph.nodes[i_neighbors[0]]['position']
         e2_pos = graph.nodes[i_neighbors[1]]['position']
@@ -33,13 +44,21 @@ class P2(Production):
         graph.add_node(vx_e2, layer=new_layer, position=e2_pos, label='E')
         graph.add_node(vx_e3, layer=new_layer, position=e3_pos, label='E')
 
+        correspondence = get_correspondence(graph)
+        correspondence.add(graph, vx_e1, i_neighbors[0])
+        correspondence.add(graph, vx_e2, i_neighbors[1])
+        correspondence.add(graph, vx_e3, i_neighbors[2])
+
         graph.add_edge(vx_e1, vx_e2)
         graph.add_edge(vx_e2, vx_e3)
         graph.add_edge(vx_e3, vx_e1)
 
-        sorted_segments = sort_segments_by_angle(graph, [(vx_e1, vx_e2), (vx_e2, vx_e3), (vx_e3, vx_e1)])
-        segment_to_break = sorted_segments[orientation % 3]
+        # segments sorted by angle with the x axis, the same as for i
+        geometry = get_triangle_geometry(graph, i, i_neighbors)
+        segments = [(vx_e1, vx_e2), (vx_e2, vx_e3), (vx_e3, vx_e1)]
+        segment_to_break = segments[geometry.edge_ranks[orientation % 3]]
         b = add_break_in_segment(graph, segment_to_break)
+        correspondence.add(graph, b)
         b_neighbors = get_neighbors_at(graph, b, i_layer + 1)
         remaining = [x for x in [vx_e1, vx_e2, vx_e3] if x not in b_neighbors][0]
         graph.add_edge(b, remaining)
@@ -47,6 +66,11 @@ class P2(Production):
         i1 = add_interior(graph, b_neighbors[0], b, remaining)
         i2 = add_interior(graph, b_neighbors[1], b, remaining)
 
+        positions = dict(zip([vx_e1, vx_e2, vx_e3], geometry.positions))
+        positions[b] = graph.nodes[b]['position']
+        for child, corners in [(i1, (b_neighbors[0], b, remaining)), (i2, (b_neighbors[1], b, remaining))]:
+            set_triangle_geometry(graph, child, corners, [positions[v] for v in corners])
+
         graph.add_edge(i1, i)
         graph.add_edge(i2, i)
 
@@ -68,3 +92,5 @@ class P2(Production):
             n_neighbors = get_neighbors_at(graph, n_id, i_node_layer)
             for expected_neighbor in n_expected_neighbors:
                 assert expected_neighbor in n_neighbors
+
+        return neighbors
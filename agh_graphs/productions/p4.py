@@ -2,16 +2,27 @@ from typing import List
 
 from networkx import Graph
 
-from agh_graphs.production import Production
-from agh_graphs.utils import get_neighbors_at, gen_name, sort_segments_by_angle, add_interior, \
+from agh_graphs.production import Production, Match
+from agh_graphs.utils import get_neighbors_at, gen_name, get_correspondence, get_midpoints, get_triangle_geometry, add_interior, \
     get_vertex_between
 
 
 class P4(Production):
-
-    def apply(self, graph: Graph, prod_input: List[str], orientation: int = 0, **kwargs) -> List[str]:
-        e1, e2, e3, e12, e13 = self.__check_prod_input(graph, prod_input)
+    read_keys = ('e1', 'e2', 'e3', 'e12', 'e13')
+    rewritten_keys = ('i',)
+
+    def match(self, graph: Graph, prod_input: List[str], orientation: int = 0, validate: bool = True,
+              **kwargs) -> Match:
+        if validate:
+            e1, e2, e3, e12, e13 = self.__check_prod_input(graph, prod_input)
+        else:
+            e1, e2, e3, e12, e13 = self.__resolve_prod_input(graph, prod_input)
         [i] = prod_input
+        return Match(self, prod_input, orientation, i=i, e1=e1, e2=e2, e3=e3, e12=e12, e13=e13)
+
+    def rewrite(self, graph: Graph, match: Match) -> List[str]:
+        [i, e1, e2, e3, e12, e13] = [match[name] for name in ['i', 'e1', 'e2', 'e3', 'e12', 'e13']]
+        orientation = match.orientation
         i_data = graph.nodes[i]
 
         i_data['label'] = 'i'
@@ -19,11 +30,11 @@ class P4(Production):
         new_layer = i_layer + 1
 
         # create new layer
-        new_e1 = gen_name()
-        new_e2 = gen_name()
-        new_e3 = gen_name()
-        new_e12 = gen_name()
-        new_e13 = gen_name()
+        new_e1 = gen_name(graph)
+        new_e2 = gen_name(graph)
+        new_e3 = gen_name(graph)
+        new_e12 = gen_name(graph)
+        new_e13 = gen_name(graph)
 
         graph.add_node(new_e1, layer=new_layer, position=graph.nodes[e1]['position'], label='E')
         graph.add_node(new_e2, layer=new_layer, position=graph.nodes[e2]['position'], label='E')
@@ -31,13 +42,24 @@ class P4(Production):
         graph.add_node(new_e12, layer=new_layer, position=graph.nodes[e12]['position'], label='E')
         graph.add_node(new_e13, layer=new_layer, position=graph.nodes[e13]['position'], label='E')
 
+        correspondence = get_correspondence(graph)
+        for new_e, e in [(new_e1, e1), (new_e2, e2), (new_e3, e3), (new_e12, e12), (new_e13, e13)]:
+            correspondence.add(graph, new_e, e)
+        midpoints = get_midpoints(graph)
+        midpoints.add(new_e1, new_e2, new_e12)
+        midpoints.add(new_e1, new_e3, new_e13)
+
         graph.add_edge(new_e1, new_e12)
         graph.add_edge(new_e12, new_e2)
         graph.add_edge(new_e1, new_e13)
         graph.add_edge(new_e13, new_e3)
         graph.add_edge(new_e2, new_e3)
 
-        sorted_segments = sort_segments_by_angle(graph, [(new_e1, new_e2), (new_e1, new_e3)])
+        # segments sorted by angle with the x axis, the same as for i
+        geometry = get_triangle_geometry(graph, i)
+        sorted_segments = [(new_e1, new_e2), (new_e1, new_e3)]
+        if geometry.edge_ranks.index(geometry.edge(e1, e3)) < geometry.edge_ranks.index(geometry.edge(e1, e2)):
+            sorted_segments.reverse()
         segment_to_break = sorted_segments[orientation % 2]
         (v1, v2) = segment_to_break
         b = get_vertex_between(graph, v1, v2, new_layer, 'E')
@@ -57,6 +79,20 @@ class P4(Production):
 
         return [i1, i2, i3]
 
+    @staticmethod
+    def __resolve_prod_input(graph, prod_input):
+        [i_id] = prod_input
+        i_layer = graph.nodes[i_id]['layer']
+        i_neighbors = get_neighbors_at(graph, i_id, i_layer)
+
+        [e1] = [e for e in i_neighbors
+                if all(n not in i_neighbors for n in get_neighbors_at(graph, e, i_layer))]
+        (e2, e3) = [e for e in i_neighbors if e != e1]
+        e12 = get_vertex_between(graph, e1, e2, i_layer, 'E')
+        e13 = get_vertex_between(graph, e1, e3, i_layer, 'E')
+
+        return e1, e2, e3, e12, e13
+
     @staticmethod
     def __check_prod_input(graph, prod_input):
         assert len(prod_input) == 1
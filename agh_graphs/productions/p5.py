@@ -2,23 +2,25 @@ from typing import List
 
 from networkx import Graph
 
-from agh_graphs.production import Production
-from agh_graphs.utils import gen_name, add_interior, get_neighbors_at, angle_with_x_axis
-import math
+from agh_graphs.exact import is_exact
+from agh_graphs.production import Production, Match
+from agh_graphs.utils import gen_name, add_interior, get_neighbors_at, get_correspondence, get_midpoints, \
+    get_midpoint_vertex, get_triangle_geometry, set_triangle_geometry
 from math import isclose
 
 
 class P5(Production):
+    read_keys = ('e1', 'e2', 'e3', 'e12', 'e23', 'e31')
+    rewritten_keys = ('i',)
 
-    def apply(self, graph: Graph, prod_input: List[str], orientation: int = 0, **kwargs) -> List[str]:
+    def match(self, graph: Graph, prod_input: List[str], orientation: int = 0, validate: bool = True,
+              **kwargs) -> Match:
         eps = kwargs.get('epsilon', 1e-6)
-        self.__check_prod_input(graph, prod_input, eps)
+        if validate:
+            self.__check_prod_input(graph, prod_input, eps)
 
         [i] = prod_input
-        i_data = graph.nodes[i]
-        i_data['label'] = 'i'
-        i_layer = i_data['layer']
-        new_layer = i_layer + 1
+        i_layer = graph.nodes[i]['layer']
 
         # get 'E' nodes from the left side of production
         [e1, e2, e3] = self.get_corner_nodes(graph, i, i_layer, orientation)
@@ -27,14 +29,23 @@ class P5(Production):
         e23 = self.get_node_between(graph, e2, e3, i_layer, eps)
         e31 = self.get_node_between(graph, e3, e1, i_layer, eps)
 
+        return Match(self, prod_input, orientation, i=i, e1=e1, e2=e2, e3=e3, e12=e12, e23=e23, e31=e31)
+
+    def rewrite(self, graph: Graph, match: Match) -> List[str]:
+        [i, e1, e2, e3, e12, e23, e31] = [match[name] for name in ['i', 'e1', 'e2', 'e3', 'e12', 'e23', 'e31']]
+        i_data = graph.nodes[i]
+        i_data['label'] = 'i'
+        i_layer = i_data['layer']
+        new_layer = i_layer + 1
+
         # create new 'E' nodes in the next layer
-        new_e1 = gen_name()
-        new_e2 = gen_name()
-        new_e3 = gen_name()
+        new_e1 = gen_name(graph)
+        new_e2 = gen_name(graph)
+        new_e3 = gen_name(graph)
 
-        new_e12 = gen_name()
-        new_e23 = gen_name()
-        new_e31 = gen_name()
+        new_e12 = gen_name(graph)
+        new_e23 = gen_name(graph)
+        new_e31 = gen_name(graph)
 
         graph.add_node(new_e1, layer=new_layer, position=graph.nodes[e1]['position'], label='E')
         graph.add_node(new_e2, layer=new_layer, position=graph.nodes[e2]['position'], label='E')
@@ -44,6 +55,14 @@ class P5(Production):
         graph.add_node(new_e23, layer=new_layer, position=graph.nodes[e23]['position'], label='E')
         graph.add_node(new_e31, layer=new_layer, position=graph.nodes[e31]['position'], label='E')
 
+        correspondence = get_correspondence(graph)
+        for new_e, e in [(new_e1, e1), (new_e2, e2), (new_e3, e3), (new_e12, e12), (new_e23, e23), (new_e31, e31)]:
+            correspondence.add(graph, new_e, e)
+        midpoints = get_midpoints(graph)
+        midpoints.add(new_e1, new_e2, new_e12)
+        midpoints.add(new_e2, new_e3, new_e23)
+        midpoints.add(new_e3, new_e1, new_e31)
+
         # create edges between new 'E' nodes
         graph.add_edge(new_e1, new_e12)
         graph.add_edge(new_e12, new_e2)
@@ -70,6 +89,13 @@ class P5(Production):
         graph.add_edge(i2a, i)
         graph.add_edge(i2b, i)
 
+        positions = {new_e: graph.nodes[e]['position']
+                     for new_e, e in [(new_e1, e1), (new_e2, e2), (new_e3, e3), (new_e12, e12), (new_e23, e23),
+                                      (new_e31, e31)]}
+        for child, corners in [(i1, (new_e1, new_e12, new_e31)), (i3, (new_e3, new_e23, new_e31)),
+                               (i2a, (new_e2, new_e12, new_e31)), (i2b, (new_e2, new_e23, new_e31))]:
+            set_triangle_geometry(graph, child, corners, [positions[v] for v in corners])
+
         return [i1, i3, i2a, i2b]
 
     @staticmethod
@@ -88,16 +114,8 @@ class P5(Production):
             assert graph.nodes[n_id]['label'] == 'E'
 
         for e1, e2 in zip(neighbours, neighbours[1:] + neighbours[:1]):
-            # find common 'E' neighbours in the same layer and exactly in the middle of e1_e2 segment
-            (e1_x, e1_y) = graph.nodes[e1]['position']
-            (e2_x, e2_y) = graph.nodes[e2]['position']
-            middle_position = ((e1_x + e2_x) / 2, (e1_y + e2_y) / 2)
-            common_neighbours = [n for n in graph.neighbors(e1)
-                                 if n in graph.neighbors(e2)
-                                 and graph.nodes[n]['layer'] == i_node_layer
-                                 and graph.nodes[n]['label'] == 'E'
-                                 and P5.is_close(graph.nodes[n]['position'], middle_position, eps)]
-            assert len(common_neighbours) == 1
+            # find the common 'E' neighbour in the same layer and exactly in the middle of e1_e2 segment
+            P5.get_node_between(graph, e1, e2, i_node_layer, eps)
 
     @staticmethod
     def get_corner_nodes(graph, i, i_layer, orientation):
@@ -109,33 +127,12 @@ class P5(Production):
         chosen by switching segment 'orientation' times in counterclockwise direction.
         """
 
-        [a, b, c] = get_neighbors_at(graph, i, i_layer)
-
-        # find counterclockwise order of nodes
-        (a_x, a_y) = graph.nodes[a]['position']
-        (b_x, b_y) = graph.nodes[b]['position']
-        (c_x, c_y) = graph.nodes[c]['position']
-
-        m = P5.calc_mean(a_x, a_y, b_x, b_y, c_x, c_y)
-
-        ma_angle = angle_with_x_axis(m, (a_x, a_y))
-        mb_angle = angle_with_x_axis(m, (b_x, b_y))
-        mc_angle = angle_with_x_axis(m, (c_x, c_y))
+        # counterclockwise order of nodes and the longest edge
+        geometry = get_triangle_geometry(graph, i, get_neighbors_at(graph, i, i_layer))
+        nodes_counterclockwise = list(geometry.ccw)
 
-        angles_counterclockwise = sorted([(a, ma_angle), (b, mb_angle), (c, mc_angle)], key=lambda p: p[1])
-        nodes_counterclockwise = [p[0] for p in angles_counterclockwise]
-
-        # find longest edge
-        ab = P5.calc_distance_between(graph, a, b)
-        bc = P5.calc_distance_between(graph, b, c)
-        ca = P5.calc_distance_between(graph, c, a)
-
-        if max(ab, bc, ca) == ab:
-            middle_offset = nodes_counterclockwise.index(c)
-        elif max(ab, bc, ca) == bc:
-            middle_offset = nodes_counterclockwise.index(a)
-        else:
-            middle_offset = nodes_counterclockwise.index(b)
+        # the corner opposite to the longest edge
+        middle_offset = nodes_counterclockwise.index(geometry.corners[(geometry.longest + 2) % 3])
 
         offset = (orientation + (1 - middle_offset)) % 3
 
@@ -149,32 +146,25 @@ class P5(Production):
         (e1_x, e1_y) = graph.nodes[e1]['position']
         (e2_x, e2_y) = graph.nodes[e2]['position']
         desired_position = ((e1_x + e2_x) / 2, (e1_y + e2_y) / 2)
-        neighbours = [n for n in graph.neighbors(e1)
-                      if n in graph.neighbors(e2)
-                      and graph.nodes[n]['layer'] == layer
-                      and P5.is_close(graph.nodes[n]['position'], desired_position, eps)
-                      and graph.nodes[n]['label'] == 'E']
-        assert len(neighbours) == 1
-        return neighbours[0]
 
-    @staticmethod
-    def calc_distance_between(graph, e1, e2):
-        """
-        Calculates distance between node e1 and node e2.
-        """
-        (e1_x, e1_y) = graph.nodes[e1]['position']
-        (e2_x, e2_y) = graph.nodes[e2]['position']
-        return math.sqrt((e1_x - e2_x) ** 2 + (e1_y - e2_y) ** 2)
+        def matches(n):
+            return graph.nodes[n]['layer'] == layer \
+                and P5.is_close(graph.nodes[n]['position'], desired_position, eps) \
+                and graph.nodes[n]['label'] == 'E'
 
-    @staticmethod
-    def calc_mean(e1_x, e1_y, e2_x, e2_y, e3_x, e3_y):
-        """
-        Calculates mean of x and y coordinates of e1, e2 and e3
-        """
-        return (e1_x + e2_x + e3_x) / 3, (e1_y + e2_y + e3_y) / 3
+        recorded = get_midpoint_vertex(graph, e1, e2)
+        if recorded is not None and matches(recorded):
+            return recorded
+
+        e2_neighbours = set(graph.neighbors(e2))
+        neighbours = [n for n in graph.neighbors(e1) if n in e2_neighbours and matches(n)]
+        assert len(neighbours) == 1
+        return neighbours[0]
 
     @staticmethod
     def is_close(pos1, pos2, eps):
         x1, y1 = pos1
         x2, y2 = pos2
+        if is_exact(x1) and is_exact(x2):
+            return pos1 == pos2
         return isclose(x1, x2, abs_tol=eps) and isclose(y1, y2, abs_tol=eps)
@@ -1,52 +1,63 @@
 from typing import List
 
 from networkx import Graph
-from agh_graphs.production import Production
-from agh_graphs.utils import get_neighbors_at, find_overlapping_vertices, join_overlapping_vertices, get_common_neighbors
+from agh_graphs.production import Production, Match
+from agh_graphs.utils import get_neighbors_at, find_overlapping_vertices, join_vertices, get_common_neighbors
 
 
 class P6(Production):
+    rewritten_keys = ('to_merge',)
 
-    def apply(self, graph: Graph, prod_input: List[str], orientation: int = 0, **kwargs) -> List[str]:
+    def match(self, graph: Graph, prod_input: List[str], orientation: int = 0, validate: bool = True,
+              **kwargs) -> Match:
         """
-        Apply 6th production on graph
+        Match 6th production on graph
 
         `prod_input` is list of 6 interiors as follows: `[upper, upper, lower, lower, lower, lower]`,
         where `upper` is vertex on upper layer and `lower` on lower layer. Order of vertices in one
         layer is irrelevant.
 
         `orientation` and `**kwargs` are ignored
+        """
+
+        if validate:
+            down_layer, to_merge = self.__check_prod_input(graph, prod_input)
+        else:
+            down_layer, to_merge = self.__resolve_prod_input(graph, prod_input)
+        return Match(self, prod_input, orientation, layer=down_layer, to_merge=to_merge)
+
+    def rewrite(self, graph: Graph, match: Match) -> List[str]:
+        """
+        Merges pairs of lower vertices resolved by `match`.
 
         Returns empty list, as no new vertices were added.
         """
+        join_vertices(graph, match['to_merge'], match['layer'])
 
-        self.__check_prod_input(graph, prod_input)
+        return []
 
+    @staticmethod
+    def __resolve_prod_input(graph: Graph, prod_input: List[str]):
         up_layer = graph.nodes()[prod_input[0]]['layer']
         down_layer = graph.nodes()[prod_input[2]]['layer']
+
         v1_up, v2_up = get_common_neighbors(graph, prod_input[0], prod_input[1], up_layer)
         pos_v1 = graph.nodes()[v1_up]['position']
         pos_v2 = graph.nodes()[v2_up]['position']
-
-        x = (pos_v1[0] + pos_v2[0]) / 2
-        y = (pos_v1[1] + pos_v2[1]) / 2
-        pos_center = (x, y)
+        pos_center = ((pos_v1[0] + pos_v2[0]) / 2, (pos_v1[1] + pos_v2[1]) / 2)
 
         to_merge = [[], [], []]
         for interior in prod_input[2:]:
             for v in get_neighbors_at(graph, interior, down_layer):
-                if graph.nodes()[v]['position'] == pos_v1:
+                position = graph.nodes()[v]['position']
+                if position == pos_v1:
                     to_merge[0].append(v)
-                elif graph.nodes()[v]['position'] == pos_v2:
+                elif position == pos_v2:
                     to_merge[1].append(v)
-                elif graph.nodes()[v]['position'] == pos_center:
-                    if v not in to_merge[2]:
-                        to_merge[2].append(v)
-
-        for v1, v2 in to_merge:
-            join_overlapping_vertices(graph, v1, v2, down_layer)
+                elif position == pos_center and v not in to_merge[2]:
+                    to_merge[2].append(v)
 
-        return []
+        return down_layer, to_merge
 
     @staticmethod
     def __check_prod_input(graph: Graph, prod_input: List[str]):
@@ -108,17 +119,22 @@ class P6(Production):
         if not graph.has_edge(v1_up, v2_up):
             raise ValueError('Upper vertices are not connected')
 
-        # Prepare list of vertices in lower layer
+        # Prepare list of vertices in lower layer, and lists of vertices to merge
         pairs_of_lower = [set(), set(), set()]
+        to_merge = [[], [], []]
         for interior in prod_input[2:]:
             for v in get_neighbors_at(graph, interior, down_layer):
                 if graph.nodes()[v]['position'] == pos_v1:
                     pairs_of_lower[0].add((v, lower_to_upper[interior]))
+                    to_merge[0].append(v)
                 elif graph.nodes()[v]['position'] == pos_v2:
                     pairs_of_lower[1].add((v, lower_to_upper[interior]))
+                    to_merge[1].append(v)
                 elif graph.nodes()[v]['position'] == pos_center:
                     if v not in pairs_of_lower[2]:
                         pairs_of_lower[2].add((v, lower_to_upper[interior]))
+                    if v not in to_merge[2]:
+                        to_merge[2].append(v)
 
         # Check if pair is indeed pair of vertices
         for pair in pairs_of_lower:
@@ -162,3 +178,5 @@ class P6(Production):
         if any(graph.nodes()[v]['label'] != 'E' for v in all_vertices):
             raise ValueError('Not all vertices have label E')
 
+        return down_layer, to_merge
+
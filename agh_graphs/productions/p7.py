@@ -1,11 +1,8 @@
 from typing import List
 
 from networkx import Graph
-from agh_graphs.production import Production
-from agh_graphs.utils import get_neighbors_at, join_overlapping_vertices, get_common_neighbors
-
-from agh_graphs.visualize import visualize_graph_3d
-from matplotlib import pyplot
+from agh_graphs.production import Production, Match
+from agh_graphs.utils import get_neighbors_at, join_vertices, get_common_neighbors
 
 
 def common_elements(list1, list2):
@@ -22,14 +19,50 @@ def are_connected(graph, vertices):
 
 
 class P7(Production):
-    def apply(self, graph: Graph, prod_input: List[str], orientation: int = 0, **kwargs) -> List[str]:
-        layer, to_merge = self.__check_prod_input(graph, prod_input)
+    rewritten_keys = ('to_merge',)
+
+    def match(self, graph: Graph, prod_input: List[str], orientation: int = 0, validate: bool = True,
+              **kwargs) -> Match:
+        if validate:
+            layer, to_merge = self.__check_prod_input(graph, prod_input)
+        else:
+            layer, to_merge = self.__resolve_prod_input(graph, prod_input)
+        return Match(self, prod_input, orientation, layer=layer, to_merge=list(to_merge))
 
-        for v1, v2 in to_merge:
-            join_overlapping_vertices(graph, v1, v2, layer)
+    def rewrite(self, graph: Graph, match: Match) -> List[str]:
+        join_vertices(graph, match['to_merge'], match['layer'])
 
         return []
 
+    @staticmethod
+    def __resolve_prod_input(graph: Graph, prod_input: List[str]):
+        nodes = [(node_id, graph.nodes()[node_id]) for node_id in prod_input]
+        up_layer_nodes = [node_id for node_id, data in nodes if data['label'] == 'i']
+        down_layer_nodes = [node_id for node_id, data in nodes if data['label'] == 'I']
+        down_layer = graph.nodes()[down_layer_nodes[0]]['layer']
+
+        interior_neighbours0 = [node_id for node_id in graph.neighbors(up_layer_nodes[0])
+                                if graph.nodes()[node_id]['label'] == 'I']
+        interior_neighbours1 = [node_id for node_id in graph.neighbors(up_layer_nodes[1])
+                                if graph.nodes()[node_id]['label'] == 'I']
+
+        n1 = sorted(set(
+            get_neighbors_at(graph, interior_neighbours0[0], down_layer) +
+            get_neighbors_at(graph, interior_neighbours0[1], down_layer)
+        ), key=str)
+        n2 = sorted(set(
+            get_neighbors_at(graph, interior_neighbours1[0], down_layer) +
+            get_neighbors_at(graph, interior_neighbours1[1], down_layer)
+        ), key=str)
+        [c] = common_elements(n1, n2)
+        n1.remove(c)
+        n2.remove(c)
+
+        n1_pos = [graph.nodes()[n]['position'] for n in n1]
+        n2_pos = [graph.nodes()[n]['position'] for n in n2]
+        n1 = [n for n in n1 for pos in n2_pos if graph.nodes()[n]['position'] == pos]
+        n2 = [n for n in n2 for pos in n1_pos if graph.nodes()[n]['position'] == pos]
+        return down_layer, zip(n1, n2)
 
     @staticmethod
     def __check_prod_input(graph: Graph, prod_input: List[str]):
@@ -103,12 +136,12 @@ class P7(Production):
         n1 = sorted(set(
             get_neighbors_at(graph, interior_neighbours0[0], down_layer) +
             get_neighbors_at(graph, interior_neighbours0[1], down_layer)
-        ))
+        ), key=str)
 
         n2 = sorted(set(
             get_neighbors_at(graph, interior_neighbours1[0], down_layer) +
             get_neighbors_at(graph, interior_neighbours1[1], down_layer)
-        ))
+        ), key=str)
         c = common_elements(n1, n2)
         if len(c) != 1:
             raise ValueError('There is not exactly 1 common vertex on the line')
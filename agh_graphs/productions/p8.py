@@ -1,29 +1,40 @@
 from typing import List
 
 from networkx import Graph
-from agh_graphs.production import Production
-from agh_graphs.utils import get_neighbors_at, find_overlapping_vertices, join_overlapping_vertices, get_vertices_from_layer, get_node_at
+from agh_graphs.production import Production, Match
+from agh_graphs.utils import get_neighbors_at, find_overlapping_vertices, join_vertices, get_vertex_above
 
 
 class P8(Production):
+    rewritten_keys = ('to_merge',)
 
-    def apply(self, graph: Graph, prod_input: List[str], orientation: int = 0, **kwargs) -> List[str]:
+    def match(self, graph: Graph, prod_input: List[str], orientation: int = 0, validate: bool = True,
+              **kwargs) -> Match:
+        if validate:
+            layer, vertices_to_join = self.__check_prod_input(graph, prod_input)
+        else:
+            layer, vertices_to_join = self.__resolve_prod_input(graph, prod_input)
+        return Match(self, prod_input, orientation, layer=layer, to_merge=vertices_to_join)
 
-        self.__check_prod_input(graph, prod_input)
+    def rewrite(self, graph: Graph, match: Match) -> List[str]:
+        vertices_to_join = match['to_merge']
+        join_vertices(graph, [(vertices_to_join[0], vertices_to_join[1])], match['layer'])
 
-        overlapping_vertices = find_overlapping_vertices(graph)[0]
+        return match.prod_input
+
+    @staticmethod
+    def __resolve_prod_input(graph, prod_input):
         layer = graph.nodes()[prod_input[0]]['layer']
 
-        neighbours = set()
+        neighbours = {}
         for interior in prod_input:
-            neighbours |= set(get_neighbors_at(graph, interior, layer))
-
-        vertices_to_join = [neighbour for neighbour in neighbours
-                            if graph.nodes()[neighbour]['position'] == graph.nodes()[overlapping_vertices[0]]['position']]
+            neighbours.update(dict.fromkeys(get_neighbors_at(graph, interior, layer)))
 
-        join_overlapping_vertices(graph, vertices_to_join[0], vertices_to_join[1], layer)
+        overlapping_vertices = find_overlapping_vertices(graph, nodes=neighbours)
+        position = graph.nodes()[overlapping_vertices[0][0]]['position']
+        vertices_to_join = [neighbour for neighbour in neighbours if graph.nodes()[neighbour]['position'] == position]
 
-        return prod_input
+        return layer, vertices_to_join
 
     @staticmethod
     def __check_prod_input(graph, prod_input):
@@ -36,23 +47,21 @@ class P8(Production):
         if any(graph.nodes()[interior]['label'] != 'I' for interior in prod_input):
             raise ValueError('interior vertices must have I label')
 
-        all_I_neighbours = []
+        neighbours = {}
 
         for interior in prod_input:
             interior_neighbours = get_neighbors_at(graph, interior, layer)
             if len(interior_neighbours) not in [2, 3]:
                 raise ValueError('wrongly connected interior vertices')
+            neighbours.update(dict.fromkeys(interior_neighbours))
 
             for neighbour in interior_neighbours:
                 if graph.nodes()[neighbour]['label'] != 'E':
                     raise ValueError('interior vertices can be connect only with E vertices')
 
-                all_I_neighbours.append(neighbour)
-
-        E_vertices = get_vertices_from_layer(graph, layer, 'E')
+        # only the neighbourhood of the interiors is checked, not the whole layer
+        E_vertices = list(neighbours)
         E_vertices_position_prev_layer = []
-        if any(E_vertice not in all_I_neighbours for E_vertice in E_vertices):
-            raise ValueError('wrongly connected E vertices')
         for E_vertice in E_vertices:
             E_vertice_neighbours = get_neighbors_at(graph, E_vertice, layer)
             if len([I_node for I_node in E_vertice_neighbours if graph.nodes()[I_node]['label'] == "I"]) != 2:
@@ -61,7 +70,7 @@ class P8(Production):
             if len(E_vertice_E_neighbours) not in [1, 2, 3, 4]:
                 print(len(E_vertice_E_neighbours))
                 raise ValueError('each E vertice must be connected with at least one E vertice')
-            corresponding_vertice = get_node_at(graph, layer-1, graph.nodes()[E_vertice]['position'])
+            corresponding_vertice = get_vertex_above(graph, E_vertice, prod_input)
             if corresponding_vertice is not None:
                 E_vertices_position_prev_layer.append(corresponding_vertice)
 
@@ -80,15 +89,12 @@ class P8(Production):
             if (x, y) not in possible_positions:
                 raise ValueError('positions of noncorresponding vertices are incorrect')
 
-        overlapping_vertices = find_overlapping_vertices(graph)
+        overlapping_vertices = find_overlapping_vertices(graph, nodes=neighbours)
 
-        if len(overlapping_vertices) != 2 or \
-                any(overlapping_vertice1 not in set(all_I_neighbours)
-                    or overlapping_vertice2 not in set(all_I_neighbours)
-                    for overlapping_vertice1, overlapping_vertice2 in overlapping_vertices):
+        if len(overlapping_vertices) != 1:
             raise ValueError('incorrect shape of graph')
 
-        vertices_to_join = [neighbour for neighbour in set(all_I_neighbours) if
+        vertices_to_join = [neighbour for neighbour in neighbours if
                             graph.nodes()[neighbour]['position'] == graph.nodes()[overlapping_vertices[0][0]]['position']]
 
         if len(vertices_to_join) != 2:
@@ -110,3 +116,5 @@ class P8(Production):
 
         if len(set(I_neighbours_vertice1).intersection(I_neighbours_vertice2)) != 0:
             raise ValueError('vertices to join have common I neighbour')
+
+        return layer, vertices_to_join
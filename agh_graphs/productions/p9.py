@@ -2,28 +2,38 @@ from typing import List
 
 from networkx import Graph
 
-from agh_graphs.production import Production
-from agh_graphs.utils import gen_name, add_interior, get_neighbors_at
+from agh_graphs.production import Production, Match
+from agh_graphs.utils import gen_name, add_interior, get_neighbors_at, get_correspondence, copy_triangle_geometry
 
 
 class P9(Production):
+    read_keys = ('i_neighbors',)
+    rewritten_keys = ('i',)
 
-    def apply(self, graph: Graph, prod_input: List[str], orientation: int = 0, **kwargs) -> List[str]:
+    def match(self, graph: Graph, prod_input: List[str], orientation: int = 0, validate: bool = True,
+              **kwargs) -> Match:
         # Production based on P2
-        self.__check_prod_input(graph, prod_input)
-
-        [i] = prod_input
+        if validate:
+            i_neighbors = self.__check_prod_input(graph, prod_input)
+            [i] = prod_input
+        else:
+            [i] = prod_input
+            i_neighbors = get_neighbors_at(graph, i, graph.nodes[i]['layer'])
+        return Match(self, prod_input, orientation, i=i, i_neighbors=i_neighbors)
+
+    def rewrite(self, graph: Graph, match: Match) -> List[str]:
+        i = match['i']
         i_data = graph.nodes[i]
         i_data['label'] = 'i'
         i_layer = i_data['layer']
         new_layer = i_layer + 1
 
-        i_neighbors = get_neighbors_at(graph, i, i_layer)
+        i_neighbors = match['i_neighbors']
 
         # create new 'E' nodes in the next layer
-        new_e1 = gen_name()
-        new_e2 = gen_name()
-        new_e3 = gen_name()
+        new_e1 = gen_name(graph)
+        new_e2 = gen_name(graph)
+        new_e3 = gen_name(graph)
 
         e1_pos = graph.nodes[i_neighbors[0]]['position']
         e2_pos = graph.nodes[i_neighbors[1]]['position']
@@ -33,6 +43,11 @@ class P9(Production):
         graph.add_node(new_e2, layer=new_layer, position=e2_pos, label='E')
         graph.add_node(new_e3, layer=new_layer, position=e3_pos, label='E')
 
+        correspondence = get_correspondence(graph)
+        correspondence.add(graph, new_e1, i_neighbors[0])
+        correspondence.add(graph, new_e2, i_neighbors[1])
+        correspondence.add(graph, new_e3, i_neighbors[2])
+
         # create edges between new 'E' nodes
         graph.add_edge(new_e1, new_e2)
         graph.add_edge(new_e2, new_e3)
@@ -40,6 +55,7 @@ class P9(Production):
 
         # create new 'I' node and edges between new 'I' nodes and new 'E' nodes
         i1 = add_interior(graph, new_e1, new_e2, new_e3)
+        copy_triangle_geometry(graph, i, i1, [new_e1, new_e2, new_e3])
 
         # create edges between new 'I' node and parent 'i' node
         graph.add_edge(i1, i)
@@ -69,3 +85,5 @@ class P9(Production):
             for expected_neighbor in n_expected_neighbors:
                 if expected_neighbor not in n_neighbors:
                     raise ValueError("missing edge between vertices")
+
+        return neighbors
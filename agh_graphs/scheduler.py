@@ -0,0 +1,177 @@
+"""
+Scheduling of derivation steps.
+
+A derivation is a list of `Step`s, applications of productions. Inputs of a
+step are vertices of the graph or `Output`s of earlier steps, e.g. the first
+steps of derivation E:
+
+    steps = [
+        Step(P1(), [initial_node]),
+        Step(P2(), [Output(0, 0)], orientation=1),
+        Step(P2(), [Output(0, 1)], orientation=1),
+        Step(P6(), [Output(0, 0), Output(0, 1), Output(2, 1), Output(1, 1), Output(1, 0), Output(2, 0)]),
+    ]
+    scheduler = Scheduler(steps)
+    results = scheduler.run(graph)
+
+`Scheduler` finds dependencies between steps from vertices which they read
+and change. Every step changes its input vertices. Vertices which a production
+resolves from its input (e.g. corners of an interior) are not known before the
+step is matched, but they are shared only by outputs of the same step (or by
+vertices which existed before the derivation), so every step also uses these
+groups of vertices: refinements (P1, P2, P9, ...) only read them, stitching
+productions (P6, P12, ...) change them. Stitching productions also depend on
+vertices merged by other stitching productions around the same points (P7 and
+P13 need one pair already merged), so they keep their order among themselves.
+
+Steps which do not depend on each other run in waves (topological generations
+of `dag`), every wave is executed by a function which may apply its steps in any
+order, e.g. `apply_wave_in_batches`.
+"""
+from typing import Callable, List, NamedTuple
+
+import networkx
+from networkx import Graph
+
+from agh_graphs.production import Production
+
+# keys of matches of refinements, with the input vertex which they change
+INPUT_KEYS = ('i', 'initial_node')
+
+# group of vertices which existed before the derivation
+_EXISTING = (None, None)
+
+# vertices merged by stitching productions
+_MERGED = ('merged', None)
+
+
+class Output(NamedTuple):
+    """
+    Reference to the vertex returned at `index` by the step number `step`.
+    """
+    step: int
+    index: int
+
+
+class Step(NamedTuple):
+    """
+    Application of `production` on `inputs` (vertices or `Output`s) with `orientation`.
+    """
+    production: Production
+    inputs: list
+    orientation: int = 0
+
+
+def apply_wave(graph: Graph, wave: List[Step]) -> List[List[str]]:
+    """
+    Applies steps of `wave` (with inputs resolved to vertices) one by one.
+    """
+    return [step.production.apply(graph, step.inputs, step.orientation) for step in wave]
+
+
+def apply_wave_in_batches(graph: Graph, wave: List[Step]) -> List[List[str]]:
+    """
+    Applies steps of `wave` (with inputs resolved to vertices), steps of
+    the same production class are applied with one `Production.apply_many` call.
+    """
+    by_production = {}
+    for index, step in enumerate(wave):
+        by_production.setdefault(type(step.production), []).append(index)
+
+    results = [None] * len(wave)
+    for indexes in by_production.values():
+        production = wave[indexes[0]].production
+        batch_results = production.apply_many(graph, [wave[index].inputs for index in indexes],
+                                              [wave[index].orientation for index in indexes])
+        for index, result in zip(indexes, batch_results):
+            results[index] = result
+    return results
+
+
+class Scheduler:
+    """
+    Dependency graph of derivation steps.
+    """
+
+    def __init__(self, steps: List[Step]):
+        self.steps = list(steps)
+        self.dag = networkx.DiGraph()
+        self.dag.add_nodes_from(range(len(self.steps)))
+
+        last_writer = {}
+        readers = {}
+        for index, step in enumerate(self.steps):
+            (read, written) = self.__accessed(index, step)
+            self.dag.add_edges_from((vertex.step, index) for vertex in step.inputs if isinstance(vertex, Output))
+            for key in read:
+                if key in last_writer:
+                    self.dag.add_edge(last_writer[key], index)
+            for key in written:
+                if key in last_writer:
+                    self.dag.add_edge(last_writer[key], index)
+                self.dag.add_edges_from((reader, index) for reader in readers.pop(key, ()) if reader != index)
+
+            for key in read:
+                readers.setdefault(key, []).append(index)
+            for key in written:
+                last_writer[key] = index
+
+    @staticmethod
+    def __accessed(index: int, step: Step):
+        """
+        Returns keys of vertices (and groups of vertices) which `step` reads and changes.
+        """
+        refinement = step.production.rewritten_keys is not None \
+            and all(key in INPUT_KEYS for key in step.production.rewritten_keys)
+        read = set()
+        written = set() if refinement else {_MERGED}
+        for vertex in step.inputs:
+            if isinstance(vertex, Output):
+                if not 0 <= vertex.step < index:
+                    raise ValueError('step {} uses output of step {}'.format(index, vertex.step))
+                group = (vertex.step, None)
+            else:
+                group = _EXISTING
+            written.add(vertex)
+            (read if refinement else written).add(group)
+        return read - written, written
+
+    def dependencies(self, index: int) -> List[int]:
+        """
+        Returns steps which have to be applied before the step number `index`.
+        """
+        return sorted(self.dag.predecessors(index))
+
+    def waves(self) -> List[List[int]]:
+        """
+        Returns numbers of steps grouped in waves: every step depends only on steps from earlier waves.
+        """
+        # a step is in the wave after the last wave of its dependencies
+        # (like `networkx.topological_generations`, which needs networkx 2.6)
+        depths = {}
+        for index in networkx.topological_sort(self.dag):
+            depths[index] = max((depths[p] + 1 for p in self.dag.predecessors(index)), default=0)
+        waves = [[] for _ in range(max(depths.values(), default=-1) + 1)]
+        for index in sorted(depths):
+            waves[depths[index]].append(index)
+        return waves
+
+    def run(self, graph: Graph, execute_wave: Callable[[Graph, List[Step]], List[List[str]]] = apply_wave) \
+            -> List[List[str]]:
+        """
+        Applies all steps on `graph`, wave by wave. `execute_wave(graph, wave)`
+        applies steps of a wave and returns their results, in the order of the wave.
+
+        Returns results of all steps, in the order of steps.
+        """
+        results = [None] * len(self.steps)
+        for wave in self.waves():
+            resolved = [self.__resolve(self.steps[index], results) for index in wave]
+            for index, result in zip(wave, execute_wave(graph, resolved)):
+                results[index] = result
+        return results
+
+    @staticmethod
+    def __resolve(step: Step, results: List[List[str]]) -> Step:
+        inputs = [results[v.step][v.index] if isinstance(v, Output) else v for v in step.inputs]
+        return Step(step.production, inputs, step.orientation)
@@ -0,0 +1,264 @@
+"""
+Transactions on graphs.
+
+`Transaction` wraps a graph (`networkx.Graph` or `LayeredGraph`) and records
+every mutation made through it in an undo journal. `rollback` reverts the
+recorded mutations in reverse order, `commit` just drops the journal, so both
+cost as much as the mutations made in the transaction, not as much as
+copying the whole graph.
+
+Removed edges and nodes are restored with their neighbors in the original
+order, since productions pick vertices in the order of neighbors. Restored
+nodes are moved to the end of the order of nodes of the graph.
+
+Used as a context manager, the transaction is rolled back if an exception
+is raised and committed otherwise:
+
+    with Transaction(graph) as journaled:
+        P2().apply(journaled, [i])
+
+See also `Production.apply_in_transaction`.
+"""
+from collections.abc import Mapping, MutableMapping
+
+_MISSING = object()
+
+
+class Transaction:
+    """
+    Graph wrapper which journals node, edge and node attribute mutations.
+
+    Methods and attributes which are not overridden (e.g. `neighbors`, `has_edge`,
+    `layer_nodes`) are forwarded to the wrapped graph.
+    """
+
+    def __init__(self, graph):
+        self.wrapped = graph
+        self.journal = []
+        allocator = graph.graph.get('id_allocator')
+        self.__next_id = allocator.next_id if allocator is not None else _MISSING
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+        return False
+
+    def commit(self):
+        """
+        Keeps all mutations made in this transaction.
+        """
+        self.journal = []
+        self.__save_next_id()
+
+    def rollback(self):
+        """
+        Reverts all mutations made in this transaction (or since the last `commit`).
+        """
+        graph = self.wrapped
+        while self.journal:
+            undo = self.journal.pop()
+            undo[0](graph, *undo[1:])
+
+        allocator = graph.graph.get('id_allocator')
+        if self.__next_id is _MISSING:
+            graph.graph.pop('id_allocator', None)
+        elif allocator is not None:
+            allocator.next_id = self.__next_id
+
+    def __save_next_id(self):
+        allocator = self.wrapped.graph.get('id_allocator')
+        self.__next_id = allocator.next_id if allocator is not None else _MISSING
+
+    # ---- forwarded ----
+
+    def __getattr__(self, name):
+        return getattr(self.wrapped, name)
+
+    def __iter__(self):
+        return iter(self.wrapped)
+
+    def __len__(self):
+        return len(self.wrapped)
+
+    def __contains__(self, n):
+        return n in self.wrapped
+
+    # ---- nodes ----
+
+    @property
+    def nodes(self):
+        return JournaledNodeView(self)
+
+    def add_node(self, node_for_adding, **attr):
+        graph = self.wrapped
+        if node_for_adding in graph:
+            attributes = JournaledAttributes(self, node_for_adding, graph.nodes[node_for_adding])
+            attributes.update(attr)
+        else:
+            graph.add_node(node_for_adding, **attr)
+            self.journal.append((_remove_node, node_for_adding))
+
+    def add_nodes_from(self, nodes_for_adding, **attr):
+        for n in nodes_for_adding:
+            if isinstance(n, tuple) and len(n) == 2 and isinstance(n[1], Mapping):
+                (n, node_attr) = n
+                self.add_node(n, **attr)
+                self.add_node(n, **node_attr)
+            else:
+                self.add_node(n, **attr)
+
+    def remove_node(self, n):
+        graph = self.wrapped
+        attributes = dict(graph.nodes[n])
+        neighbors = list(graph.neighbors(n))
+        orders = [list(graph.neighbors(neighbor)) for neighbor in neighbors]
+        graph.remove_node(n)
+        self.journal.append((_restore_node, n, attributes, neighbors, orders))
+
+    def remove_nodes_from(self, nodes):
+        for n in list(nodes):
+            if n in self.wrapped:
+                self.remove_node(n)
+
+    # ---- edges ----
+
+    def add_edge(self, u_of_edge, v_of_edge):
+        graph = self.wrapped
+        for n in (u_of_edge, v_of_edge):
+            if n not in graph:
+                self.add_node(n)
+        if not graph.has_edge(u_of_edge, v_of_edge):
+            graph.add_edge(u_of_edge, v_of_edge)
+            self.journal.append((_remove_edge, u_of_edge, v_of_edge))
+
+    def add_edges_from(self, ebunch_to_add):
+        for u, v in ebunch_to_add:
+            self.add_edge(u, v)
+
+    def remove_edge(self, u, v):
+        graph = self.wrapped
+        orders = (list(graph.neighbors(u)), list(graph.neighbors(v)))
+        graph.remove_edge(u, v)
+        self.journal.append((_restore_edge, u, v, orders))
+
+    def remove_edges_from(self, ebunch):
+        for u, v, *_ in list(ebunch):
+            if self.wrapped.has_edge(u, v):
+                self.remove_edge(u, v)
+
+
+class JournaledNodeView(Mapping):
+    """
+    `graph.nodes` of a `Transaction`, node attributes are journaled.
+    """
+
+    def __init__(self, transaction: Transaction):
+        self.__transaction = transaction
+        self.__nodes = transaction.wrapped.nodes
+
+    def __call__(self, data=False, default=None):
+        if data is False:
+            return self
+        if data is True:
+            return [(n, self[n]) for n in self.__nodes]
+        return self.__nodes(data=data, default=default)
+
+    data = __call__
+
+    def __getitem__(self, n):
+        return JournaledAttributes(self.__transaction, n, self.__nodes[n])
+
+    def __iter__(self):
+        return iter(self.__nodes)
+
+    def __len__(self):
+        return len(self.__nodes)
+
+    def __contains__(self, n):
+        return n in self.__nodes
+
+
+class JournaledAttributes(MutableMapping):
+    """
+    Attributes of a node of a `Transaction`, writes are journaled.
+    """
+
+    def __init__(self, transaction: Transaction, n, attributes):
+        self.__journal = transaction.journal
+        self.__n = n
+        self.__attributes = attributes
+
+    def __getitem__(self, key):
+        return self.__attributes[key]
+
+    def __setitem__(self, key, value):
+        self.__journal.append((_restore_attribute, self.__n, key, self.__attributes.get(key, _MISSING)))
+        self.__attributes[key] = value
+
+    def __delitem__(self, key):
+        old = self.__attributes[key]
+        del self.__attributes[key]
+        self.__journal.append((_restore_attribute, self.__n, key, old))
+
+    def __iter__(self):
+        return iter(self.__attributes)
+
+    def __len__(self):
+        return len(self.__attributes)
+
+    def __contains__(self, key):
+        return key in self.__attributes
+
+    def __repr__(self):
+        return repr(self.__attributes)
+
+
+def _remove_node(graph, n):
+    graph.remove_node(n)
+
+
+def _restore_node(graph, n, attributes, neighbors, orders):
+    graph.add_node(n, **attributes)
+    graph.add_edges_from((n, neighbor) for neighbor in neighbors)
+    for neighbor, order in zip(neighbors, orders):
+        _reorder_neighbors(graph, neighbor, order)
+
+
+def _restore_edge(graph, u, v, orders):
+    graph.add_edge(u, v)
+    _reorder_neighbors(graph, u, orders[0])
+    _reorder_neighbors(graph, v, orders[1])
+
+
+def _reorder_neighbors(graph, n, order):
+    """
+    Puts neighbors of `n` back in `order`, the order before they were changed.
+    Added edges are appended to the adjacency of both ends, so the restored
+    neighbor is moved to its former place.
+    """
+    reorder_neighbors = getattr(graph, 'reorder_neighbors', None)
+    if reorder_neighbors is not None:
+        reorder_neighbors(n, order)
+        return
+    # `networkx.Graph` keeps neighbors in the order of keys of its adjacency dicts
+    adjacency = graph._adj[n]
+    ranks = {neighbor: rank for rank, neighbor in enumerate(order)}
+    items = sorted(adjacency.items(), key=lambda item: ranks.get(item[0], len(ranks)))
+    adjacency.clear()
+    adjacency.update(items)
+
+
+def _remove_edge(graph, u, v):
+    graph.remove_edge(u, v)
+
+
+def _restore_attribute(graph, n, key, value):
+    if value is _MISSING:
+        del graph.nodes[n][key]
+    else:
+        graph.nodes[n][key] = value
@@ -1,15 +1,240 @@
 """
 Utility module.
 """
-import functools
+import itertools
 import math
+import operator
 import uuid
+from collections.abc import Mapping
+from typing import NamedTuple
 
 from networkx import Graph
 
+from agh_graphs.exact import exact_position, is_exact
 
-def gen_name():
-    return str(uuid.uuid1())
+# relative tolerance used by `is_close`, the same as the default of `math.isclose`
+IS_CLOSE_REL_TOL = 1e-09
+
+
+class IdAllocator:
+    """
+    Allocates consecutive integer ids for the nodes of a graph.
+
+    Use `get_id_allocator` to get the allocator of a graph, so that
+    every graph has exactly one allocator.
+    """
+
+    def __init__(self, next_id: int = 0):
+        self.next_id = next_id
+
+    def allocate(self, graph: Graph = None) -> int:
+        """
+        Returns the next free id. Ids which are already nodes of `graph`
+        are skipped.
+        """
+        node_id = self.next_id
+        if graph is not None:
+            while node_id in graph:
+                node_id += 1
+        self.next_id = node_id + 1
+        return node_id
+
+    def copy(self) -> 'IdAllocator':
+        return IdAllocator(self.next_id)
+
+
+class NodeNames(Mapping):
+    """
+    String view of the names of nodes of `graph`: maps every node to its name
+    as a string, e.g. for labels of drawings. Strings are built when they are
+    read, so the view follows changes of the graph.
+    """
+
+    def __init__(self, graph: Graph):
+        self.__graph = graph
+
+    def __getitem__(self, n):
+        if n not in self.__graph:
+            raise KeyError(n)
+        return str(n)
+
+    def __iter__(self):
+        return iter(self.__graph)
+
+    def __len__(self):
+        return len(self.__graph)
+
+
+def get_id_allocator(graph: Graph) -> IdAllocator:
+    """
+    Returns the id allocator of `graph`, it is kept in `graph.graph`.
+    """
+    allocator = graph.graph.get('id_allocator')
+    if allocator is None:
+        allocator = graph.graph['id_allocator'] = IdAllocator()
+    return allocator
+
+
+class Correspondence:
+    """
+    Vertices of the layer above which correspond to (have the same position as)
+    vertices copied down by productions. Vertices which productions create
+    without a counterpart above (e.g. midpoints of edges broken by P2) map to `None`.
+
+    Use `get_correspondence` to get the map of a graph and `get_vertex_above`
+    to look vertices up. Entries keep the position of the vertex and are checked
+    when they are read, so entries of removed vertices are ignored.
+    """
+
+    def __init__(self):
+        self.entries = {}
+
+    def add(self, graph: Graph, vertex, above=None):
+        """
+        Records that `above` (or no vertex, if it is `None`) is the vertex
+        of the layer above `vertex` with its position.
+        """
+        self.entries[vertex] = (graph.nodes[vertex]['position'], above)
+
+    def copy(self) -> 'Correspondence':
+        correspondence = Correspondence()
+        correspondence.entries = dict(self.entries)
+        return correspondence
+
+
+def get_correspondence(graph: Graph) -> Correspondence:
+    """
+    Returns the correspondence map of `graph`, it is kept in `graph.graph`.
+    """
+    correspondence = graph.graph.get('correspondence')
+    if correspondence is None:
+        correspondence = graph.graph['correspondence'] = Correspondence()
+    return correspondence
+
+
+class Midpoints:
+    """
+    Vertices which break edges: maps a pair of vertices (in any order)
+    to the vertex between them. It is filled by `add_break_in_segment` and by
+    productions which copy broken edges to a new layer.
+
+    Use `get_midpoints` to get the index of a graph. `get_midpoint_vertex`
+    checks entries when they are read, so entries of removed vertices and edges
+    are ignored.
+    """
+
+    def __init__(self):
+        self.entries = {}
+
+    def add(self, v1, v2, vertex):
+        """
+        Records that `vertex` breaks the edge between `v1` and `v2`.
+        """
+        self.entries[frozenset((v1, v2))] = vertex
+
+    def copy(self) -> 'Midpoints':
+        midpoints = Midpoints()
+        midpoints.entries = dict(self.entries)
+        return midpoints
+
+    def rename(self, graph: Graph, old, new):
+        """
+        Moves entries of `old` to `new`, called before `old` is removed when
+        it is joined with `new`. Only entries around `old` are visited.
+        """
+        self.rename_many(graph, {old: new})
+
+    def rename_many(self, graph: Graph, mapping):
+        """
+        Moves entries of vertices which are keys of `mapping` to the vertices they
+        are mapped to, called before the keys are removed (see `join_vertices`).
+        Only entries around the keys are visited.
+        """
+        entries = self.entries
+        edges = {}
+        for old in mapping:
+            old_neighbors = list(graph.neighbors(old))
+            for midpoint in old_neighbors:
+                edges.update(dict.fromkeys(frozenset((old, v)) for v in graph.neighbors(midpoint)))
+            edges.update(dict.fromkeys(frozenset(edge) for edge in itertools.combinations(old_neighbors, 2)))
+        moved = [(edge, entries.pop(edge)) for edge in edges if edge in entries]
+        for edge, vertex in moved:
+            entries[frozenset(mapping.get(v, v) for v in edge)] = mapping.get(vertex, vertex)
+
+
+def get_midpoints(graph: Graph) -> Midpoints:
+    """
+    Returns the edge midpoint index of `graph`, it is kept in `graph.graph`.
+    """
+    midpoints = graph.graph.get('midpoints')
+    if midpoints is None:
+        midpoints = graph.graph['midpoints'] = Midpoints()
+    return midpoints
+
+
+# state kept in `graph.graph` which is copied by `copy_graph_attributes`,
+# a copy of a graph shares neither its ids nor its indexes with the original
+_COPIED_GRAPH_KEYS = ('id_allocator', 'execution_mode', 'correspondence', 'midpoints', 'geometry')
+
+
+def copy_graph_attributes(attributes: dict) -> dict:
+    """
+    Returns a copy of graph attributes `attributes` (`graph.graph`) for a copy
+    of the graph: the id allocator, the execution mode, the correspondence map,
+    the midpoint index and cached geometries are copied, the derivation log is
+    left out, so the copy is not logged. Other attributes are shared.
+    """
+    copy = {key: value for key, value in attributes.items() if key != 'derivation_log'}
+    for key in _COPIED_GRAPH_KEYS:
+        if key in copy:
+            copy[key] = copy[key].copy()
+    return copy
+
+
+def copy_graph(graph: Graph) -> Graph:
+    """
+    Returns a copy of `graph` (`networkx.Graph` or `LayeredGraph`) which can be
+    changed by productions without changing `graph`. `Graph.copy` copies
+    `graph.graph` shallowly, see `copy_graph_attributes`.
+    """
+    copy = graph.copy()
+    copy.graph = copy_graph_attributes(graph.graph)
+    return copy
+
+
+def gen_name(graph: Graph = None):
+    """
+    Returns a name for a new node of `graph`.
+
+    Names are consecutive integers allocated per graph, so a derivation
+    always produces the same names.
+    Without `graph` a random UUID string is returned.
+    """
+    if graph is None:
+        return str(uuid.uuid1())
+    return get_id_allocator(graph).allocate(graph)
+
+
+def use_exact_positions(graph: Graph):
+    """
+    Switches `graph` to exact positions: positions of existing nodes and positions
+    given to P1 are converted with `exact_position`, so all positions created
+    by productions are exact as well (see `agh_graphs.exact`).
+    """
+    graph.graph['exact_positions'] = True
+    for n, position in list(graph.nodes(data='position')):
+        if position is not None:
+            graph.nodes[n]['position'] = exact_position(position)
+
+
+def as_position(graph: Graph, position):
+    """
+    Returns `position` converted to exact coordinates if `graph` uses exact
+    positions (see `use_exact_positions`), otherwise returns `position`.
+    """
+    if graph.graph.get('exact_positions'):
+        return exact_position(position)
+    return position
 
 
 def centroid(a, b, c):
@@ -44,7 +269,7 @@ def add_interior(graph: Graph, a_name, b_name, c_name):
     if layer != node_layers[b_name] or layer != node_layers[c_name]:
         raise RuntimeError('Nodes lay on different layers')
 
-    i_name = gen_name()
+    i_name = gen_name(graph)
     i_pos = centroid(a_pos, b_pos, c_pos)
 
     graph.add_node(i_name, layer=layer, position=i_pos, label='I')
@@ -55,6 +280,122 @@ def add_interior(graph: Graph, a_name, b_name, c_name):
     return i_name
 
 
+class TriangleGeometry(NamedTuple):
+    """
+    Geometry of the triangle of an interior, see `get_triangle_geometry`.
+    Edge `k` joins `corners[k]` and `corners[(k + 1) % 3]`.
+    """
+    # corners in the order of `get_neighbors_at` and their positions
+    corners: tuple
+    positions: tuple
+    # corners in counterclockwise order, by `angle_with_x_axis` from the centroid (see `P5.get_corner_nodes`)
+    ccw: tuple
+    squared_lengths: tuple
+    # index of the longest edge, the first one if there are more
+    longest: int
+    # indexes of edges sorted by `angle_with_x_axis` (see `sort_segments_by_angle`)
+    edge_ranks: tuple
+
+    def edge(self, v1, v2) -> int:
+        """
+        Returns the index of the edge between corners `v1` and `v2`.
+        """
+        k = self.corners.index(v1)
+        return k if self.corners[(k + 1) % 3] == v2 else (k + 2) % 3
+
+
+def triangle_geometry(corners, positions) -> TriangleGeometry:
+    """
+    Returns the geometry of the triangle with `corners` at `positions`.
+    """
+    corners = tuple(corners)
+    positions = tuple(positions)
+    ((a_x, a_y), (b_x, b_y), (c_x, c_y)) = positions
+    (m_x, m_y) = ((a_x + b_x + c_x) / 3, (a_y + b_y + c_y) / 3)
+    ccw = tuple(corners[k] for k in _angle_order(*[(x - m_x, y - m_y) for x, y in positions]))
+
+    edges = [(x2 - x1, y2 - y1) for (x1, y1), (x2, y2) in zip(positions, positions[1:] + positions[:1])]
+    squared_lengths = tuple(x * x + y * y for x, y in edges)
+    longest = max(range(3), key=squared_lengths.__getitem__)
+    return TriangleGeometry(corners, positions, ccw, squared_lengths, longest, _angle_order(*edges))
+
+
+def _angle_order(u, v, w) -> tuple:
+    """
+    Returns indexes which sort vectors `u`, `v`, `w` by their angle with the x axis
+    modulo 180 degrees (see `angle_with_x_axis`). Angles are compared by signs of
+    cross products, vectors with equal angles keep their order. Vectors should not be zero.
+
+    See `agh_graphs.geometry.angle_order` for arrays of vectors.
+    """
+    # directions in the upper half-plane, angles in [0, 180)
+    ((u_x, u_y), (v_x, v_y), (w_x, w_y)) = [(-x, -y) if y < 0 or (y == 0 and x < 0) else (x, y) for x, y in (u, v, w)]
+    uv = u_x * v_y - u_y * v_x >= 0
+    uw = u_x * w_y - u_y * w_x >= 0
+    vw = v_x * w_y - v_y * w_x >= 0
+    ranks = (2 - uv - uw, uv + 1 - vw, uw + vw)
+    return tuple(sorted(range(3), key=ranks.__getitem__))
+
+
+def get_triangle_geometry(graph: Graph, interior, corners=None) -> TriangleGeometry:
+    """
+    Returns the geometry of the triangle of `interior`, whose `corners` are
+    its neighbors on its layer (they are found if `corners` is `None`).
+
+    Geometries are cached in `graph.graph` and computed again when positions
+    of corners of the interior change.
+    """
+    if corners is None:
+        corners = get_neighbors_at(graph, interior, graph.nodes[interior]['layer'])
+    node_positions = graph.nodes(data='position')
+    positions = tuple(node_positions[v] for v in corners)
+
+    cache = graph.graph.get('geometry')
+    if cache is None:
+        cache = graph.graph['geometry'] = {}
+    geometry = cache.get(interior)
+    if geometry is None or geometry.positions != positions:
+        geometry = cache[interior] = triangle_geometry(corners, positions)
+    elif geometry.corners != tuple(corners):
+        # corners were joined with other vertices at the same positions
+        geometry = cache[interior] = _renamed_geometry(geometry, corners)
+    return geometry
+
+
+def set_triangle_geometry(graph: Graph, interior, corners, positions):
+    """
+    Caches the geometry of a new `interior` with `corners` (in the order in which
+    they were given to `add_interior`) at known `positions`.
+    """
+    cache = graph.graph.get('geometry')
+    if cache is None:
+        cache = graph.graph['geometry'] = {}
+    cache[interior] = triangle_geometry(corners, positions)
+
+
+def copy_triangle_geometry(graph: Graph, interior, copy, corners):
+    """
+    Caches the geometry of `copy`, an interior whose `corners` are copies
+    of corners of `interior` (in the same order, at the same positions),
+    if the geometry of `interior` is cached.
+    """
+    cache = graph.graph.get('geometry')
+    geometry = cache.get(interior) if cache is not None else None
+    if geometry is None:
+        return
+    node_positions = graph.nodes(data='position')
+    if geometry.positions == tuple(node_positions[v] for v in corners):
+        cache[copy] = _renamed_geometry(geometry, corners)
+
+
+def _renamed_geometry(geometry: TriangleGeometry, corners) -> TriangleGeometry:
+    """
+    Returns `geometry` of a triangle with the same positions of `corners`.
+    """
+    renamed = dict(zip(geometry.corners, corners))
+    return geometry._replace(corners=tuple(corners), ccw=tuple(renamed[v] for v in geometry.ccw))
+
+
 def add_break_in_segment(graph: Graph, segment: (str, str)) -> str:
     """
     Adds a node that breaks given segment.
@@ -70,20 +411,38 @@ def add_break_in_segment(graph: Graph, segment: (str, str)) -> str:
     v_y = (v1_pos[1] + v2_pos[1]) / 2
 
     v_pos = (v_x, v_y)
-    v = gen_name()
+    v = gen_name(graph)
 
     graph.add_node(v, layer=layer, position=v_pos, label='E')
 
     graph.remove_edge(v1, v2)
     graph.add_edge(v1, v)
     graph.add_edge(v2, v)
+    get_midpoints(graph).add(v1, v2, v)
 
     return v
 
 
-def get_node_at(graph, layer, pos):
-    nodes = [x for x, y in graph.nodes(data=True) if
-             y['position'] == pos and y['layer'] == layer]
+def get_node_at(graph, layer, pos, close=False):
+    """
+    Returns the node on `layer` at position `pos` or `None` if there is no such node.
+
+    If `close` is `True`, positions are compared using `is_close`
+    instead of being compared exactly. Exact positions (see `agh_graphs.exact`)
+    are always compared exactly.
+
+    Graphs which keep a spatial index (`LayeredGraph` and `CompactGraph`, see
+    `agh_graphs.node_index`) are not scanned, nodes of `networkx.Graph` are all scanned.
+    """
+    if close and is_exact(pos[0]):
+        close = False
+    nodes_at = getattr(graph, 'nodes_at', None)
+    if nodes_at is not None:
+        nodes = nodes_at(layer, pos, IS_CLOSE_REL_TOL if close else None)
+    else:
+        positions = graph.nodes(data='position')
+        matches = is_close if close else operator.eq
+        nodes = [x for x in get_vertices_from_layer(graph, layer) if matches(positions[x], pos)]
     if len(nodes) == 0:
         return None
     if len(nodes) > 1:
@@ -127,10 +486,57 @@ def get_neighbors_at(graph: Graph, vertex, layer):
     """
     Returns neighbors of the given `vertex` that lies on the layer `layer`.
     """
+    layer_neighbors = getattr(graph, 'layer_neighbors', None)
+    if layer_neighbors is not None:
+        return layer_neighbors(vertex, layer)
+
     neighbors = list(graph.neighbors(vertex))
     return [v for v in neighbors if graph.nodes[v]['layer'] == layer]
 
 
+def get_vertex_above(graph: Graph, vertex, interiors=None):
+    """
+    Returns the vertex of the layer above `vertex` with the same position,
+    or `None` if there is no such vertex.
+
+    Vertices copied by productions are found in the correspondence map of `graph`
+    (see `Correspondence`). Other vertices are searched around parents
+    of `interiors` (see `get_vertices_above`) if they are given, otherwise
+    with `get_node_at`.
+    """
+    positions = graph.nodes(data='position')
+    position = positions[vertex]
+    correspondence = graph.graph.get('correspondence')
+    if correspondence is not None:
+        entry = correspondence.entries.get(vertex)
+        if entry is not None and entry[0] == position:
+            above = entry[1]
+            if above is None or (above in graph and positions[above] == position):
+                return above
+
+    layer = graph.nodes[vertex]['layer']
+    if interiors is not None:
+        return get_vertices_above(graph, interiors, layer).get(position)
+    return get_node_at(graph, layer - 1, position)
+
+
+def get_vertices_above(graph: Graph, interiors, layer):
+    """
+    Returns vertices of `layer - 1` around parents of `interiors` from `layer`
+    (neighbors of the interiors on `layer - 1`), by position.
+
+    Only the neighborhood of `interiors` is visited, so it can be used instead
+    of `get_node_at` for vertices which correspond to vertices of the interiors.
+    """
+    positions = graph.nodes(data='position')
+    vertices = {}
+    for interior in interiors:
+        for parent in get_neighbors_at(graph, interior, layer - 1):
+            for v in get_neighbors_at(graph, parent, layer - 1):
+                vertices.setdefault(positions[v], v)
+    return vertices
+
+
 def get_vertex_pull(graph: Graph, vertex: str):
     """
     Return the average vector calculated from edges of the vertex.
@@ -186,52 +592,60 @@ def pull_vertices_apart(graph: Graph, vertex_a: str, vertex_b: str, factor: floa
     graph.nodes()[vertex_b]['position'] = (b_x + dir_x, b_y + dir_y)
 
 
-def find_overlapping_vertices(graph: Graph):
-    def compare(a, b):
-        a = a[1]
-        b = b[1]
-        if a['layer'] != b['layer']:
-            return b['layer'] - a['layer']
-
-        xpos = a['position']
-        ypos = b['position']
-        if xpos[0] != ypos[0]:
-            return ypos[0] - xpos[0]
-
-        return ypos[1] - xpos[1]
-
-    sorted_nodes = sorted(graph.nodes(data=True), key=functools.cmp_to_key(compare))
-
-    buckets = []
-
-    bucket = []
-    last_layer = -1
-    last_x = 0
-    for node_id, node_data in sorted_nodes:
-        layer = node_data['layer']
-        (x, y) = node_data['position']
-
-        if layer != last_layer or not math.isclose(last_x, x):
-            if len(bucket) >= 2:
-                buckets.append(bucket)
+def find_overlapping_vertices(graph: Graph, layer: int = None, nodes=None):
+    """
+    Returns pairs of vertices which lay on the same layer and whose
+    positions are close (see `is_close`). Every pair is returned once.
 
-            bucket = [(node_id, node_data)]
-        else:
-            bucket.append((node_id, node_data))
+    If `nodes` is not `None` only these vertices are checked, otherwise if `layer`
+    is not `None` only vertices from this layer are checked. By default all
+    vertices of the graph are checked.
 
-        last_layer = layer
-        last_x = x
+    Exact positions (see `agh_graphs.exact`) are grouped by their hash.
+    Otherwise vertices are hashed into a grid with cells larger than the tolerance
+    of `is_close`, so only vertices from neighboring cells are compared.
+    """
+    if nodes is None:
+        nodes = graph.nodes() if layer is None else get_vertices_from_layer(graph, layer)
+    node_layers = graph.nodes(data='layer')
+    node_positions = graph.nodes(data='position')
+    candidates = [(n, node_layers[n], node_positions[n]) for n in nodes]
+    if len(candidates) < 2:
+        return []
+
+    if all(is_exact(x) and is_exact(y) for _, _, (x, y) in candidates):
+        groups = {}
+        for n, n_layer, position in candidates:
+            groups.setdefault((n_layer, position), []).append(n)
+        return [(a, b) for group in groups.values() if len(group) > 1
+                for i, a in enumerate(group) for b in group[i + 1:]]
+
+    # close coordinates differ by at most IS_CLOSE_REL_TOL * |coordinate|,
+    # cell side is a power of two so that scaling coordinates is exact
+    max_coordinate = max(max(abs(x), abs(y)) for _, _, (x, y) in candidates)
+    cells_per_unit = 2.0 ** -math.ceil(math.log2(max(4 * IS_CLOSE_REL_TOL * max_coordinate, 2.0 ** -60)))
+
+    cells = {}
+    for n, n_layer, (x, y) in candidates:
+        key = (n_layer, math.floor(x * cells_per_unit), math.floor(y * cells_per_unit))
+        cells.setdefault(key, []).append((n, (x, y)))
 
     overlapping = []
-    for bucket in buckets:
-        for node_a_id, node_a_data in bucket:
-            for node_b_id, node_b_data in bucket:
-                if node_a_id == node_b_id:
-                    continue
-                pos_a = node_a_data['position']
-                pos_b = node_b_data['position']
-                if is_close(pos_a, pos_b):
-                    overlapping.append((node_a_id, node_b_id))
+    for (cell_layer, cell_x, cell_y), cell in cells.items():
+        for i, (a, a_pos) in enumerate(cell):
+            for b, b_pos in cell[i + 1:]:
+                if is_close(a_pos, b_pos):
+                    overlapping.append((a, b))
+
+        # every pair of neighboring cells is checked once, from the smaller one
+        for other_key in [(cell_layer, cell_x, cell_y + 1),
+                          (cell_layer, cell_x + 1, cell_y - 1),
+                          (cell_layer, cell_x + 1, cell_y),
+                          (cell_layer, cell_x + 1, cell_y + 1)]:
+            for b, b_pos in cells.get(other_key, ()):
+                for a, a_pos in cell:
+                    if is_close(a_pos, b_pos):
+                        overlapping.append((a, b))
     return overlapping
 
 
@@ -245,36 +659,75 @@ def join_overlapping_vertices(graph: Graph, vertex1, vertex2, layer):
     Returns vertex1 if joined.
     Returns None if vertices are not overlapping.
     """
-
-    v1_pos = graph.nodes()[vertex1]['position']
-    v2_pos = graph.nodes()[vertex2]['position']
-
-    if is_close(v1_pos, v2_pos):
-        vertex1_neighbors = get_neighbors_at(graph, vertex1, layer)
-        vertex2_neighbors = get_neighbors_at(graph, vertex2, layer)
-
-        for vertex2_neighbor in vertex2_neighbors:
-            if vertex2_neighbor not in vertex1_neighbors:
-                graph.add_edge(vertex1, vertex2_neighbor)
-        graph.remove_node(vertex2)
+    if join_vertices(graph, [(vertex1, vertex2)], layer):
         return vertex1
-
     return None
 
 
+def join_vertices(graph: Graph, pairs, layer) -> dict:
+    """
+    Joins pairs `(vertex1, vertex2)` of overlapping vertices of `layer` at once,
+    like `join_overlapping_vertices` does for one pair. Pairs may be chained,
+    e.g. `[(a, b), (b, c)]` joins both `b` and `c` to `a`: pairs are grouped with
+    a union-find, edges of all removed vertices are moved to the kept ones in one
+    pass and removed vertices are removed with one `remove_nodes_from` call.
+    Pairs of vertices which are not overlapping are skipped.
+
+    Returns a dictionary which maps removed vertices to the vertices they were joined to.
+    """
+    node_positions = graph.nodes(data='position')
+    parents = {}
+
+    def find(v):
+        root = v
+        while parents[root] != root:
+            root = parents[root]
+        while parents[v] != root:
+            (parents[v], v) = (root, parents[v])
+        return root
+
+    for vertex1, vertex2 in pairs:
+        if is_close(node_positions[vertex1], node_positions[vertex2]):
+            parents.setdefault(vertex1, vertex1)
+            parents.setdefault(vertex2, vertex2)
+            (root1, root2) = (find(vertex1), find(vertex2))
+            if root1 != root2:
+                parents[root2] = root1
+
+    joined = {v: find(v) for v in parents if find(v) != v}
+    edges = []
+    for v, kept in joined.items():
+        for neighbor in get_neighbors_at(graph, v, layer):
+            neighbor = joined.get(neighbor, neighbor)
+            if neighbor != kept:
+                edges.append((kept, neighbor))
+    midpoints = graph.graph.get('midpoints')
+    if midpoints is not None:
+        midpoints.rename_many(graph, joined)
+    graph.remove_nodes_from(joined)
+    graph.add_edges_from(edges)
+    return joined
+
+
 def get_common_neighbors(graph: Graph, v1: str, v2: str, on_layer: int = None) -> [str]:
     """
     Returns common neighbors of vertexes `v1` and `v2` that are on layer `on_layer`
 
     If `on_layer` is `None` (default) all common neighbors are returned.
+    Neighbors are returned in the order of neighbors of `v1`, so the result
+    does not depend on the backend.
     """
-    neighbors1 = set(graph.neighbors(v1))
+    layer_neighbors = getattr(graph, 'layer_neighbors', None)
+    if on_layer and layer_neighbors is not None:
+        neighbors2 = set(layer_neighbors(v2, on_layer))
+        return [v for v in layer_neighbors(v1, on_layer) if v in neighbors2]
+
     neighbors2 = set(graph.neighbors(v2))
-    common = neighbors1 & neighbors2
+    common = [v for v in graph.neighbors(v1) if v in neighbors2]
     if on_layer:
         return [v for v in common if graph.nodes[v]['layer'] == on_layer]
     else:
-        return list(common)
+        return common
 
 
 def get_vertex_between(graph, v1, v2, layer=None, label=None):
@@ -288,27 +741,61 @@ def get_vertex_between(graph, v1, v2, layer=None, label=None):
     (v1_x, v1_y) = graph.nodes[v1]['position']
     (v2_x, v2_y) = graph.nodes[v2]['position']
     desired_position = ((v1_x + v2_x) / 2, (v1_y + v2_y) / 2)
-    neighbors = [n for n in graph.neighbors(v1)
-                 if n in graph.neighbors(v2)
-                 and (layer is None or graph.nodes[n]['layer'] == layer)
-                 and (label is None or graph.nodes[n]['label'] == label)
-                 and is_close(graph.nodes[n]['position'], desired_position)]
+
+    def matches(n):
+        return (layer is None or graph.nodes[n]['layer'] == layer) \
+            and (label is None or graph.nodes[n]['label'] == label) \
+            and is_close(graph.nodes[n]['position'], desired_position)
+
+    recorded = get_midpoint_vertex(graph, v1, v2)
+    if recorded is not None and matches(recorded):
+        return recorded
+
+    v2_neighbors = set(graph.neighbors(v2))
+    neighbors = [n for n in graph.neighbors(v1) if n in v2_neighbors and matches(n)]
     if len(neighbors) != 1:
         return None
     return neighbors[0]
 
 
+def get_midpoint_vertex(graph, v1, v2):
+    """
+    Returns the vertex recorded as the one between `v1` and `v2` (see `Midpoints`)
+    if it is still a neighbor of both of them, otherwise returns `None`.
+    """
+    midpoints = graph.graph.get('midpoints')
+    if midpoints is None:
+        return None
+    v = midpoints.entries.get(frozenset((v1, v2)))
+    if v is None or v not in graph or not graph.has_edge(v, v1) or not graph.has_edge(v, v2):
+        return None
+    return v
+
+
 def is_close(pos1, pos2):
+    """
+    Returns `True` if positions are equal up to `IS_CLOSE_REL_TOL`.
+    Exact positions (see `agh_graphs.exact`) are compared exactly.
+    """
     x1, y1 = pos1
     x2, y2 = pos2
-    return math.isclose(x1, x2) and math.isclose(y1, y2)
+    if is_exact(x1) and is_exact(x2):
+        return pos1 == pos2
+    return math.isclose(x1, x2, rel_tol=IS_CLOSE_REL_TOL) and math.isclose(y1, y2, rel_tol=IS_CLOSE_REL_TOL)
 
 
 def get_vertices_from_layer(graph: Graph, layer: int, label: str=None):
     """
     Returns list of all vertices from given layer with given label.
     If label is None returns all vertices from given layer.
+
+    Graphs which keep a layer index (`LayeredGraph` and `CompactGraph`, see
+    `agh_graphs.node_index`) are not scanned, nodes of `networkx.Graph` are all scanned.
     """
+    layer_nodes = getattr(graph, 'layer_nodes', None)
+    if layer_nodes is not None:
+        return layer_nodes(layer, label)
+
     layer_E_nodes = []
     for node in graph.nodes():
         if graph.nodes()[node]['layer'] == layer:
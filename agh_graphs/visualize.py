@@ -6,20 +6,16 @@ import networkx
 import numpy as np
 from networkx import Graph
 
-from agh_graphs.utils import find_overlapping_vertices, pull_vertices_apart, pull_vertex_towards_neighbors
+from agh_graphs.exact import float_position
+from agh_graphs.layered_graph import LayeredGraph
+from agh_graphs.utils import find_overlapping_vertices, pull_vertices_apart, pull_vertex_towards_neighbors, \
+    get_vertices_from_layer
 
 
 def visualize_graph_layer(graph: Graph, layer: int):
-    graph = graph.copy()
+    graph = __copy_for_drawing(graph, get_vertices_from_layer(graph, layer))
 
-    __pull__overlapping_vertices_apart(graph, 0.05)
-
-    to_remove = []
-    for node, data in graph.nodes(data=True):
-        if data['layer'] != layer:
-            to_remove.append(node)
-
-    graph.remove_nodes_from(to_remove)
+    __pull__overlapping_vertices_apart(graph, 0.1)
 
     colors = [__get_color(d) for n, d in graph.nodes(data=True)]
     networkx.draw(
@@ -31,9 +27,9 @@ def visualize_graph_layer(graph: Graph, layer: int):
 
 
 def visualize_graph_3d(graph: Graph):
-    graph = graph.copy()
+    graph = __copy_for_drawing(graph)
 
-    __pull__overlapping_vertices_apart(graph, 0.05)
+    __pull__overlapping_vertices_apart(graph, 0.1)
     colors = [__get_color(d) for n, d in graph.nodes(data=True)]
     networkx.draw(
         graph,
@@ -43,6 +39,22 @@ def visualize_graph_3d(graph: Graph):
         with_labels=True)
 
 
+def __copy_for_drawing(graph, nodes=None):
+    """
+    Returns a `networkx.Graph` copy of `graph`, or of the subgraph
+    induced by `nodes` if they are given. Positions of the copy are floats.
+    """
+    if isinstance(graph, LayeredGraph):
+        graph = graph.to_networkx(nodes)
+    elif nodes is not None:
+        graph = graph.subgraph(nodes).copy()
+    else:
+        graph = graph.copy()
+    for n, position in graph.nodes(data='position'):
+        graph.nodes[n]['position'] = float_position(position)
+    return graph
+
+
 def __get_color(node_data):
     if node_data['label'] in {'e', 'E'}:
         return '#5081bd'
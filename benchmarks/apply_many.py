@@ -0,0 +1,64 @@
+"""
+Compares `Production.apply` called in a loop with `Production.apply_many`
+on interiors of the last layer of `derive_e()`.
+
+Run with:
+
+    python -m benchmarks.apply_many
+"""
+import gc
+import timeit
+
+from networkx import Graph
+
+from agh_graphs.derivations.derivation_e import derive_e
+from agh_graphs.layered_graph import LayeredGraph
+from agh_graphs.productions.p2 import P2
+from agh_graphs.productions.p9 import P9
+
+BACKENDS = [
+    ('networkx.Graph', Graph),
+    ('LayeredGraph', LayeredGraph),
+]
+
+PRODUCTIONS = [P9, P2]
+
+
+def apply_in_loop(production, graph, inputs):
+    return [production().apply(graph, prod_input) for prod_input in inputs]
+
+
+def apply_many(production, graph, inputs):
+    return production().apply_many(graph, inputs)
+
+
+def measure_time(function, production, graph_factory, repeat=50):
+    """
+    Returns the best time (in seconds) of applying `production` on every
+    interior of the last layer of a graph built by `derive_e()`.
+    """
+    times = []
+    for _ in range(repeat):
+        graph = derive_e(graph_factory())
+        last_layer = max(layer for _, layer in graph.nodes(data='layer'))
+        inputs = [[n] for n, data in graph.nodes(data=True) if data['layer'] == last_layer and data['label'] == 'I']
+        gc.disable()
+        start = timeit.default_timer()
+        function(production, graph, inputs)
+        times.append(timeit.default_timer() - start)
+        gc.enable()
+    return min(times)
+
+
+def main():
+    print('{:<16} {:<6} {:>12} {:>16}'.format('backend', 'prod', 'apply [ms]', 'apply_many [ms]'))
+    for name, graph_factory in BACKENDS:
+        for production in PRODUCTIONS:
+            loop_time = measure_time(apply_in_loop, production, graph_factory)
+            many_time = measure_time(apply_many, production, graph_factory)
+            print('{:<16} {:<6} {:>12.3f} {:>16.3f}'.format(
+                name, production.__name__, loop_time * 1000, many_time * 1000))
+
+
+if __name__ == '__main__':
+    main()
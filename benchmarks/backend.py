@@ -0,0 +1,56 @@
+"""
+Compares the `networkx.Graph` backend with `CompactGraph` (slotted node
+records) and `LayeredGraph` on `derive_e()`.
+
+Run with:
+
+    python -m benchmarks.backend
+"""
+import gc
+import timeit
+import tracemalloc
+
+from networkx import Graph
+
+from agh_graphs.derivations.derivation_e import derive_e
+from agh_graphs.layered_graph import LayeredGraph
+from agh_graphs.node_record import CompactGraph
+
+BACKENDS = [
+    ('networkx.Graph', Graph),
+    ('CompactGraph', CompactGraph),
+    ('LayeredGraph', LayeredGraph),
+]
+
+
+def measure_time(graph_factory, repeat=5, number=10):
+    """
+    Returns the best time (in seconds) of a single `derive_e()` run.
+    """
+    timer = timeit.Timer(lambda: derive_e(graph_factory()))
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def measure_memory(graph_factory):
+    """
+    Returns the number of bytes allocated by the graph built by `derive_e()`.
+    """
+    gc.collect()
+    tracemalloc.start()
+    graph = derive_e(graph_factory())
+    gc.collect()
+    (size, _) = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, len(graph)
+
+
+def main():
+    print('{:<16} {:>12} {:>14} {:>14}'.format('backend', 'time [ms]', 'memory [kB]', 'bytes/node'))
+    for name, graph_factory in BACKENDS:
+        time = measure_time(graph_factory)
+        (memory, nodes) = measure_memory(graph_factory)
+        print('{:<16} {:>12.3f} {:>14.1f} {:>14.1f}'.format(name, time * 1000, memory / 1024, memory / nodes))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+Compares `stitch` with `conformize` on the layer below the last layer of
+`derive_e()`, after every interior of the last layer is refined with P9.
+
+Run with:
+
+    python -m benchmarks.conformize
+"""
+import gc
+import timeit
+
+from networkx import Graph
+
+from agh_graphs.derivations.derivation_e import derive_e
+from agh_graphs.layered_graph import LayeredGraph
+from agh_graphs.matching import conformize, stitch
+from agh_graphs.productions.p9 import P9
+from agh_graphs.utils import get_vertices_from_layer
+
+BACKENDS = [
+    ('networkx.Graph', Graph),
+    ('LayeredGraph', LayeredGraph),
+]
+
+
+def stitch_layer(graph, layer):
+    return stitch(graph, [layer])
+
+
+def refined_graph(graph_factory):
+    """
+    Returns a graph built by `derive_e()` with every interior of the last layer
+    refined with P9, and the number of the last layer.
+    """
+    graph = derive_e(graph_factory())
+    last_layer = max(layer for _, layer in graph.nodes(data='layer'))
+    for interior in get_vertices_from_layer(graph, last_layer, 'I'):
+        P9().apply(graph, [interior])
+    return graph, last_layer
+
+
+def measure_time(function, graph_factory, repeat=20):
+    """
+    Returns the best time (in seconds) of `function(graph, layer)`.
+    """
+    times = []
+    for _ in range(repeat):
+        (graph, layer) = refined_graph(graph_factory)
+        gc.disable()
+        start = timeit.default_timer()
+        function(graph, layer)
+        times.append(timeit.default_timer() - start)
+        gc.enable()
+    return min(times)
+
+
+def main():
+    print('{:<16} {:>12} {:>16}'.format('backend', 'stitch [ms]', 'conformize [ms]'))
+    for name, graph_factory in BACKENDS:
+        stitch_time = measure_time(stitch_layer, graph_factory)
+        conformize_time = measure_time(conformize, graph_factory)
+        print('{:<16} {:>12.3f} {:>16.3f}'.format(name, stitch_time * 1000, conformize_time * 1000))
+
+
+if __name__ == '__main__':
+    main()
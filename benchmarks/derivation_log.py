@@ -0,0 +1,54 @@
+"""
+Compares running `derive_e()` with replaying its derivation log.
+
+Run with:
+
+    python -m benchmarks.derivation_log
+"""
+import gc
+import timeit
+
+from networkx import Graph
+
+from agh_graphs.derivation_log import replay, start_log, stop_log
+from agh_graphs.derivations.derivation_e import derive_e
+from agh_graphs.layered_graph import LayeredGraph
+
+BACKENDS = [
+    ('networkx.Graph', Graph),
+    ('LayeredGraph', LayeredGraph),
+]
+
+
+def record(graph_factory) -> bytes:
+    graph = graph_factory()
+    start_log(graph)
+    derive_e(graph)
+    return stop_log(graph).to_bytes()
+
+
+def measure_time(function, repeat=50):
+    """
+    Returns the best time (in seconds) of `function()`.
+    """
+    times = []
+    for _ in range(repeat):
+        gc.disable()
+        start = timeit.default_timer()
+        function()
+        times.append(timeit.default_timer() - start)
+        gc.enable()
+    return min(times)
+
+
+def main():
+    print('{:<16} {:>12} {:>12} {:>12}'.format('backend', 'log [bytes]', 'derive [ms]', 'replay [ms]'))
+    for name, graph_factory in BACKENDS:
+        data = record(graph_factory)
+        derive_time = measure_time(lambda: derive_e(graph_factory()))
+        replay_time = measure_time(lambda: replay(data, graph_factory()))
+        print('{:<16} {:>12} {:>12.3f} {:>12.3f}'.format(name, len(data), derive_time * 1000, replay_time * 1000))
+
+
+if __name__ == '__main__':
+    main()
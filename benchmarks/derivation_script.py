@@ -0,0 +1,53 @@
+"""
+Compares `derive_e()` with running its compiled derivation script
+(`agh_graphs/derivations/derivation_e.json`), and measures compilation.
+
+Run with:
+
+    python -m benchmarks.derivation_script
+"""
+import gc
+import os
+import timeit
+
+from networkx import Graph
+
+from agh_graphs.derivation_script import compile_script, load_script
+from agh_graphs.derivations.derivation_e import derive_e
+from agh_graphs.layered_graph import LayeredGraph
+
+DERIVATION_E = os.path.join(os.path.dirname(__file__), '..', 'agh_graphs', 'derivations', 'derivation_e.json')
+
+BACKENDS = [
+    ('networkx.Graph', Graph),
+    ('LayeredGraph', LayeredGraph),
+]
+
+
+def measure_time(function, repeat=50):
+    """
+    Returns the best time (in seconds) of `function()`.
+    """
+    times = []
+    for _ in range(repeat):
+        gc.disable()
+        start = timeit.default_timer()
+        function()
+        times.append(timeit.default_timer() - start)
+        gc.enable()
+    return min(times)
+
+
+def main():
+    script = load_script(DERIVATION_E)
+    plan = compile_script(script)
+    print('compile: {:.3f} ms'.format(measure_time(lambda: compile_script(script)) * 1000))
+    print('{:<16} {:>12} {:>12}'.format('backend', 'derive [ms]', 'plan [ms]'))
+    for name, graph_factory in BACKENDS:
+        derive_time = measure_time(lambda: derive_e(graph_factory()))
+        plan_time = measure_time(lambda: plan.run(graph_factory()))
+        print('{:<16} {:>12.3f} {:>12.3f}'.format(name, derive_time * 1000, plan_time * 1000))
+
+
+if __name__ == '__main__':
+    main()
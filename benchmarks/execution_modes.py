@@ -0,0 +1,43 @@
+"""
+Compares execution modes of productions on `derive_e()`.
+
+Run with:
+
+    python -m benchmarks.execution_modes
+"""
+import timeit
+
+from networkx import Graph
+
+from agh_graphs.derivations.derivation_e import derive_e
+from agh_graphs.execution import set_execution_mode, get_execution_mode, STRICT, SAMPLED, TRUSTED
+
+MODES = [
+    (STRICT, {}),
+    (SAMPLED, {'sample_rate': 0.1, 'seed': 0}),
+    (TRUSTED, {}),
+]
+
+
+def derive(mode, kwargs):
+    graph = Graph()
+    set_execution_mode(graph, mode, **kwargs)
+    return derive_e(graph)
+
+
+def measure_time(mode, kwargs, repeat=5, number=10):
+    """
+    Returns the best time (in seconds) of a single `derive_e()` run.
+    """
+    timer = timeit.Timer(lambda: derive(mode, kwargs))
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def main():
+    for mode, kwargs in MODES:
+        time = measure_time(mode, kwargs)
+        print('{:<8} {:>8.3f} ms   {}'.format(mode, time * 1000, get_execution_mode(derive(mode, kwargs)).summary()))
+
+
+if __name__ == '__main__':
+    main()
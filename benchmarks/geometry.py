@@ -0,0 +1,68 @@
+"""
+Measures geometry of triangles of all interiors of every layer of `derive_e()`:
+computed per interior (`triangle_geometry`) and for whole layers at once
+(`agh_graphs.geometry.cache_layer_geometry`).
+
+The second table compares `triangle_geometry` with `triangle_orders` on
+growing arrays of random triangles, without reading the graph.
+
+Run with:
+
+    python -m benchmarks.geometry
+"""
+import gc
+import random
+import timeit
+
+from networkx import Graph
+
+from agh_graphs.derivations.derivation_e import derive_e
+from agh_graphs.geometry import as_points, cache_layer_geometry, layer_triangles, triangle_orders
+from agh_graphs.layered_graph import LayeredGraph
+from agh_graphs.utils import triangle_geometry
+
+BACKENDS = [
+    ('networkx.Graph', Graph),
+    ('LayeredGraph', LayeredGraph),
+]
+
+
+def measure_time(function, repeat=50):
+    """
+    Returns the best time (in seconds) of `function()`.
+    """
+    gc.disable()
+    try:
+        return min(timeit.repeat(function, repeat=repeat, number=1))
+    finally:
+        gc.enable()
+
+
+def main():
+    print('{:<16} {:>10} {:>16} {:>12}'.format('backend', 'interiors', 'per triangle [us]', 'layer [us]'))
+    for name, graph_factory in BACKENDS:
+        graph = derive_e(graph_factory())
+        positions = graph.nodes(data='position')
+        layers = sorted(set(layer for _, layer in graph.nodes(data='layer')))
+        interiors = [(i, corners) for layer in layers for i, corners in zip(*layer_triangles(graph, layer)[:2])]
+
+        per_triangle_time = measure_time(lambda: [triangle_geometry(corners, [positions[v] for v in corners])
+                                                  for i, corners in interiors])
+        layer_time = measure_time(lambda: [cache_layer_geometry(graph, layer) for layer in layers])
+        print('{:<16} {:>10} {:>16.1f} {:>12.1f}'.format(name, len(interiors), per_triangle_time * 1e6,
+                                                          layer_time * 1e6))
+
+    print()
+    print('{:>10} {:>16} {:>12}'.format('triangles', 'per triangle [us]', 'arrays [us]'))
+    random.seed(0)
+    for count in [10, 100, 1000, 10000]:
+        triangles = [[(random.random(), random.random()) for _ in range(3)] for _ in range(count)]
+        points = as_points(triangles)
+        per_triangle_time = measure_time(lambda: [triangle_geometry(range(3), triangle) for triangle in triangles],
+                                         repeat=10)
+        arrays_time = measure_time(lambda: triangle_orders(points), repeat=10)
+        print('{:>10} {:>16.1f} {:>12.1f}'.format(count, per_triangle_time * 1e6, arrays_time * 1e6))
+
+
+if __name__ == '__main__':
+    main()
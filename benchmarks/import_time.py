@@ -0,0 +1,48 @@
+"""
+Measures cold import time of the rewriting engine (productions, utilities and
+graph backends) and of modules which need `matplotlib`, each in a new interpreter.
+
+Run with:
+
+    python -m benchmarks.import_time
+"""
+import subprocess
+import sys
+
+MODULES = [
+    ('engine', 'import agh_graphs.production, agh_graphs.layered_graph, agh_graphs.productions as p\n'
+               'for name in p.names(): p.get(name)'),
+    ('derivation_e', 'import agh_graphs.derivations.derivation_e'),
+    ('visualize', 'import agh_graphs.visualize, matplotlib.pyplot'),
+]
+
+MEASURE = '''
+import sys, time
+start = time.perf_counter()
+exec({!r})
+print(time.perf_counter() - start, 'matplotlib' in sys.modules)
+'''
+
+
+def measure_import(code: str, repeat: int = 5):
+    """
+    Returns the best time (in seconds) of running `code` in a new interpreter
+    and whether it imported `matplotlib`.
+    """
+    results = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', MEASURE.format(code)], check=True,
+                                capture_output=True, text=True).stdout.split()
+        results.append((float(output[0]), output[1] == 'True'))
+    return min(results)
+
+
+def main():
+    print('{:<16} {:>12} {:>12}'.format('modules', 'import [ms]', 'matplotlib'))
+    for name, code in MODULES:
+        (seconds, matplotlib) = measure_import(code)
+        print('{:<16} {:>12.1f} {:>12}'.format(name, seconds * 1000, 'yes' if matplotlib else 'no'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+Compares joining overlapping vertices pair by pair (`join_overlapping_vertices`)
+with joining all of them at once (`join_vertices`) on the layer of P9 children
+from `benchmarks.conformize`: every E vertex is joined with the first vertex at
+its position.
+
+Run with:
+
+    python -m benchmarks.join_vertices
+"""
+import gc
+import timeit
+
+from networkx import Graph
+
+from agh_graphs.layered_graph import LayeredGraph
+from agh_graphs.utils import get_vertices_from_layer, join_overlapping_vertices, join_vertices
+from benchmarks.conformize import refined_graph
+
+BACKENDS = [
+    ('networkx.Graph', Graph),
+    ('LayeredGraph', LayeredGraph),
+]
+
+
+def overlapping_pairs(graph, layer):
+    """
+    Returns pairs of the first vertex at a position and every other E vertex
+    of `layer` at the same position.
+    """
+    first = {}
+    pairs = []
+    for v in get_vertices_from_layer(graph, layer, 'E'):
+        position = graph.nodes[v]['position']
+        if position in first:
+            pairs.append((first[position], v))
+        else:
+            first[position] = v
+    return pairs
+
+
+def join_pairs(graph, pairs, layer):
+    for v1, v2 in pairs:
+        join_overlapping_vertices(graph, v1, v2, layer)
+
+
+def measure_time(function, graph_factory, repeat=20):
+    """
+    Returns the best time (in seconds) of `function(graph, pairs, layer)` and the number of pairs.
+    """
+    times = []
+    for _ in range(repeat):
+        (graph, layer) = refined_graph(graph_factory)
+        pairs = overlapping_pairs(graph, layer + 1)
+        gc.disable()
+        start = timeit.default_timer()
+        function(graph, pairs, layer + 1)
+        times.append(timeit.default_timer() - start)
+        gc.enable()
+    return min(times), len(pairs)
+
+
+def main():
+    print('{:<16} {:>8} {:>14} {:>14}'.format('backend', 'pairs', 'pairwise [us]', 'batch [us]'))
+    for name, graph_factory in BACKENDS:
+        (pairwise_time, pairs) = measure_time(join_pairs, graph_factory)
+        (batch_time, _) = measure_time(join_vertices, graph_factory)
+        print('{:<16} {:>8} {:>14.1f} {:>14.1f}'.format(name, pairs, pairwise_time * 1e6, batch_time * 1e6))
+
+
+if __name__ == '__main__':
+    main()
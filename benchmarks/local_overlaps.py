@@ -0,0 +1,95 @@
+"""
+Measures matching of P8 and P10 on growing graphs.
+
+Graphs are made of copies of the graphs from tests of the productions, placed
+side by side on the same layers. The production is matched (with validation)
+on the interiors of one copy, the time should not depend on the number of copies.
+The last column shows `find_overlapping_vertices` on the whole layer, which
+the productions used to call.
+
+The second table compares `get_vertex_above` (the correspondence map kept by
+productions) with `get_node_at` for all E vertices of the last layer of `derive_e()`.
+
+Run with:
+
+    python -m benchmarks.local_overlaps
+"""
+import gc
+import timeit
+
+from networkx import Graph
+
+from agh_graphs.derivations.derivation_e import derive_e
+from agh_graphs.layered_graph import LayeredGraph
+from agh_graphs.productions.p8 import P8
+from agh_graphs.productions.p10 import P10
+from agh_graphs.utils import find_overlapping_vertices, get_node_at, get_vertex_above, get_vertices_from_layer
+from tests.productions import test_p8, test_p10
+
+BACKENDS = [
+    ('networkx.Graph', Graph),
+    ('LayeredGraph', LayeredGraph),
+]
+
+PRODUCTIONS = [
+    ('P8', P8, test_p8.createCorrectGraph),
+    ('P10', P10, test_p10.createCorrectGraph),
+]
+
+
+def tiled_graph(graph_factory, create_graph, copies):
+    """
+    Returns a graph with `copies` copies of `create_graph()` shifted along
+    the x axis, and the interiors of the first copy.
+    """
+    graph = graph_factory()
+    prod_input = None
+    for copy in range(copies):
+        part = create_graph()
+        width = max(x for _, (x, _) in part.nodes(data='position')) + 1
+        graph.add_nodes_from((n, dict(attributes, position=(attributes['position'][0] + copy * width,
+                                                             attributes['position'][1])))
+                             for n, attributes in part.nodes(data=True))
+        graph.add_edges_from(part.edges())
+        if prod_input is None:
+            prod_input = [n for n, label in part.nodes(data='label') if label == 'I']
+    return graph, prod_input
+
+
+def measure_time(function, repeat=200):
+    """
+    Returns the best time (in seconds) of `function()`.
+    """
+    gc.disable()
+    try:
+        return min(timeit.repeat(function, repeat=repeat, number=1))
+    finally:
+        gc.enable()
+
+
+def main():
+    print('{:<6} {:<16} {:>8} {:>12} {:>12}'.format('', 'backend', 'copies', 'match [us]', 'layer [us]'))
+    for name, production, create_graph in PRODUCTIONS:
+        for backend, graph_factory in BACKENDS:
+            for copies in [1, 10, 100, 1000]:
+                (graph, prod_input) = tiled_graph(graph_factory, create_graph, copies)
+                layer = graph.nodes[prod_input[0]]['layer']
+                match_time = measure_time(lambda: production().match(graph, prod_input))
+                layer_time = measure_time(lambda: find_overlapping_vertices(graph, layer), repeat=5)
+                print('{:<6} {:<16} {:>8} {:>12.1f} {:>12.1f}'.format(
+                    name, backend, copies, match_time * 1e6, layer_time * 1e6))
+
+    print()
+    print('{:<16} {:>16} {:>18}'.format('backend', 'map [us]', 'get_node_at [us]'))
+    for backend, graph_factory in BACKENDS:
+        graph = derive_e(graph_factory())
+        positions = graph.nodes(data='position')
+        last_layer = max(layer for _, layer in graph.nodes(data='layer'))
+        vertices = get_vertices_from_layer(graph, last_layer, 'E')
+        map_time = measure_time(lambda: [get_vertex_above(graph, v) for v in vertices], repeat=20)
+        scan_time = measure_time(lambda: [get_node_at(graph, last_layer - 1, positions[v]) for v in vertices], repeat=20)
+        print('{:<16} {:>16.1f} {:>18.1f}'.format(backend, map_time * 1e6, scan_time * 1e6))
+
+
+if __name__ == '__main__':
+    main()
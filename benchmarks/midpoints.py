@@ -0,0 +1,52 @@
+"""
+Measures `get_vertex_between` with and without the edge midpoint index
+(see `agh_graphs.utils.Midpoints`) on every broken edge of `derive_e()`.
+
+Run with:
+
+    python -m benchmarks.midpoints
+"""
+import gc
+import timeit
+
+from networkx import Graph
+
+from agh_graphs.derivations.derivation_e import derive_e
+from agh_graphs.layered_graph import LayeredGraph
+from agh_graphs.utils import get_vertex_between
+
+BACKENDS = [
+    ('networkx.Graph', Graph),
+    ('LayeredGraph', LayeredGraph),
+]
+
+
+def measure_time(function, repeat=50):
+    """
+    Returns the best time (in seconds) of `function()`.
+    """
+    gc.disable()
+    try:
+        return min(timeit.repeat(function, repeat=repeat, number=1))
+    finally:
+        gc.enable()
+
+
+def main():
+    print('{:<16} {:>8} {:>12} {:>14}'.format('backend', 'edges', 'index [us]', 'no index [us]'))
+    for name, graph_factory in BACKENDS:
+        graph = derive_e(graph_factory())
+        edges = [tuple(edge) for edge in graph.graph['midpoints'].entries]
+
+        def find_all():
+            return [get_vertex_between(graph, v1, v2, label='E') for v1, v2 in edges]
+
+        index_time = measure_time(find_all)
+        midpoints = graph.graph.pop('midpoints')
+        scan_time = measure_time(find_all)
+        graph.graph['midpoints'] = midpoints
+        print('{:<16} {:>8} {:>12.1f} {:>14.1f}'.format(name, len(edges), index_time * 1e6, scan_time * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+"""
+Measures `find_overlapping_vertices` on growing graphs.
+
+Every vertex of the generated graphs overlaps with exactly one other vertex,
+the time per vertex should stay roughly constant.
+
+Run with:
+
+    python -m benchmarks.overlapping
+"""
+import random
+import timeit
+
+from networkx import Graph
+
+from agh_graphs.utils import find_overlapping_vertices
+
+
+def overlapping_graph(size, layers=4, seed=0):
+    """
+    Returns a graph with `size` vertices, which form `size / 2` overlapping pairs.
+    """
+    rng = random.Random(seed)
+    graph = Graph()
+    for n in range(0, size, 2):
+        layer = rng.randrange(layers)
+        position = (rng.random(), rng.random())
+        graph.add_node(n, layer=layer, position=position, label='E')
+        graph.add_node(n + 1, layer=layer, position=position, label='E')
+    return graph
+
+
+def main():
+    print('{:>10} {:>12} {:>16} {:>14}'.format('vertices', 'time [ms]', 'time/vertex [us]', 'layer 0 [ms]'))
+    for size in [1000, 10000, 100000]:
+        graph = overlapping_graph(size)
+        time = min(timeit.repeat(lambda: find_overlapping_vertices(graph), repeat=3, number=1))
+        layer_time = min(timeit.repeat(lambda: find_overlapping_vertices(graph, 0), repeat=3, number=1))
+        print('{:>10} {:>12.2f} {:>16.2f} {:>14.2f}'.format(size, time * 1000, time / size * 1e6, layer_time * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""
+Looks for the crossover point of `apply_parallel`: refines with P9 every
+interior of a graph built by `derive_e()` and refined 2 to 6 more times with
+P2, so from 120 to 1920 inputs.
+
+`apply_parallel` is split into the work done in the calling process (matching,
+building shards and merging their changes), the work done in the workers
+(`_rewrite_shard`) and starting the process pool. With `k` cores it takes at
+least `start + parent + workers / k`, so it can be faster than `apply_many` only
+if `start + parent` is, and then from `workers / (apply_many - start - parent)`
+cores. The last column is this number of cores, or `-` if there is none.
+
+Times of `apply_parallel` are measured with `min_inputs_per_process=1`, so the
+pool is used for every size.
+
+Run with:
+
+    python -m benchmarks.parallel
+"""
+import gc
+import math
+import os
+import pickle
+import timeit
+from concurrent.futures import ProcessPoolExecutor
+
+from networkx import Graph
+
+from agh_graphs.batch import Batch
+from agh_graphs.derivations.derivation_e import derive_e
+from agh_graphs.parallel import apply_parallel, _make_shard, _merge, _rewrite_shard
+from agh_graphs.productions.p2 import P2
+from agh_graphs.productions.p9 import P9
+from agh_graphs.utils import get_vertices_from_layer
+
+REFINEMENTS = [2, 4, 6]
+PROCESSES = 2
+
+
+def refined_graph(refinements):
+    """
+    Returns the refined graph and inputs of P9 (interiors of its last layer).
+    """
+    graph = derive_e(Graph())
+    layer = max(layer for _, layer in graph.nodes(data='layer'))
+    for _ in range(refinements):
+        P2().apply_many(graph, [[i] for i in get_vertices_from_layer(graph, layer, 'I')])
+        layer += 1
+    return graph, [[i] for i in get_vertices_from_layer(graph, layer, 'I')]
+
+
+def split_parallel(graph, inputs):
+    """
+    Runs the steps of `apply_parallel` in this process and returns the times
+    (in seconds) of the steps of the calling process and of the workers.
+    """
+    start = timeit.default_timer()
+    matches = P9().match_many(graph, inputs)
+    data = pickle.dumps(_make_shard(graph, matches))
+    parent_time = timeit.default_timer() - start
+
+    start = timeit.default_timer()
+    changes = pickle.dumps(_rewrite_shard(pickle.loads(data)))
+    workers_time = timeit.default_timer() - start
+
+    start = timeit.default_timer()
+    batch = Batch(graph)
+    _merge(batch, pickle.loads(changes))
+    batch.flush()
+    return parent_time + timeit.default_timer() - start, workers_time
+
+
+def pool_start_time():
+    start = timeit.default_timer()
+    with ProcessPoolExecutor(PROCESSES) as executor:
+        list(executor.map(abs, range(PROCESSES)))
+    return timeit.default_timer() - start
+
+
+def measure_time(function, refinements, repeat=5):
+    """
+    Returns the best time (in seconds) of `function(graph, inputs)`.
+    """
+    times = []
+    for _ in range(repeat):
+        (graph, inputs) = refined_graph(refinements)
+        gc.disable()
+        start = timeit.default_timer()
+        function(graph, inputs)
+        times.append(timeit.default_timer() - start)
+        gc.enable()
+    return min(times)
+
+
+def measure_split_time(refinements, repeat=5):
+    """
+    Returns the best times (in seconds) of the steps of the calling process and
+    of the workers, see `split_parallel`.
+    """
+    times = []
+    for _ in range(repeat):
+        (graph, inputs) = refined_graph(refinements)
+        gc.disable()
+        times.append(split_parallel(graph, inputs))
+        gc.enable()
+    return min(parent for parent, _ in times), min(workers for _, workers in times)
+
+
+def main():
+    start_time = min(pool_start_time() for _ in range(3))
+    print('{} CPUs, starting a pool of {} processes takes {:.1f} ms'.format(os.cpu_count(), PROCESSES,
+                                                                           start_time * 1000))
+    print('{:>7} {:>11} {:>20} {:>12} {:>13} {:>6}'.format(
+        'inputs', 'apply_many', 'apply_parallel({})'.format(PROCESSES), 'parent [ms]', 'workers [ms]', 'cores'))
+    for refinements in REFINEMENTS:
+        (_, inputs) = refined_graph(refinements)
+        many_time = measure_time(lambda graph, prod_inputs: P9().apply_many(graph, prod_inputs), refinements)
+        parallel_time = measure_time(lambda graph, prod_inputs: apply_parallel(
+            P9(), graph, prod_inputs, processes=PROCESSES, min_inputs_per_process=1), refinements)
+        (parent_time, workers_time) = measure_split_time(refinements)
+        gain = many_time - start_time - parent_time
+        cores = str(math.ceil(workers_time / gain)) if gain > 0 else '-'
+        print('{:>7} {:>11.1f} {:>20.1f} {:>12.1f} {:>13.1f} {:>6}'.format(
+            len(inputs), many_time * 1000, parallel_time * 1000, parent_time * 1000, workers_time * 1000, cores))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+Measures geometry of triangles of all interiors of `derive_e()`: cached
+(`get_triangle_geometry`, after the derivation filled the cache) and computed
+again (`triangle_geometry`, as P2, P4 and P5 did on every application).
+
+Run with:
+
+    python -m benchmarks.triangle_geometry
+"""
+import gc
+import timeit
+
+from networkx import Graph
+
+from agh_graphs.derivations.derivation_e import derive_e
+from agh_graphs.layered_graph import LayeredGraph
+from agh_graphs.utils import get_neighbors_at, get_triangle_geometry, triangle_geometry
+
+BACKENDS = [
+    ('networkx.Graph', Graph),
+    ('LayeredGraph', LayeredGraph),
+]
+
+
+def measure_time(function, repeat=50):
+    """
+    Returns the best time (in seconds) of `function()`.
+    """
+    gc.disable()
+    try:
+        return min(timeit.repeat(function, repeat=repeat, number=1))
+    finally:
+        gc.enable()
+
+
+def main():
+    print('{:<16} {:>10} {:>12} {:>14}'.format('backend', 'interiors', 'cached [us]', 'computed [us]'))
+    for name, graph_factory in BACKENDS:
+        graph = derive_e(graph_factory())
+        layers = graph.nodes(data='layer')
+        positions = graph.nodes(data='position')
+        interiors = [(i, get_neighbors_at(graph, i, layers[i])) for i, label in graph.nodes(data='label')
+                     if label in ('I', 'i')]
+        for i, corners in interiors:
+            get_triangle_geometry(graph, i, corners)
+
+        cached_time = measure_time(lambda: [get_triangle_geometry(graph, i, corners) for i, corners in interiors])
+        computed_time = measure_time(lambda: [triangle_geometry(corners, [positions[v] for v in corners])
+                                              for i, corners in interiors])
+        print('{:<16} {:>10} {:>12.1f} {:>14.1f}'.format(name, len(interiors), cached_time * 1e6,
+                                                         computed_time * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -205,6 +205,22 @@ class P10Test(unittest.TestCase):
         self.assertEqual(graph.nodes[i1_new]['label'], 'i')
         self.assertEqual(graph.nodes[i2_new]['label'], 'i')
 
+    def testOverlappingVerticesElsewhereOnLayer(self):
+        graph = createCorrectGraph()
+        prod_input = [x for x, y in graph.nodes(data=True) if y['label'] == 'I']
+        e1 = gen_name()
+        e2 = gen_name()
+        graph.add_node(e1, layer=2, position=(10.0, 10.0), label='E')
+        graph.add_node(e2, layer=2, position=(10.0, 10.0), label='E')
+        graph.add_edge(e1, e2)
+        nodes_before = len(graph.nodes())
+
+        P10().apply(graph, prod_input)
+
+        self.assertEqual(len(graph.nodes()), nodes_before - 2)
+        self.assertIn(e1, graph)
+        self.assertIn(e2, graph)
+
     def testMissingNode(self):
         graph = createCorrectGraph()
         e5 = get_node_at(graph=graph, layer=2, pos=(2.0, 2.0))
@@ -98,9 +98,11 @@ class P8Test(unittest.TestCase):
         [i1_1, i1_2] = P2().apply(graph, [i1], orientation=1)
         [i2_1, i2_2] = P2().apply(graph, [i2], orientation=1)
 
-        overlappings = find_overlapping_vertices(graph)
+        overlappings = [(v1, v2) for v1, v2 in find_overlapping_vertices(graph, 2)
+                        if graph.nodes[v1]['position'] != (0.5, 0.5)]
+        self.assertEqual(len(overlappings), 2)
         join_overlapping_vertices(graph, overlappings[0][0], overlappings[0][1], 2)
-        join_overlapping_vertices(graph, overlappings[4][0], overlappings[4][1], 2)
+        join_overlapping_vertices(graph, overlappings[1][0], overlappings[1][1], 2)
         # visualize_graph_layer(graph, 2)
 
         [i1_1new, i1_2new, i2_1new, i2_2new] = P8().apply(graph, [i1_1, i1_2, i2_1, i2_2])
@@ -206,6 +208,22 @@ class P8Test(unittest.TestCase):
         self.assertEqual(graph.nodes[i1]['label'], 'i')
         self.assertEqual(graph.nodes[i2]['label'], 'i')
 
+    def testOverlappingVerticesElsewhereOnLayer(self):
+        graph = createCorrectGraph()
+        prod_input = [x for x, y in graph.nodes(data=True) if y['label'] == 'I']
+        e1 = gen_name()
+        e2 = gen_name()
+        graph.add_node(e1, layer=2, position=(10.0, 10.0), label='E')
+        graph.add_node(e2, layer=2, position=(10.0, 10.0), label='E')
+        graph.add_edge(e1, e2)
+        nodes_before = len(graph.nodes())
+
+        P8().apply(graph, prod_input)
+
+        self.assertEqual(len(graph.nodes()), nodes_before - 1)
+        self.assertIn(e1, graph)
+        self.assertIn(e2, graph)
+
     def testMissingNode(self):
         graph = createCorrectGraph()
         e4 = get_node_at(graph=graph, layer=2, pos=(3.0, 2.0))
@@ -0,0 +1,32 @@
+import os
+import subprocess
+import sys
+import unittest
+
+from agh_graphs import productions
+from agh_graphs.productions.p12 import P12
+
+
+class RegistryTest(unittest.TestCase):
+
+    def test_get(self):
+        self.assertIs(productions.get('P12'), P12)
+        self.assertEqual(productions.get('P7').__name__, 'P7')
+        for name in ['P3', 'P12x', 'p12', 'visualize']:
+            with self.assertRaises(KeyError):
+                productions.get(name)
+
+    def test_names(self):
+        self.assertEqual(productions.names(), ['P1', 'P2', 'P4', 'P5', 'P6', 'P7', 'P8', 'P9', 'P10', 'P12', 'P13'])
+
+    def test_matplotlib_is_not_imported(self):
+        code = ('import sys\n'
+                'import agh_graphs.derivations.derivation_a, agh_graphs.derivations.derivation_b\n'
+                'import agh_graphs.derivations.derivation_e, agh_graphs.derivation_script\n'
+                'from agh_graphs import productions\n'
+                'for name in productions.names(): productions.get(name)\n'
+                'print("matplotlib" in sys.modules)')
+        root = os.path.join(os.path.dirname(__file__), '..', '..')
+        output = subprocess.run([sys.executable, '-c', code], cwd=root, check=True, capture_output=True,
+                                text=True).stdout
+        self.assertEqual(output.strip(), 'False')
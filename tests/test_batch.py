@@ -0,0 +1,59 @@
+import unittest
+
+from networkx import Graph
+
+from agh_graphs.batch import Batch
+from agh_graphs.layered_graph import LayeredGraph
+from agh_graphs.utils import get_neighbors_at, add_interior
+
+
+def triangle(graph_factory):
+    graph = graph_factory()
+    graph.add_node(0, layer=1, position=(0.0, 0.0), label='E')
+    graph.add_node(1, layer=1, position=(1.0, 0.0), label='E')
+    graph.add_node(2, layer=1, position=(0.0, 1.0), label='E')
+    graph.add_edges_from([(0, 1), (1, 2), (2, 0)])
+    return graph
+
+
+class BatchTest(unittest.TestCase):
+
+    def test_staged_nodes_and_edges(self):
+        for graph_factory in [Graph, LayeredGraph]:
+            graph = triangle(graph_factory)
+            batch = Batch(graph)
+            batch.add_node(3, layer=2, position=(0.0, 0.0), label='E')
+            batch.add_edge(3, 0)
+            i = add_interior(batch, 0, 1, 2)
+
+            self.assertNotIn(3, graph)
+            self.assertNotIn(i, graph)
+            self.assertIn(3, batch)
+            self.assertEqual(batch.nodes[3]['layer'], 2)
+            self.assertEqual(batch.nodes(data='position')[i], (1 / 3, 1 / 3))
+            self.assertTrue(batch.has_edge(0, 3))
+            self.assertTrue(batch.has_edge(0, 1))
+            self.assertEqual(list(batch.neighbors(0)), list(graph.neighbors(0)) + [3, i])
+            self.assertEqual(get_neighbors_at(batch, 0, 1), [1, 2, i])
+            self.assertEqual(len(batch), 5)
+
+            batch.flush()
+            self.assertEqual(graph.nodes[3]['position'], (0.0, 0.0))
+            self.assertEqual(sorted(graph.neighbors(i)), [0, 1, 2])
+            self.assertEqual(graph.number_of_edges(), 7)
+
+    def test_removals(self):
+        for graph_factory in [Graph, LayeredGraph]:
+            graph = triangle(graph_factory)
+            batch = Batch(graph)
+            batch.add_node(3, layer=1, position=(0.5, 0.0), label='E')
+            batch.add_edge(0, 3)
+            batch.add_edge(1, 3)
+            batch.remove_edge(0, 1)
+            batch.remove_edge(3, 1)
+            self.assertFalse(graph.has_edge(0, 1))
+
+            batch.remove_node(2)
+            self.assertNotIn(2, graph)
+            batch.flush()
+            self.assertEqual(sorted(graph.edges()), [(0, 3)])
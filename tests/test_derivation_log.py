@@ -0,0 +1,98 @@
+import unittest
+
+from networkx import Graph
+
+from agh_graphs.derivation_log import replay, start_log, stop_log
+from agh_graphs.derivations.derivation_e import derive_e
+from agh_graphs.execution import STRICT, get_execution_mode
+from agh_graphs.layered_graph import LayeredGraph
+from agh_graphs.productions.p2 import P2
+from agh_graphs.productions.p9 import P9
+from agh_graphs.utils import get_vertices_from_layer, use_exact_positions
+from tests.test_production import initial_graph, snapshot
+
+
+class FailingP9(P9):
+    def rewrite(self, graph, match):
+        super().rewrite(graph, match)
+        raise RuntimeError('rewrite failed')
+
+
+class DerivationLogTest(unittest.TestCase):
+
+    def test_replay_derivation_e(self):
+        for graph_factory in [Graph, LayeredGraph]:
+            graph = graph_factory()
+            log = start_log(graph)
+            derive_e(graph)
+            stop_log(graph)
+            self.assertEqual(log.count, 152)
+
+            replayed = replay(log.to_bytes(), graph_factory())
+            self.assertEqual(snapshot(replayed), snapshot(graph))
+            for n in graph:
+                self.assertEqual(list(replayed.neighbors(n)), list(graph.neighbors(n)))
+            self.assertEqual(get_execution_mode(replayed).validated, 0)
+
+    def test_replay_on_other_backend(self):
+        for recorded_factory, replayed_factory in [(Graph, LayeredGraph), (LayeredGraph, Graph)]:
+            graph = recorded_factory()
+            start_log(graph)
+            derive_e(graph)
+            data = stop_log(graph).to_bytes()
+
+            replayed = replay(data, replayed_factory())
+            self.assertIsInstance(replayed, replayed_factory)
+            self.assertEqual(snapshot(replayed), snapshot(graph))
+
+    def test_apply_many_and_exact_positions(self):
+        (graph, [i1, i2]) = initial_graph()
+        use_exact_positions(graph)
+        start_log(graph)
+        P2().apply_many(graph, [[i1], [i2]], orientations=[1, 2])
+        P9().apply_many(graph, [[i] for i in get_vertices_from_layer(graph, 2, 'I')])
+        data = stop_log(graph).to_bytes()
+
+        replayed = replay(data)
+        self.assertEqual(snapshot(replayed), snapshot(graph))
+        self.assertEqual(replayed.nodes[i1]['position'], graph.nodes[i1]['position'])
+        self.assertTrue(replayed.graph['exact_positions'])
+
+    def test_apply_match(self):
+        (graph, [i1, i2]) = initial_graph()
+        log = start_log(graph)
+        match = P2().match_many(graph, [[i1]], orientations=1, epsilon=0.1)[0]
+        self.assertEqual(match.kwargs, {'epsilon': 0.1})
+        P2().apply(graph, match, execution_mode=STRICT)
+        P2().apply(graph, [i2], execution_mode=STRICT)
+        self.assertEqual(log.count, 2)
+
+        replayed = replay(stop_log(graph).to_bytes())
+        self.assertEqual(snapshot(replayed), snapshot(graph))
+
+    def test_failed_application_is_not_recorded(self):
+        (graph, [i1, i2]) = initial_graph()
+        log = start_log(graph)
+        P2().apply(graph, [i1])
+        with self.assertRaises(RuntimeError):
+            FailingP9().apply_in_transaction(graph, [i2])
+        self.assertEqual(log.count, 1)
+
+        replayed = replay(stop_log(graph).to_bytes())
+        self.assertEqual(snapshot(replayed), snapshot(graph))
+
+    def test_only_productions_are_replayed(self):
+        for module, name in [('builtins', 'print'), ('agh_graphs.productions.p2', 'gen_name'),
+                             (FailingP9.__module__, FailingP9.__qualname__)]:
+            (graph, [i1, _]) = initial_graph()
+            log = start_log(graph)
+            log.record(graph, type(name, (), {'__module__': module})(), [i1], 0, {})
+            with self.assertRaises(ValueError):
+                replay(log.to_bytes())
+
+    def test_invalid_data(self):
+        with self.assertRaises(ValueError):
+            replay(b'not a log')
+        (graph, _) = initial_graph()
+        with self.assertRaises(ValueError):
+            replay(start_log(Graph()), graph)
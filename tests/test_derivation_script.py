@@ -0,0 +1,75 @@
+import os
+import sys
+import unittest
+
+from networkx import Graph
+
+from agh_graphs.derivation_script import compile_script, load_plan
+from agh_graphs.derivations.derivation_e import derive_e
+from agh_graphs.layered_graph import LayeredGraph
+from agh_graphs.productions.p1 import P1
+from agh_graphs.productions.p2 import P2
+from agh_graphs.productions.p9 import P9
+from agh_graphs.utils import gen_name, use_exact_positions
+from tests.test_production import snapshot
+
+DERIVATION_E = os.path.join(os.path.dirname(__file__), '..', 'agh_graphs', 'derivations', 'derivation_e.json')
+
+
+def script(*steps, **options):
+    return dict(initial={'name': 'initial', 'position': [0.5, 0.5]}, steps=list(steps), **options)
+
+
+class DerivationScriptTest(unittest.TestCase):
+
+    def test_derivation_e(self):
+        plan = load_plan(DERIVATION_E)
+        self.assertEqual(len(plan.steps), 152)
+        for graph_factory in [Graph, LayeredGraph]:
+            graph = plan.run(graph_factory())
+            expected = derive_e(graph_factory())
+            self.assertEqual(snapshot(graph), snapshot(expected))
+            for n in expected:
+                self.assertEqual(list(graph.neighbors(n)), list(expected.neighbors(n)))
+
+    def test_names_and_positions(self):
+        for graph_factory in [Graph, LayeredGraph]:
+            for exact_positions in [False, True]:
+                plan = compile_script(script(
+                    {'production': 'P1', 'inputs': ['initial'], 'outputs': [None, 'a']},
+                    {'production': 'P2', 'inputs': ['a'], 'orientation': 1, 'outputs': ['a', None]},
+                    {'production': 'agh_graphs.productions.p9:P9', 'inputs': ['a']},
+                    {'production': 'P9', 'inputs': [{'layer': 1, 'position': ['1/3', '2/3'], 'label': 'I'}]},
+                    exact_positions=exact_positions))
+                graph = plan.run(graph_factory())
+
+                expected = graph_factory()
+                if exact_positions:
+                    use_exact_positions(expected)
+                initial = gen_name(expected)
+                expected.add_node(initial, layer=0, position=(0.5, 0.5), label='E')
+                [i1, i2] = P1().apply(expected, [initial])
+                [a, _] = P2().apply(expected, [i2], orientation=1)
+                P9().apply(expected, [a])
+                P9().apply(expected, [i1])
+                self.assertEqual(snapshot(graph), snapshot(expected))
+
+    def test_invalid_scripts(self):
+        with self.assertRaises(ValueError):
+            compile_script(script({'production': 'P1', 'inputs': ['missing']}))
+        with self.assertRaises(ValueError):
+            compile_script(script({'production': 'P99', 'inputs': ['initial']}))
+        with self.assertRaises(ValueError):
+            compile_script(script({'production': 'P1', 'inputs': ['initial'], 'outputs': ['a']})).run()
+        with self.assertRaises(ValueError):
+            compile_script(script({'production': 'P9', 'inputs': [{'layer': 1, 'position': [0, 0]}]})).run()
+
+    def test_only_productions_are_loaded(self):
+        for name in ['builtins:print', 'agh_graphs.utils:IdAllocator', 'agh_graphs.productions.p1:P2',
+                     'os:system', 'tests.test_production:P2', 'this:P1']:
+            with self.assertRaises(ValueError):
+                compile_script(script({'production': name, 'inputs': ['initial']}))
+        # rejected names are not imported
+        self.assertNotIn('this', sys.modules)
+        plan = compile_script(script({'production': 'agh_graphs.productions.p1:P1', 'inputs': ['initial']}))
+        self.assertIsInstance(plan.steps[0].production, P1)
@@ -0,0 +1,74 @@
+import math
+import pickle
+import random
+import unittest
+from fractions import Fraction
+
+from agh_graphs.exact import Dyadic, DyadicThird, to_exact, exact_position, float_position, is_exact
+
+
+class ExactTest(unittest.TestCase):
+    def test_normalization(self):
+        self.assertEqual(repr(Dyadic(4, 3)), 'Dyadic(1, 1)')
+        self.assertEqual(repr(Dyadic(3, -2)), 'Dyadic(12, 0)')
+        self.assertEqual(repr(DyadicThird(6, 2)), 'Dyadic(1, 1)')
+        self.assertEqual(repr(to_exact(0.75)), 'Dyadic(3, 2)')
+        self.assertEqual(repr(to_exact(Fraction(5, 12))), 'DyadicThird(5, 2)')
+        with self.assertRaises(ValueError):
+            to_exact(Fraction(1, 5))
+        with self.assertRaises(ValueError):
+            to_exact(math.inf)
+
+    def test_midpoint_and_centroid(self):
+        a = exact_position((0, 0))
+        b = exact_position((1, 0))
+        c = exact_position((0, 1))
+        middle = ((a[0] + b[0]) / 2, (a[1] + b[1]) / 2)
+        self.assertEqual(middle, (0.5, 0))
+        self.assertTrue(all(isinstance(x, Dyadic) for x in middle))
+
+        centroid = tuple(sum(s) / len(s) for s in zip(a, b, c))
+        self.assertTrue(all(isinstance(x, DyadicThird) for x in centroid))
+        self.assertEqual(centroid, (Fraction(1, 3), Fraction(1, 3)))
+        self.assertEqual(float_position(centroid), (1 / 3, 1 / 3))
+
+    def test_same_as_fraction(self):
+        rng = random.Random(0)
+        for _ in range(2000):
+            a = Fraction(rng.randint(-100, 100), rng.choice([1, 2, 8, 3, 12]))
+            b = Fraction(rng.randint(-100, 100), rng.choice([1, 4, 3, 6]))
+            (exact_a, exact_b) = (to_exact(a), to_exact(b))
+            self.assertTrue(is_exact(exact_a))
+            self.assertEqual(exact_a, a)
+            self.assertEqual(hash(exact_a), hash(a))
+            self.assertEqual(float(exact_a), float(a))
+            self.assertEqual(math.floor(exact_a), math.floor(a))
+            self.assertEqual(exact_a < exact_b, a < b)
+            self.assertEqual(exact_a + exact_b, a + b)
+            self.assertEqual(exact_a - exact_b, a - b)
+            self.assertEqual(exact_a * exact_b, a * b)
+            self.assertEqual(exact_a ** 2, a ** 2)
+            if b:
+                self.assertEqual(exact_a / exact_b, a / b)
+
+    def test_hash_same_as_float(self):
+        positions = {(0.5, 0.25): 'a', (1 / 3, 1): 'b'}
+        self.assertEqual(positions[(Dyadic(1, 1), Dyadic(1, 2))], 'a')
+        self.assertNotIn((DyadicThird(1), Dyadic(1)), positions)
+        self.assertEqual(Dyadic(1, 1) + 0.25, Dyadic(3, 2))
+
+    def test_compare_with_nan_and_inf(self):
+        for value in [Dyadic(1, 1), DyadicThird(5, 2)]:
+            self.assertFalse(value == math.nan)
+            self.assertFalse(math.nan == value)
+            self.assertTrue(value != math.nan)
+            self.assertFalse(value < math.nan or value >= math.nan)
+            self.assertTrue(value < math.inf and value <= math.inf)
+            self.assertTrue(math.inf > value and math.inf >= value)
+            self.assertTrue(value > -math.inf and -math.inf < value)
+            self.assertFalse(value == math.inf or math.inf == value)
+
+    def test_pickle(self):
+        for value in [Dyadic(3, 2), DyadicThird(5, 2), to_exact(-7)]:
+            copy = pickle.loads(pickle.dumps(value))
+            self.assertEqual(repr(copy), repr(value))
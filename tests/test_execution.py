@@ -0,0 +1,67 @@
+import unittest
+
+from networkx import Graph
+
+from agh_graphs.derivations.derivation_e import derive_e
+from agh_graphs.execution import get_execution_mode, set_execution_mode, ExecutionMode, STRICT, SAMPLED, TRUSTED
+from agh_graphs.productions.p2 import P2
+from agh_graphs.utils import gen_name
+from tests.test_production import initial_graph, snapshot
+
+
+APPLICATIONS = 152
+
+
+def derived(mode, **kwargs):
+    graph = Graph()
+    set_execution_mode(graph, mode, **kwargs)
+    return derive_e(graph)
+
+
+class ExecutionModeTest(unittest.TestCase):
+
+    def test_strict_by_default(self):
+        graph = derive_e(Graph())
+        execution_mode = get_execution_mode(graph)
+        self.assertEqual(execution_mode.mode, STRICT)
+        self.assertEqual(execution_mode.validated, APPLICATIONS)
+        self.assertEqual(execution_mode.trusted, 0)
+        self.assertGreater(execution_mode.validation_time, 0)
+
+    def test_trusted_derives_the_same_graph(self):
+        strict = derived(STRICT)
+        trusted = derived(TRUSTED)
+        self.assertEqual(snapshot(trusted), snapshot(strict))
+        self.assertEqual(get_execution_mode(trusted).validated, 0)
+        self.assertEqual(get_execution_mode(trusted).trusted, APPLICATIONS)
+
+    def test_sampled(self):
+        strict = derived(STRICT)
+        sampled = derived(SAMPLED, sample_rate=0.5, seed=1)
+        self.assertEqual(snapshot(sampled), snapshot(strict))
+
+        execution_mode = get_execution_mode(sampled)
+        self.assertEqual(execution_mode.validated + execution_mode.trusted, APPLICATIONS)
+        self.assertGreater(execution_mode.validated, 0)
+        self.assertGreater(execution_mode.trusted, 0)
+        self.assertEqual(get_execution_mode(derived(SAMPLED, sample_rate=0.5, seed=1)).validated,
+                         execution_mode.validated)
+
+    def test_per_call_mode(self):
+        (graph, [i1, _]) = initial_graph()
+        set_execution_mode(graph, TRUSTED)
+        bad_interior = gen_name(graph)
+        graph.add_node(bad_interior, layer=1, position=(0.5, 0.5), label='E')
+
+        with self.assertRaises(AssertionError):
+            P2().apply(graph, [bad_interior], execution_mode=STRICT)
+        P2().apply(graph, [i1])
+
+        self.assertEqual(get_execution_mode(graph).validated, 1)
+        self.assertEqual(get_execution_mode(graph).trusted, 1)
+
+    def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            ExecutionMode('unchecked')
+        with self.assertRaises(ValueError):
+            ExecutionMode().should_validate('unchecked')
@@ -0,0 +1,84 @@
+import random
+import unittest
+
+import numpy as np
+from networkx import Graph
+
+from agh_graphs.derivations.derivation_e import derive_e
+from agh_graphs.exact import exact_position
+from agh_graphs.geometry import orientation, ccw_order, angle_order, longest_edges, squared_lengths, midpoints, \
+    centroids, triangle_orders, layer_triangles, cache_layer_geometry
+from agh_graphs.layered_graph import LayeredGraph
+from agh_graphs.utils import angle_with_x_axis, triangle_geometry, get_triangle_geometry
+
+TRIANGLES = [
+    [(0.0, 0.0), (2.0, 2.0), (2.0, 0.0)],
+    [(0.0, 0.0), (2.0, 0.0), (2.0, 2.0)],
+    [(1.0, 1.0), (-1.0, 3.0), (0.0, -2.0)],
+]
+
+
+class GeometryTest(unittest.TestCase):
+    def test_orientation(self):
+        a = [(0, 0), (0, 0), (0, 0)]
+        b = [(1, 0), (0, 1), (1, 1)]
+        c = [(0, 1), (1, 0), (2, 2)]
+        self.assertEqual(orientation(a, b, c).tolist(), [1, -1, 0])
+
+    def test_ccw_order(self):
+        self.assertEqual(ccw_order(TRIANGLES).tolist(), [[0, 2, 1], [0, 1, 2], [0, 1, 2]])
+
+    def test_angle_order(self):
+        random.seed(0)
+        vectors = [[(random.randint(-3, 3), random.choice([-2, -1, 1, 2])) for _ in range(5)] for _ in range(200)]
+        for order, triangle_vectors in zip(angle_order(vectors).tolist(), vectors):
+            # equal angles may differ by rounding errors of `angle_with_x_axis`
+            expected = sorted(range(5), key=lambda k: round(angle_with_x_axis((0, 0), triangle_vectors[k]), 9))
+            self.assertEqual(order, expected)
+
+    def test_lengths(self):
+        self.assertEqual(squared_lengths(TRIANGLES[0]).tolist(), [8.0, 4.0, 4.0])
+        self.assertEqual(longest_edges(TRIANGLES).tolist(), [0, 2, 1])
+        self.assertEqual(midpoints((0, 0), [(2, 2), (4, 0)]).tolist(), [[1.0, 1.0], [2.0, 0.0]])
+        self.assertEqual(centroids(TRIANGLES[2]).tolist(), [0.0, 2 / 3])
+
+    def test_triangle_orders(self):
+        (corner_order, edge_order, lengths, longest) = triangle_orders(TRIANGLES)
+        for k, triangle in enumerate(TRIANGLES):
+            geometry = triangle_geometry(range(3), triangle)
+            self.assertEqual(tuple(corner_order[k].tolist()), geometry.ccw)
+            self.assertEqual(tuple(edge_order[k].tolist()), geometry.edge_ranks)
+            self.assertEqual(tuple(lengths[k].tolist()), geometry.squared_lengths)
+            self.assertEqual(longest[k], geometry.longest)
+
+    def test_exact_positions(self):
+        triangle = [exact_position(p) for p in [(0, 0), (1, 0), (0.5, 0.75)]]
+        middle = midpoints(triangle[0], triangle[1])
+        self.assertEqual(middle.dtype, object)
+        self.assertEqual(tuple(middle.tolist()), exact_position((0.5, 0)))
+        self.assertEqual(orientation(*triangle), 1)
+        (corner_order, edge_order, _, longest) = triangle_orders([triangle])
+        geometry = triangle_geometry(range(3), triangle)
+        self.assertEqual(tuple(corner_order[0].tolist()), geometry.ccw)
+        self.assertEqual(tuple(edge_order[0].tolist()), geometry.edge_ranks)
+        self.assertEqual(longest[0], geometry.longest)
+
+    def test_cache_layer_geometry(self):
+        for graph_factory in [Graph, LayeredGraph]:
+            graph = derive_e(graph_factory())
+            positions = graph.nodes(data='position')
+            for layer in range(4):
+                graph.graph['geometry'] = {}
+                (interiors, corners, triangles) = layer_triangles(graph, layer)
+                self.assertEqual(triangles.shape, (len(interiors), 3, 2))
+                self.assertEqual(cache_layer_geometry(graph, layer), len(interiors))
+                for interior, interior_corners in zip(interiors, corners):
+                    geometry = get_triangle_geometry(graph, interior)
+                    self.assertIs(geometry, graph.graph['geometry'][interior])
+                    self.assertEqual(geometry, triangle_geometry(interior_corners,
+                                                                 [positions[v] for v in interior_corners]))
+            self.assertEqual(cache_layer_geometry(graph, 10), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
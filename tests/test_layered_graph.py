@@ -0,0 +1,242 @@
+import unittest
+from fractions import Fraction
+
+import networkx
+from networkx import Graph, NetworkXError
+
+from agh_graphs.derivations.derivation_a import DerivationA
+from agh_graphs.derivations.derivation_e import derive_e
+from agh_graphs.exact import Dyadic, DyadicThird
+from agh_graphs.layered_graph import LayeredGraph
+from agh_graphs.utils import gen_name, get_node_at, get_neighbors_at, get_vertices_from_layer, \
+    join_overlapping_vertices, pull_vertices_apart, pull_vertex_towards_neighbors
+
+
+class LayeredGraphTest(unittest.TestCase):
+    def test_node_attributes(self):
+        graph = LayeredGraph()
+        graph.add_node('a', layer=1, position=(0.5, 1), label='E')
+        graph.add_node('b', layer=2, position=(1, 1), label='I', custom=[1, 2])
+
+        self.assertEqual(len(graph.nodes()), 2)
+        self.assertEqual(graph.nodes['a']['layer'], 1)
+        self.assertEqual(graph.nodes['a']['position'], (0.5, 1))
+        self.assertEqual(graph.nodes['a']['label'], 'E')
+        self.assertEqual(graph.nodes['b']['custom'], [1, 2])
+        self.assertEqual(dict(graph.nodes['a']), {'layer': 1, 'position': (0.5, 1), 'label': 'E'})
+
+        graph.nodes()['a']['label'] = 'e'
+        graph.nodes['a']['position'] = (2, 3)
+        self.assertEqual(graph.nodes['a']['label'], 'e')
+        self.assertEqual(graph.nodes(data='position')['a'], (2, 3))
+        self.assertEqual(dict(graph.nodes(data='layer')), {'a': 1, 'b': 2})
+        self.assertIsNone(graph.nodes(data='missing')['a'])
+
+        with self.assertRaises(KeyError):
+            _ = graph.nodes['a']['custom']
+        with self.assertRaises(NetworkXError):
+            _ = graph.nodes['c']
+
+    def test_edges(self):
+        graph = LayeredGraph(capacity=1, max_degree=1)
+        for n in range(20):
+            graph.add_node(n, layer=0, position=(n, 0), label='E')
+        for n in range(1, 20):
+            graph.add_edge(0, n)
+        graph.add_edge(1, 0)
+
+        self.assertEqual(len(graph.edges()), 19)
+        self.assertTrue(graph.has_edge(5, 0))
+        self.assertFalse(graph.has_edge(5, 6))
+        self.assertEqual(sorted(graph.neighbors(0)), list(range(1, 20)))
+
+        graph.remove_edge(0, 5)
+        self.assertFalse(graph.has_edge(0, 5))
+        # neighbors stay in the order they were added, like in networkx
+        self.assertEqual(list(graph.neighbors(0)), [n for n in range(1, 20) if n != 5])
+        self.assertEqual(list(graph.neighbors(5)), [])
+        with self.assertRaises(NetworkXError):
+            graph.remove_edge(0, 5)
+
+        graph.remove_node(0)
+        self.assertEqual(len(graph.nodes()), 19)
+        self.assertEqual(len(graph.edges()), 0)
+        self.assertNotIn(0, graph)
+
+        graph.add_node('new', layer=3, position=(1, 1), label='I')
+        graph.add_edge('new', 1)
+        self.assertEqual(graph.nodes['new']['layer'], 3)
+        self.assertEqual(list(graph.neighbors(1)), ['new'])
+
+    def test_layer_neighbors(self):
+        graph = LayeredGraph(capacity=1, max_degree=1)
+        graph.add_node('i', layer=0, position=(0, 0), label='I')
+        graph.add_node('a', layer=1, position=(0, 0), label='E')
+        graph.add_node('b', layer=1, position=(1, 0), label='E')
+        graph.add_node('j', layer=1, position=(0.5, 0.5), label='I')
+        graph.add_node('c', layer=2, position=(0, 0), label='E')
+        graph.add_edges_from([('i', 'j'), ('a', 'b'), ('a', 'j'), ('b', 'j'), ('c', 'j')])
+
+        self.assertEqual(sorted(graph.layer_neighbors('j', 1)), ['a', 'b'])
+        self.assertEqual(graph.layer_neighbors('j', 0), ['i'])
+        self.assertEqual(graph.layer_neighbors('j', 2), ['c'])
+        self.assertEqual(graph.layer_neighbors('i', 2), [])
+        self.assertEqual(graph.layer_neighbors('i', 1), ['j'])
+        self.assertEqual(len(graph.edges()), 5)
+
+        graph.nodes['c']['layer'] = 1
+        self.assertEqual(graph.layer_neighbors('j', 2), [])
+        self.assertEqual(sorted(graph.layer_neighbors('j', 1)), ['a', 'b', 'c'])
+        self.assertEqual(graph.layer_neighbors('c', 1), ['j'])
+        del graph.nodes['c']['layer']
+        self.assertEqual(sorted(graph.neighbors('j')), ['a', 'b', 'c', 'i'])
+        self.assertEqual(len(graph.edges()), 5)
+
+        graph.remove_node('j')
+        self.assertEqual(graph.layer_neighbors('i', 1), [])
+        self.assertEqual(graph.layer_neighbors('a', 1), ['b'])
+        self.assertEqual(len(graph.edges()), 1)
+
+    def test_layer_neighbors_same_as_networkx(self):
+        graph = derive_e(LayeredGraph())
+        expected = graph.to_networkx()
+        for n, layer in expected.nodes(data='layer'):
+            for neighbor_layer in [layer - 1, layer, layer + 1]:
+                self.assertEqual(sorted(get_neighbors_at(graph, n, neighbor_layer)),
+                                 sorted(get_neighbors_at(expected, n, neighbor_layer)))
+
+    def test_layer_index(self):
+        graph = LayeredGraph()
+        graph.add_node('a', layer=1, position=(0, 0), label='E')
+        graph.add_node('b', layer=1, position=(0, 0), label='E')
+        graph.add_node('c', layer=1, position=(1, 0), label='I')
+        graph.add_node('d', layer=2, position=(1, 0), label='E')
+        graph.add_edge('a', 'c')
+        graph.add_edge('b', 'c')
+
+        self.assertEqual(graph.layer_nodes(1), ['a', 'b', 'c'])
+        self.assertEqual(graph.layer_nodes(1, 'E'), ['a', 'b'])
+        self.assertEqual(graph.layer_nodes(3), [])
+
+        graph.nodes['c']['label'] = 'i'
+        graph.nodes['d']['layer'] = 1
+        self.assertEqual(get_vertices_from_layer(graph, 1, 'I'), [])
+        self.assertEqual(get_vertices_from_layer(graph, 1, 'i'), ['c'])
+        self.assertEqual(get_vertices_from_layer(graph, 1, 'E'), ['a', 'b', 'd'])
+        self.assertEqual(get_vertices_from_layer(graph, 2), [])
+
+        join_overlapping_vertices(graph, 'a', 'b', 1)
+        self.assertEqual(get_vertices_from_layer(graph, 1, 'E'), ['a', 'd'])
+        self.assertEqual(get_node_at(graph, 1, (0, 0)), 'a')
+
+    def test_spatial_index(self):
+        graph = LayeredGraph()
+        graph.add_node('a', layer=1, position=(0.1 + 0.2, 0), label='E')
+        graph.add_node('b', layer=1, position=(1, 1), label='E')
+        graph.add_node('c', layer=2, position=(0.3, 0), label='E')
+        graph.add_node('d', layer=1, position=(-1000, 1e-12), label='E')
+        graph.add_edge('a', 'b')
+
+        self.assertIsNone(get_node_at(graph, 1, (0.3, 0)))
+        self.assertEqual(get_node_at(graph, 1, (0.3, 0), close=True), 'a')
+        self.assertEqual(get_node_at(graph, 1, (0.1 + 0.2, 0)), 'a')
+        self.assertEqual(get_node_at(graph, 2, (0.3, 0)), 'c')
+        self.assertEqual(get_node_at(graph, 1, (-1000.0000001, 1e-12), close=True), 'd')
+        self.assertIsNone(get_node_at(graph, 1, (-1000.1, 1e-12), close=True))
+        self.assertIsNone(get_node_at(graph, 1, (-1000, 0), close=True))
+
+        pull_vertex_towards_neighbors(graph, 'a', 0.5)
+        a_position = graph.nodes['a']['position']
+        self.assertIsNone(get_node_at(graph, 1, (0.3, 0), close=True))
+        self.assertEqual(get_node_at(graph, 1, a_position), 'a')
+
+        pull_vertices_apart(graph, 'a', 'b', 0.25)
+        self.assertNotIn('a', graph.nodes_at(1, a_position))
+        self.assertIn('a', graph.nodes_at(1, graph.nodes['a']['position']))
+        self.assertIn('b', graph.nodes_at(1, graph.nodes['b']['position']))
+        self.assertNotIn('b', graph.nodes_at(1, (1, 1)))
+        graph.nodes['b']['position'] = (1, 1)
+
+        graph.nodes['c']['layer'] = 1
+        graph.nodes['c']['position'] = (1, 1)
+        with self.assertRaisesRegex(RuntimeError, 'Multiple nodes'):
+            get_node_at(graph, 1, (1, 1))
+        graph.remove_node('b')
+        self.assertEqual(get_node_at(graph, 1, (1, 1)), 'c')
+        self.assertIsNone(get_node_at(graph, 2, (0.3, 0)))
+
+    def test_spatial_index_far_from_origin(self):
+        graph = LayeredGraph()
+        graph.add_node('a', layer=1, position=(1e9, -1e9), label='E')
+        graph.add_node('b', layer=1, position=(1e9 + 1, -1e9), label='E')
+        graph.add_node('c', layer=1)
+        # the tolerance spans about 2 ** 21 cells in each direction, the layer is scanned
+        self.assertEqual(graph.nodes_at(1, (1e9 + 0.5, -1e9), rel_tol=1e-9), ['a', 'b'])
+        self.assertEqual(graph.nodes_at(1, (1e9 + 2, -1e9), rel_tol=1e-12), [])
+        self.assertEqual(get_node_at(graph, 1, (1e9 - 0.5, -1e9 + 0.5), close=True), 'a')
+
+    def test_spatial_index_same_as_networkx(self):
+        graph = derive_e(LayeredGraph())
+        expected = graph.to_networkx()
+        for n, data in expected.nodes(data=True):
+            (x, y) = data['position']
+            for position in [(x, y), (x + 1e-12, y), (x, y + 1e-3)]:
+                for close in [False, True]:
+                    self.assertEqual(get_node_at(graph, data['layer'], position, close),
+                                     get_node_at(expected, data['layer'], position, close))
+
+    def test_exact_positions(self):
+        graph = LayeredGraph()
+        graph.add_node('a', layer=1, position=(Dyadic(1, 1), DyadicThird(1)), label='E')
+        graph.add_node('b', layer=1, position=(0.5, 0.25), label='E')
+
+        self.assertEqual(repr(graph.nodes['a']['position']), '(Dyadic(1, 1), DyadicThird(1, 0))')
+        self.assertEqual(get_node_at(graph, 1, (0.5, Fraction(1, 3))), 'a')
+        self.assertEqual(get_node_at(graph, 1, (Dyadic(1, 1), Dyadic(1, 2))), 'b')
+        self.assertIsNone(get_node_at(graph, 1, (0.5, 1 / 3)))
+        self.assertEqual(get_node_at(graph, 1, (0.5, 1 / 3), close=True), 'a')
+
+        graph.nodes['a']['position'] = (0.5, 1.0)
+        self.assertEqual(graph.nodes['a']['position'], (0.5, 1.0))
+        self.assertIs(type(graph.nodes['a']['position'][1]), float)
+
+    def test_networkx_conversion(self):
+        graph = Graph()
+        graph.add_node('a', layer=0, position=(0, 0), label='E')
+        graph.add_node('b', layer=0, position=(0, 1), label='E')
+        graph.add_edge('a', 'b')
+
+        layered = LayeredGraph.from_networkx(graph)
+        self.assertEqual(set(layered.edges()), {('a', 'b')})
+
+        converted = layered.to_networkx()
+        self.assertEqual(dict(converted.nodes(data=True)), dict(graph.nodes(data=True)))
+        self.assertEqual(len(converted.edges()), 1)
+
+        copy = layered.copy()
+        copy.remove_node('a')
+        self.assertIn('a', layered)
+
+        subgraph = layered.to_networkx(['a'])
+        self.assertEqual(list(subgraph.nodes()), ['a'])
+        self.assertEqual(len(subgraph.edges()), 0)
+
+    def test_derivation_a(self):
+        graph = LayeredGraph()
+        graph.add_node(gen_name(), layer=0, position=(0.5, 0.5), label='E')
+        DerivationA().run(graph, [(0, 0), (1, 0), (0, 1), (1, 1)])
+
+        self.assertEqual(len(graph.nodes()), 13)
+        self.assertEqual(len(graph.edges()), 26)
+        e2_bl = get_node_at(graph, 2, (0, 0))
+        self.assertIsNotNone(e2_bl)
+        self.assertEqual(len(get_neighbors_at(graph, e2_bl, 2)), 5)
+
+    def test_derivation_e_same_as_networkx(self):
+        expected = derive_e()
+        actual = derive_e(LayeredGraph())
+
+        self.assertTrue(networkx.is_isomorphic(expected, actual.to_networkx(), node_match=lambda a, b: a == b))
+        # new nodes get the same names on both backends
+        self.assertEqual(dict(actual.nodes(data=True)), dict(expected.nodes(data=True)))
+        self.assertEqual(set(map(frozenset, actual.edges())), set(map(frozenset, expected.edges())))
@@ -0,0 +1,109 @@
+import unittest
+from collections import Counter
+from unittest import mock
+
+from networkx import Graph
+
+from agh_graphs.derivations import derivation_e
+from agh_graphs.execution import get_execution_mode
+from agh_graphs.layered_graph import LayeredGraph
+from agh_graphs.matching import find_matches, stitch, conformize
+from agh_graphs.productions.p12 import P12
+from agh_graphs.productions.p2 import P2
+from agh_graphs.productions.p6 import P6
+from agh_graphs.productions.p9 import P9
+from tests.test_production import initial_graph, snapshot
+
+
+class Skip:
+    """
+    Stitching production which does nothing.
+    """
+
+    def apply(self, *args, **kwargs):
+        return []
+
+
+def stitch_layer(graph, layer):
+    stitch(graph, [layer])
+
+
+def stitching_before(production, stitched, stitch_layer=stitch_layer):
+    """
+    Returns `production` which stitches upper layers with `stitch_layer`
+    before it refines the first interior of a layer.
+    """
+
+    class StitchingProduction(production):
+        def apply(self, graph, prod_input, orientation=0, **kwargs):
+            layer = graph.nodes[prod_input[0]]['layer']
+            for upper_layer in range(1, layer):
+                if upper_layer not in stitched:
+                    stitched.add(upper_layer)
+                    stitch_layer(graph, upper_layer)
+            return super().apply(graph, prod_input, orientation, **kwargs)
+
+    return StitchingProduction
+
+
+def canonical(graph):
+    def key(n):
+        return graph.nodes[n]['layer'], graph.nodes[n]['label'], graph.nodes[n]['position']
+
+    return Counter(key(n) for n in graph), Counter(frozenset((key(u), key(v))) for u, v in graph.edges())
+
+
+class MatchingTest(unittest.TestCase):
+
+    def test_find_matches(self):
+        (graph, [i1, i2]) = initial_graph()
+        [b3, b2] = P2().apply(graph, [i1], orientation=1)
+        [b4, b1] = P2().apply(graph, [i2], orientation=1)
+
+        validated = get_execution_mode(graph).validated
+        [match] = find_matches(graph, 1)
+        self.assertEqual(get_execution_mode(graph).validated, validated + 1)
+        self.assertIsInstance(match.production, P6)
+        self.assertEqual(set(match.prod_input), {i1, i2, b1, b2, b3, b4})
+        self.assertEqual(list(find_matches(graph, 1, productions=[P12])), [])
+        self.assertEqual(list(find_matches(graph, 2)), [])
+
+    def test_stitch(self):
+        (graph, [i1, i2]) = initial_graph()
+        P9().apply(graph, [i1])
+        P9().apply(graph, [i2])
+        (expected, _) = initial_graph()
+        [j1] = P9().apply(expected, [i1])
+        [j2] = P9().apply(expected, [i2])
+        P12().apply(expected, [i1, i2, j1, j2])
+
+        self.assertEqual(stitch(graph), 1)
+        self.assertEqual(snapshot(graph), snapshot(expected))
+        self.assertEqual(stitch(graph), 0)
+
+    def test_stitch_derivation_e(self):
+        for graph_factory in [Graph, LayeredGraph]:
+            for stitch_function in [stitch_layer, conformize]:
+                stitched = set()
+                with mock.patch.object(derivation_e, 'P6', Skip), \
+                        mock.patch.object(derivation_e, 'P12', Skip), \
+                        mock.patch.object(derivation_e, 'P13', Skip), \
+                        mock.patch.object(derivation_e, 'P2', stitching_before(P2, stitched, stitch_function)), \
+                        mock.patch.object(derivation_e, 'P9', stitching_before(P9, stitched, stitch_function)):
+                    graph = derivation_e.derive_e(graph_factory())
+                stitch_function(graph, 6)
+
+                self.assertEqual(canonical(graph), canonical(derivation_e.derive_e(graph_factory())))
+
+    def test_conformize(self):
+        (graph, [i1, i2]) = initial_graph()
+        [b3, b2] = P2().apply(graph, [i1], orientation=1)
+        [b4, b1] = P2().apply(graph, [i2], orientation=1)
+        (expected, _) = initial_graph()
+        P2().apply(expected, [i1], orientation=1)
+        P2().apply(expected, [i2], orientation=1)
+        P6().apply(expected, [i1, i2, b1, b2, b3, b4])
+
+        self.assertEqual(conformize(graph, 1), 3)
+        self.assertEqual(canonical(graph), canonical(expected))
+        self.assertEqual(conformize(graph, 1), 0)
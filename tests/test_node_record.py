@@ -0,0 +1,152 @@
+import pickle
+import unittest
+from fractions import Fraction
+
+from networkx import Graph
+
+from agh_graphs.derivations.derivation_e import derive_e
+from agh_graphs.exact import Dyadic, DyadicThird
+from agh_graphs.node_record import NodeRecord, EdgeRecord, CompactGraph
+from agh_graphs.utils import get_node_at, get_vertices_from_layer, join_overlapping_vertices, \
+    pull_vertices_apart, pull_vertex_towards_neighbors
+
+
+class NodeRecordTest(unittest.TestCase):
+    def test_record(self):
+        record = NodeRecord(layer=1, position=(0.5, 1), label=''.join(['E']))
+        record['custom'] = [1, 2]
+
+        self.assertEqual(dict(record), {'layer': 1, 'position': (0.5, 1), 'label': 'E', 'custom': [1, 2]})
+        self.assertIs(record['label'], 'E')
+        self.assertIn('position', record)
+        self.assertNotIn('missing', record)
+        self.assertIsNone(record.get('missing'))
+        self.assertEqual(record, record.copy())
+
+        del record['position']
+        del record['custom']
+        self.assertEqual(list(record), ['layer', 'label'])
+        self.assertEqual(len(record), 2)
+        with self.assertRaises(KeyError):
+            _ = record['position']
+        with self.assertRaises(KeyError):
+            del record['custom']
+        with self.assertRaises(AttributeError):
+            record.other = 1
+
+    def test_edge_record(self):
+        record = EdgeRecord()
+        self.assertEqual(dict(record), {})
+        record['weight'] = 2
+        self.assertEqual(record, {'weight': 2})
+        self.assertEqual(record.copy(), record)
+        del record['weight']
+        self.assertEqual(len(record), 0)
+        with self.assertRaises(KeyError):
+            del record['weight']
+
+        graph = CompactGraph()
+        graph.add_edge('a', 'b', weight=1)
+        graph.add_edge('b', 'c')
+        self.assertIsInstance(graph.edges['a', 'b'], EdgeRecord)
+        self.assertEqual(list(graph.edges(data=True)), [('a', 'b', {'weight': 1}), ('b', 'c', {})])
+
+    def test_derivation_e_same_as_networkx(self):
+        expected = derive_e()
+        graph = derive_e(CompactGraph())
+
+        self.assertTrue(all(isinstance(data, NodeRecord) for _, data in graph.nodes(data=True)))
+        self.assertEqual(dict(graph.nodes(data=True)), dict(expected.nodes(data=True)))
+        self.assertEqual(set(graph.edges()), set(expected.edges()))
+
+        copy = graph.copy()
+        self.assertIsInstance(copy, CompactGraph)
+        self.assertEqual(dict(copy.nodes(data=True)), dict(expected.nodes(data=True)))
+
+    def test_layer_index(self):
+        graph = CompactGraph()
+        graph.add_node('a', layer=1, position=(0, 0), label='E')
+        graph.add_nodes_from([('b', {'layer': 1, 'position': (0, 0), 'label': 'E'}), 'c'])
+        graph.add_edge('c', 'd')
+        graph.nodes['c'].update(layer=1, position=(1, 0), label='I')
+        graph.nodes['d'].update(layer=2, position=(1, 0), label='E')
+        graph.add_edges_from([('a', 'c'), ('b', 'c')])
+
+        self.assertEqual(graph.layer_nodes(1), ['a', 'b', 'c'])
+        self.assertEqual(graph.layer_nodes(1, 'E'), ['a', 'b'])
+        self.assertEqual(graph.layer_nodes(3), [])
+
+        graph.nodes['c']['label'] = 'i'
+        graph.nodes['d']['layer'] = 1
+        self.assertEqual(get_vertices_from_layer(graph, 1, 'I'), [])
+        self.assertEqual(get_vertices_from_layer(graph, 1, 'i'), ['c'])
+        self.assertEqual(get_vertices_from_layer(graph, 1, 'E'), ['a', 'b', 'd'])
+        self.assertEqual(get_vertices_from_layer(graph, 2), [])
+
+        join_overlapping_vertices(graph, 'a', 'b', 1)
+        self.assertEqual(get_vertices_from_layer(graph, 1, 'E'), ['a', 'd'])
+        del graph.nodes['d']['label']
+        graph.remove_nodes_from(['c', 'x'])
+        self.assertEqual(graph.layer_nodes(1), ['a', 'd'])
+        self.assertEqual(graph.layer_nodes(1, 'E'), ['a'])
+
+        for copy in [graph.copy(), pickle.loads(pickle.dumps(graph))]:
+            copy.nodes['a']['layer'] = 2
+            self.assertEqual(copy.layer_nodes(1), ['d'])
+            self.assertEqual(copy.layer_nodes(2, 'E'), ['a'])
+        self.assertEqual(graph.layer_nodes(1), ['a', 'd'])
+        graph.clear()
+        self.assertEqual(graph.layer_nodes(1), [])
+
+    def test_layer_index_same_as_networkx(self):
+        expected = derive_e()
+        graph = derive_e(CompactGraph())
+        for layer in set(layer for _, layer in expected.nodes(data='layer')):
+            self.assertEqual(graph.layer_nodes(layer), get_vertices_from_layer(expected, layer))
+            # nodes are indexed by label in the order they were given it
+            for label in ['E', 'I', 'i']:
+                self.assertEqual(sorted(graph.layer_nodes(layer, label)),
+                                 sorted(get_vertices_from_layer(expected, layer, label)))
+
+    def test_spatial_index(self):
+        graph = CompactGraph()
+        graph.add_node('a', layer=1, position=(0.1 + 0.2, 0), label='E')
+        graph.add_node('b', layer=1, position=(1, 1), label='E')
+        graph.add_node('c', layer=2, position=(0.3, 0), label='E')
+        graph.add_node('d', layer=1, position=(Dyadic(1, 1), DyadicThird(1)), label='E')
+        graph.add_node('e', layer=1, position=(1e9, -1e9), label='E')
+        graph.add_edge('a', 'b')
+
+        self.assertIsNone(get_node_at(graph, 1, (0.3, 0)))
+        self.assertEqual(get_node_at(graph, 1, (0.3, 0), close=True), 'a')
+        self.assertEqual(get_node_at(graph, 2, (0.3, 0)), 'c')
+        self.assertEqual(get_node_at(graph, 1, (0.5, Fraction(1, 3))), 'd')
+        self.assertEqual(get_node_at(graph, 1, (0.5, 1 / 3), close=True), 'd')
+        self.assertEqual(get_node_at(graph, 1, (1e9 + 0.5, -1e9), close=True), 'e')
+
+        pull_vertex_towards_neighbors(graph, 'a', 0.5)
+        self.assertIsNone(get_node_at(graph, 1, (0.3, 0), close=True))
+        self.assertEqual(get_node_at(graph, 1, graph.nodes['a']['position']), 'a')
+        pull_vertices_apart(graph, 'a', 'b', 0.25)
+        self.assertEqual(graph.nodes_at(1, graph.nodes['b']['position']), ['b'])
+        self.assertEqual(graph.nodes_at(1, (1, 1)), [])
+
+        graph.nodes['c'].update(layer=1, position=(0.5, 0.5))
+        graph.add_node('f', layer=1, position=(0.5, 0.5))
+        with self.assertRaisesRegex(RuntimeError, 'Multiple nodes'):
+            get_node_at(graph, 1, (0.5, 0.5))
+        del graph.nodes['f']['position']
+        self.assertEqual(get_node_at(graph, 1, (0.5, 0.5)), 'c')
+        graph.remove_node('c')
+        self.assertIsNone(get_node_at(graph, 1, (0.5, 0.5)))
+        self.assertIsNone(get_node_at(graph, 2, (0.3, 0)))
+
+    def test_spatial_index_same_as_networkx(self):
+        expected = derive_e()
+        graph = derive_e(CompactGraph())
+        for n, data in expected.nodes(data=True):
+            (x, y) = data['position']
+            for position in [(x, y), (x + 1e-12, y), (x, y + 1e-3)]:
+                for close in [False, True]:
+                    self.assertEqual(get_node_at(graph, data['layer'], position, close),
+                                     get_node_at(expected, data['layer'], position, close))
@@ -0,0 +1,80 @@
+import unittest
+from unittest import mock
+
+from networkx import Graph
+
+from agh_graphs.derivations.derivation_e import derive_e
+from agh_graphs.layered_graph import LayeredGraph
+from agh_graphs.matching import find_matches, stitch
+from agh_graphs.parallel import apply_parallel
+from agh_graphs.productions.p12 import P12
+from agh_graphs.productions.p2 import P2
+from agh_graphs.productions.p9 import P9
+from agh_graphs.utils import get_vertices_from_layer, use_exact_positions
+from tests.test_production import initial_graph, snapshot
+
+
+class ApplyParallelTest(unittest.TestCase):
+
+    def test_same_as_apply_many(self):
+        for graph_factory in [Graph, LayeredGraph]:
+            for production in [P9(), P2()]:
+                for processes in [1, 2, 3]:
+                    parallel = derive_e(graph_factory())
+                    inputs = [[i] for i in get_vertices_from_layer(parallel, 7, 'I')]
+                    orientations = [k % 3 for k in range(len(inputs))]
+                    results = apply_parallel(production, parallel, inputs, orientations, processes=processes,
+                                             min_inputs_per_process=1)
+
+                    expected = derive_e(graph_factory())
+                    self.assertEqual(results, production.apply_many(expected, inputs, orientations))
+                    self.assertEqual(snapshot(parallel), snapshot(expected))
+                    for n in expected:
+                        self.assertEqual(list(parallel.neighbors(n)), list(expected.neighbors(n)))
+                    self.assertEqual(parallel.graph['correspondence'].entries,
+                                     expected.graph['correspondence'].entries)
+                    self.assertEqual(parallel.graph['midpoints'].entries, expected.graph['midpoints'].entries)
+                    self.assertEqual(parallel.graph['geometry'], expected.graph['geometry'])
+
+    def test_exact_positions(self):
+        (graph, [i1, i2]) = initial_graph()
+        use_exact_positions(graph)
+        (expected, _) = initial_graph()
+        use_exact_positions(expected)
+
+        self.assertEqual(apply_parallel(P2(), graph, [[i1], [i2]], processes=2, min_inputs_per_process=1),
+                         P2().apply_many(expected, [[i1], [i2]]))
+        self.assertEqual(snapshot(graph), snapshot(expected))
+
+    def test_conflicting_inputs(self):
+        (graph, [i1, i2]) = initial_graph()
+        expected = snapshot(graph)
+        with self.assertRaises(ValueError):
+            apply_parallel(P9(), graph, [[i1], [i2], [i1]], processes=2, min_inputs_per_process=1)
+        self.assertEqual(snapshot(graph), expected)
+
+    def test_merging_production(self):
+        (graph, [i1, i2]) = initial_graph()
+        P2().apply(graph, [i1], orientation=1)
+        P2().apply(graph, [i2], orientation=1)
+        stitch(graph, [1])
+        for i in get_vertices_from_layer(graph, 2, 'I'):
+            P9().apply(graph, [i])
+        inputs = [match.prod_input for match in find_matches(graph, 2)][::2]
+        expected = snapshot(graph)
+        # P12 merges vertices of the layer below, which are not in its input
+        with self.assertRaises(ValueError):
+            apply_parallel(P12(), graph, inputs, processes=2, min_inputs_per_process=1)
+        self.assertEqual(snapshot(graph), expected)
+
+    def test_small_batches(self):
+        graph = derive_e()
+        inputs = [[i] for i in get_vertices_from_layer(graph, 7, 'I')]
+        expected = derive_e()
+        # one process by default, and fewer than `min_inputs_per_process` inputs for more processes
+        with mock.patch('agh_graphs.parallel.ProcessPoolExecutor') as executor:
+            results = apply_parallel(P9(), graph, inputs)
+            self.assertEqual(results, P9().apply_many(expected, inputs))
+            self.assertEqual(apply_parallel(P9(), graph, results, processes=4), P9().apply_many(expected, results))
+        executor.assert_not_called()
+        self.assertEqual(snapshot(graph), snapshot(expected))
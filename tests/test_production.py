@@ -0,0 +1,127 @@
+import unittest
+
+from networkx import Graph
+
+from agh_graphs.derivations.derivation_e import derive_e
+from agh_graphs.layered_graph import LayeredGraph
+from agh_graphs.production import Match
+from agh_graphs.productions.p1 import P1
+from agh_graphs.productions.p2 import P2
+from agh_graphs.productions.p6 import P6
+from agh_graphs.productions.p9 import P9
+from agh_graphs.utils import gen_name, get_vertices_from_layer
+
+
+def snapshot(graph):
+    nodes = {n: dict(data) for n, data in graph.nodes(data=True)}
+    edges = set(frozenset(edge) for edge in graph.edges())
+    return nodes, edges
+
+
+def initial_graph():
+    graph = Graph()
+    initial_node = gen_name(graph)
+    graph.add_node(initial_node, layer=0, position=(0.5, 0.5), label='E')
+    return graph, P1().apply(graph, [initial_node])
+
+
+class ProductionTest(unittest.TestCase):
+    def setUp(self):
+        (self.graph, [self.i1, self.i2]) = initial_graph()
+
+    def test_match_does_not_change_graph(self):
+        expected = snapshot(self.graph)
+        match = P2().match(self.graph, [self.i1], orientation=1)
+
+        self.assertIsInstance(match, Match)
+        self.assertEqual(match.prod_input, [self.i1])
+        self.assertEqual(match.orientation, 1)
+        self.assertEqual(match['i'], self.i1)
+        self.assertEqual(len(match['i_neighbors']), 3)
+        self.assertEqual(snapshot(self.graph), expected)
+
+    def test_apply_match(self):
+        (copy, _) = initial_graph()
+
+        match = P2().match(self.graph, [self.i1], orientation=1)
+        self.assertEqual(P2().apply(self.graph, match), P2().apply(copy, [self.i1], orientation=1))
+        self.assertEqual(snapshot(self.graph), snapshot(copy))
+
+    def test_apply_match_of_other_production(self):
+        match = P9().match(self.graph, [self.i1])
+        with self.assertRaises(ValueError):
+            P2().apply(self.graph, match)
+
+    def test_match_checks_input(self):
+        with self.assertRaises(ValueError):
+            P6().match(self.graph, [self.i1, self.i2])
+
+
+class ApplyManyTest(unittest.TestCase):
+
+    def test_same_as_apply(self):
+        for graph_factory in [Graph, LayeredGraph]:
+            for production in [P9(), P2()]:
+                batched = derive_e(graph_factory())
+                inputs = [[i] for i in get_vertices_from_layer(batched, 7, 'I')]
+                orientations = [k % 3 for k in range(len(inputs))]
+                results = production.apply_many(batched, inputs, orientations)
+
+                expected = derive_e(graph_factory())
+                self.assertEqual(results, [production.apply(expected, prod_input, orientation)
+                                           for prod_input, orientation in zip(inputs, orientations)])
+                self.assertEqual(snapshot(batched), snapshot(expected))
+                for n in expected:
+                    self.assertEqual(list(batched.neighbors(n)), list(expected.neighbors(n)))
+
+    def test_merging_production(self):
+        (batched, [i1, i2]) = initial_graph()
+        [b3, b2] = P2().apply(batched, [i1], orientation=1)
+        [b4, b1] = P2().apply(batched, [i2], orientation=1)
+        (expected, _) = initial_graph()
+        P2().apply(expected, [i1], orientation=1)
+        P2().apply(expected, [i2], orientation=1)
+
+        self.assertEqual(P6().apply_many(batched, [[i1, i2, b1, b2, b3, b4]]), [[]])
+        P6().apply(expected, [i1, i2, b1, b2, b3, b4])
+        self.assertEqual(snapshot(batched), snapshot(expected))
+
+    def test_conflicting_inputs(self):
+        (graph, [i1, i2]) = initial_graph()
+        expected = snapshot(graph)
+        with self.assertRaises(ValueError):
+            P9().apply_many(graph, [[i1], [i2], [i1]])
+        self.assertEqual(snapshot(graph), expected)
+
+    def test_invalid_input(self):
+        (graph, [i1, i2]) = initial_graph()
+        P2().apply(graph, [i1])
+        expected = snapshot(graph)
+        with self.assertRaises(ValueError):
+            P9().apply_many(graph, [[i2], [i1]])
+        self.assertEqual(snapshot(graph), expected)
+
+    def test_failed_rewrite(self):
+        class FailingP9(P9):
+            def rewrite(self, graph, match):
+                result = super().rewrite(graph, match)
+                if match.prod_input == [i2]:
+                    raise RuntimeError('rewrite failed')
+                return result
+
+        for graph_factory in [LayeredGraph, Graph]:
+            graph = graph_factory()
+            initial_node = gen_name(graph)
+            graph.add_node(initial_node, layer=0, position=(0.5, 0.5), label='E')
+            [i1, i2] = P1().apply(graph, [initial_node])
+            before = snapshot(graph)
+            neighbors = {n: list(graph.neighbors(n)) for n in graph}
+            with self.assertRaises(RuntimeError):
+                FailingP9().apply_many(graph, [[i1], [i2]])
+            self.assertEqual(snapshot(graph), before)
+            self.assertEqual({n: list(graph.neighbors(n)) for n in graph}, neighbors)
+
+    def test_orientations(self):
+        (graph, [i1, i2]) = initial_graph()
+        with self.assertRaises(ValueError):
+            P2().apply_many(graph, [[i1], [i2]], orientations=[0])
@@ -0,0 +1,85 @@
+import unittest
+from unittest import mock
+
+from networkx import Graph
+
+from agh_graphs.derivations.derivation_e import derive_e
+from agh_graphs.layered_graph import LayeredGraph
+from agh_graphs.production import Production
+from agh_graphs.productions.p1 import P1
+from agh_graphs.productions.p2 import P2
+from agh_graphs.productions.p6 import P6
+from agh_graphs.scheduler import Output, Scheduler, Step, apply_wave, apply_wave_in_batches
+from agh_graphs.utils import gen_name
+from tests.test_matching import canonical
+from tests.test_production import snapshot
+
+
+def record_steps(derive):
+    """
+    Returns steps of productions applied by `derive()`, outputs of earlier steps are `Output`s.
+    """
+    steps = []
+    outputs = {}
+    apply = Production.apply
+
+    def recording_apply(production, graph, prod_input, orientation=0, **kwargs):
+        result = apply(production, graph, prod_input, orientation, **kwargs)
+        steps.append(Step(production, [outputs.get(v, v) for v in prod_input], orientation))
+        for index, v in enumerate(result):
+            outputs[v] = Output(len(steps) - 1, index)
+        return result
+
+    with mock.patch.object(Production, 'apply', recording_apply):
+        derive()
+    return steps
+
+
+def initial_graph(graph_factory=Graph):
+    graph = graph_factory()
+    initial_node = gen_name(graph)
+    graph.add_node(initial_node, layer=0, position=(0.5, 0.5), label='E')
+    return graph, initial_node
+
+
+class SchedulerTest(unittest.TestCase):
+
+    def test_dependencies(self):
+        (graph, initial_node) = initial_graph()
+        steps = [
+            Step(P1(), [initial_node]),
+            Step(P2(), [Output(0, 0)], orientation=1),
+            Step(P2(), [Output(0, 1)], orientation=1),
+            Step(P6(), [Output(0, 0), Output(0, 1), Output(2, 1), Output(1, 1), Output(1, 0), Output(2, 0)]),
+        ]
+        scheduler = Scheduler(steps)
+        self.assertEqual(scheduler.dependencies(3), [0, 1, 2])
+        self.assertEqual(scheduler.waves(), [[0], [1, 2], [3]])
+
+        results = scheduler.run(graph)
+        (expected, _) = initial_graph()
+        [a1, a2] = P1().apply(expected, [initial_node])
+        [b3, b2] = P2().apply(expected, [a1], orientation=1)
+        [b4, b1] = P2().apply(expected, [a2], orientation=1)
+        P6().apply(expected, [a1, a2, b1, b2, b3, b4])
+        self.assertEqual(results, [[a1, a2], [b3, b2], [b4, b1], []])
+        self.assertEqual(snapshot(graph), snapshot(expected))
+
+    def test_shared_inputs_keep_order(self):
+        scheduler = Scheduler([Step(P2(), ['a']), Step(P2(), ['b']), Step(P6(), ['a', 'b']), Step(P2(), ['a'])])
+        self.assertEqual(scheduler.waves(), [[0, 1], [2], [3]])
+
+    def test_invalid_output(self):
+        with self.assertRaises(ValueError):
+            Scheduler([Step(P2(), [Output(0, 0)])])
+
+    def test_derivation_e(self):
+        steps = record_steps(derive_e)
+        scheduler = Scheduler(steps)
+        self.assertLess(len(scheduler.waves()), len(steps))
+
+        for graph_factory in [Graph, LayeredGraph]:
+            for execute_wave in [apply_wave, apply_wave_in_batches]:
+                (graph, _) = initial_graph(graph_factory)
+                scheduler.run(graph, execute_wave)
+                self.assertEqual(canonical(graph), canonical(derive_e(graph_factory())))
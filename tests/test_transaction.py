@@ -0,0 +1,98 @@
+import unittest
+
+from networkx import Graph
+
+from agh_graphs.derivations.derivation_e import derive_e
+from agh_graphs.layered_graph import LayeredGraph
+from agh_graphs.productions.p2 import P2
+from agh_graphs.transaction import Transaction
+from agh_graphs.utils import gen_name, get_id_allocator, get_vertices_from_layer, join_overlapping_vertices
+
+
+class FailingProduction(P2):
+    """
+    Applies P2 and P2 on the first child, then fails.
+    """
+
+    def rewrite(self, graph, match):
+        [i1, _] = super().rewrite(graph, match)
+        P2().apply(graph, [i1])
+        raise AssertionError('failed halfway')
+
+
+def snapshot(graph):
+    nodes = {n: dict(data) for n, data in graph.nodes(data=True)}
+    edges = set(frozenset(edge) for edge in graph.edges())
+    # productions depend on the order of neighbors
+    neighbors = {n: list(graph.neighbors(n)) for n in graph}
+    return nodes, edges, neighbors, get_id_allocator(graph).next_id
+
+
+class TransactionTest(unittest.TestCase):
+    def test_rollback(self):
+        for graph in [derive_e(), derive_e(LayeredGraph())]:
+            [i] = get_vertices_from_layer(graph, 7, 'I')[:1]
+            expected = snapshot(graph)
+
+            with self.assertRaises(AssertionError):
+                FailingProduction().apply_in_transaction(graph, [i])
+            self.assertEqual(snapshot(graph), expected)
+
+            [i1, i2] = P2().apply_in_transaction(graph, [i])
+            self.assertEqual(graph.nodes[i]['label'], 'i')
+            self.assertIn(i1, graph)
+            self.assertIn(i2, graph)
+
+    def test_journaled_mutations(self):
+        for graph in [Graph(), LayeredGraph()]:
+            graph.add_node(gen_name(graph), layer=0, position=(0, 0), label='E')
+            graph.add_node(gen_name(graph), layer=0, position=(0, 0), label='E')
+            graph.add_node(gen_name(graph), layer=0, position=(1, 0), label='E')
+            graph.add_edges_from([(0, 2), (1, 2)])
+            expected = snapshot(graph)
+
+            transaction = Transaction(graph)
+            join_overlapping_vertices(transaction, 0, 1, 0)
+            transaction.nodes[0]['label'] = 'e'
+            transaction.nodes[2]['custom'] = 1
+            transaction.add_node(gen_name(transaction), layer=1, position=(0, 0), label='I')
+            self.assertNotIn(1, graph)
+            self.assertEqual(graph.nodes[0]['label'], 'e')
+
+            transaction.rollback()
+            self.assertEqual(snapshot(graph), expected)
+
+            transaction.nodes[0]['label'] = 'e'
+            transaction.commit()
+            transaction.rollback()
+            self.assertEqual(graph.nodes[0]['label'], 'e')
+            self.assertEqual(transaction.journal, [])
+
+    def test_order_of_neighbors(self):
+        for graph in [Graph(), LayeredGraph()]:
+            for n in 'abcde':
+                graph.add_node(n, layer=0, position=(0, 0), label='E')
+            graph.add_edges_from([('a', 'b'), ('a', 'c'), ('a', 'd'), ('b', 'e'), ('e', 'c')])
+            expected = snapshot(graph)
+
+            transaction = Transaction(graph)
+            transaction.remove_node('b')
+            transaction.remove_edge('a', 'c')
+            transaction.rollback()
+            self.assertEqual(list(graph.neighbors('a')), ['b', 'c', 'd'])
+            self.assertEqual(list(graph.neighbors('e')), ['b', 'c'])
+            self.assertEqual(snapshot(graph), expected)
+
+    def test_nested(self):
+        for graph in [derive_e(), derive_e(LayeredGraph())]:
+            expected = snapshot(graph)
+            [i] = get_vertices_from_layer(graph, 7, 'I')[:1]
+
+            with self.assertRaises(RuntimeError):
+                with Transaction(graph) as outer:
+                    [i1, _] = P2().apply(outer, [i])
+                    with self.assertRaises(AssertionError):
+                        FailingProduction().apply_in_transaction(outer, [i1])
+                    self.assertEqual(outer.nodes[i1]['label'], 'I')
+                    raise RuntimeError()
+            self.assertEqual(snapshot(graph), expected)
@@ -1,8 +1,18 @@
+import itertools
+import random
 import unittest
 
 from networkx import Graph
 
-from agh_graphs.utils import sort_segments_by_angle, angle_with_x_axis
+from agh_graphs.derivations.derivation_e import derive_e
+from agh_graphs.exact import float_position, is_exact
+from agh_graphs.layered_graph import LayeredGraph
+from agh_graphs.productions.p2 import P2
+from agh_graphs.utils import sort_segments_by_angle, angle_with_x_axis, gen_name, get_id_allocator, \
+    find_overlapping_vertices, is_close, use_exact_positions, get_correspondence, get_vertex_above, get_node_at, \
+    get_vertices_from_layer, get_vertex_between, get_midpoint_vertex, add_break_in_segment, add_interior, \
+    get_triangle_geometry, triangle_geometry, join_overlapping_vertices, join_vertices, get_midpoints, copy_graph, \
+    NodeNames
 
 
 class UtilsTest(unittest.TestCase):
@@ -33,3 +43,203 @@ class UtilsTest(unittest.TestCase):
         self.assertEqual(('b', 'a'), sorted_segments[0])
         self.assertEqual(('a', 'c'), sorted_segments[1])
         self.assertEqual(('b', 'c'), sorted_segments[2])
+
+    def test_gen_name(self):
+        graph = Graph()
+        self.assertEqual(gen_name(graph), 0)
+        self.assertEqual(gen_name(graph), 1)
+
+        graph.add_node(2)
+        graph.add_node(3)
+        self.assertEqual(gen_name(graph), 4)
+
+        self.assertEqual(gen_name(Graph()), 0)
+        self.assertIsInstance(gen_name(), str)
+
+    def test_node_names(self):
+        for graph_factory in [Graph, LayeredGraph]:
+            graph = graph_factory()
+            names = NodeNames(graph)
+            node = gen_name(graph)
+            self.assertEqual(len(names), 0)
+            with self.assertRaises(KeyError):
+                _ = names[node]
+
+            graph.add_node(node)
+            graph.add_node(gen_name(graph))
+            self.assertEqual(dict(names), {0: '0', 1: '1'})
+            self.assertNotIn(2, names)
+            graph.remove_node(node)
+            self.assertEqual(list(names), [1])
+            self.assertEqual(dict(NodeNames(copy_graph(graph))), {1: '1'})
+
+    def test_copy_graph(self):
+        for graph_factory in [Graph, LayeredGraph]:
+            graph = derive_e(graph_factory())
+            next_id = get_id_allocator(graph).next_id
+            correspondence = dict(get_correspondence(graph).entries)
+            midpoints = dict(get_midpoints(graph).entries)
+            geometry = dict(graph.graph['geometry'])
+
+            copies = [copy_graph(graph)]
+            if graph_factory is LayeredGraph:
+                copies.append(graph.copy())
+            for copy in copies:
+                i = get_vertices_from_layer(copy, 7, 'I')[0]
+                P2().apply(copy, [i])
+                self.assertEqual(get_id_allocator(copy).next_id, next_id + 6)
+                self.assertEqual(get_id_allocator(graph).next_id, next_id)
+                self.assertEqual(get_correspondence(graph).entries, correspondence)
+                self.assertEqual(get_midpoints(graph).entries, midpoints)
+                self.assertEqual(graph.graph['geometry'], geometry)
+                self.assertNotIn(i, get_vertices_from_layer(graph, 7, 'i'))
+
+    def test_derivation_is_reproducible(self):
+        graph1 = derive_e()
+        graph2 = derive_e()
+
+        self.assertEqual(dict(graph1.nodes(data=True)), dict(graph2.nodes(data=True)))
+        self.assertEqual(set(graph1.edges()), set(graph2.edges()))
+
+    def test_get_vertex_above(self):
+        graph = derive_e()
+        entries = get_correspondence(graph).entries
+        self.assertTrue(entries)
+        for layer in range(2, 8):
+            for v in get_vertices_from_layer(graph, layer, 'E'):
+                expected = get_node_at(graph, layer - 1, graph.nodes[v]['position'])
+                self.assertEqual(get_vertex_above(graph, v), expected)
+
+        # entries of removed vertices are ignored
+        (v, (position, above)) = next((v, entry) for v, entry in entries.items() if entry[1] is not None)
+        graph.remove_node(above)
+        self.assertIsNone(get_vertex_above(graph, v))
+
+    def test_get_vertex_between(self):
+        graph = derive_e()
+        pairs = [tuple(edge) for edge in graph.graph['midpoints'].entries if all(v in graph for v in edge)]
+        recorded = [get_midpoint_vertex(graph, v1, v2) for v1, v2 in pairs]
+        self.assertTrue(any(recorded))
+
+        midpoints = graph.graph.pop('midpoints')
+        expected = [get_vertex_between(graph, v1, v2) for v1, v2 in pairs]
+        graph.graph['midpoints'] = midpoints
+        self.assertEqual([get_vertex_between(graph, v1, v2) for v1, v2 in pairs], expected)
+        for v, expected_v in zip(recorded, expected):
+            if v is not None:
+                self.assertEqual(v, expected_v)
+
+    def test_add_break_in_segment(self):
+        graph = Graph()
+        graph.add_node('a', layer=1, position=(0.0, 0.0), label='E')
+        graph.add_node('b', layer=1, position=(1.0, 0.0), label='E')
+        graph.add_edge('a', 'b')
+        v = add_break_in_segment(graph, ('a', 'b'))
+
+        self.assertEqual(get_midpoint_vertex(graph, 'b', 'a'), v)
+        self.assertEqual(get_vertex_between(graph, 'a', 'b', 1, 'E'), v)
+        graph.remove_edge('a', v)
+        self.assertIsNone(get_midpoint_vertex(graph, 'a', 'b'))
+
+    def test_join_vertices(self):
+        graph = Graph()
+        for v, position in [('a', (0.0, 0.0)), ('m', (1.0, 0.0)), ('b', (2.0, 0.0)),
+                            ('a2', (0.0, 0.0)), ('m2', (1.0, 0.0)), ('b2', (2.0, 0.0)),
+                            ('a3', (0.0, 0.0)), ('c', (1.0, 1.0)), ('far', (5.0, 5.0))]:
+            graph.add_node(v, layer=1, position=position, label='E')
+        graph.add_edges_from([('a', 'm'), ('m', 'b'), ('a2', 'm2'), ('m2', 'b2'), ('a3', 'c')])
+        get_midpoints(graph).add('a', 'b', 'm')
+        get_midpoints(graph).add('a2', 'b2', 'm2')
+
+        # a2 and a3 are chained, far is not overlapping
+        joined = join_vertices(graph, [('a', 'a2'), ('a2', 'a3'), ('b', 'b2'), ('m2', 'm'), ('a', 'far')], 1)
+        self.assertEqual(joined, {'a2': 'a', 'a3': 'a', 'b2': 'b', 'm': 'm2'})
+        self.assertEqual(set(graph.nodes), {'a', 'm2', 'b', 'c', 'far'})
+        self.assertEqual(set(graph.neighbors('a')), {'m2', 'c'})
+        self.assertEqual(set(graph.neighbors('m2')), {'a', 'b'})
+        self.assertEqual(get_midpoint_vertex(graph, 'a', 'b'), 'm2')
+
+    def test_triangle_geometry(self):
+        geometry = triangle_geometry(['a', 'b', 'c'], [(0.0, 0.0), (2.0, 2.0), (2.0, 0.0)])
+        self.assertEqual(geometry.squared_lengths, (8.0, 4.0, 4.0))
+        self.assertEqual(geometry.longest, 0)
+        self.assertEqual(geometry.edge(*'ca'), 2)
+        self.assertEqual(geometry.edge(*'ac'), 2)
+        # edges c-a, a-b and b-c at 0, 45 and 90 degrees
+        self.assertEqual(geometry.edge_ranks, (2, 0, 1))
+        self.assertEqual(set(geometry.ccw), {'a', 'b', 'c'})
+
+    def test_get_triangle_geometry(self):
+        graph = Graph()
+        for v, position in [('a', (0.0, 0.0)), ('b', (2.0, 2.0)), ('c', (2.0, 0.0)), ('d', (2.0, 0.0))]:
+            graph.add_node(v, layer=1, position=position, label='E')
+        graph.add_edges_from([('a', 'b'), ('b', 'c'), ('c', 'a')])
+        interior = add_interior(graph, 'a', 'b', 'c')
+
+        geometry = get_triangle_geometry(graph, interior)
+        self.assertEqual(geometry, triangle_geometry('abc', [(0.0, 0.0), (2.0, 2.0), (2.0, 0.0)]))
+        self.assertIs(get_triangle_geometry(graph, interior), geometry)
+
+        # joined corners are renamed
+        graph.add_edge('d', interior)
+        join_overlapping_vertices(graph, 'd', 'c', 1)
+        self.assertEqual(get_triangle_geometry(graph, interior), triangle_geometry('abd', geometry.positions))
+
+        # moved corners are computed again
+        graph.nodes['b']['position'] = (0.0, 2.0)
+        self.assertEqual(get_triangle_geometry(graph, interior).longest, 1)
+
+    def test_find_overlapping_vertices(self):
+        graph = Graph()
+        graph.add_node('a', layer=1, position=(0.5, 0.5), label='E')
+        graph.add_node('b', layer=1, position=(0.5, 0.5), label='E')
+        graph.add_node('c', layer=1, position=(0.1 + 0.2, 1), label='E')
+        graph.add_node('d', layer=1, position=(0.3, 1), label='E')
+        graph.add_node('e', layer=2, position=(0.5, 0.5), label='E')
+        graph.add_node('f', layer=2, position=(0.5, 0.6), label='E')
+
+        self.assertEqual(sorted(find_overlapping_vertices(graph)), [('a', 'b'), ('c', 'd')])
+        self.assertEqual(find_overlapping_vertices(graph, 2), [])
+        self.assertEqual(find_overlapping_vertices(graph, nodes=['a', 'b', 'c']), [('a', 'b')])
+        self.assertEqual(find_overlapping_vertices(graph, 3), [])
+
+    def test_find_overlapping_vertices_same_as_brute_force(self):
+        rng = random.Random(0)
+        graph = Graph()
+        for n in range(500):
+            position = (rng.randint(-5, 5) * 1000.0, rng.randint(-5, 5) / 1000)
+            if rng.random() < 0.5:
+                position = (position[0] * (1 + 1e-10), position[1] + 1e-15)
+            graph.add_node(n, layer=rng.randint(0, 1), position=position, label='E')
+
+        expected = set()
+        for (a, a_data), (b, b_data) in itertools.combinations(graph.nodes(data=True), 2):
+            if a_data['layer'] == b_data['layer'] and is_close(a_data['position'], b_data['position']):
+                expected.add(frozenset((a, b)))
+
+        actual = find_overlapping_vertices(graph)
+        self.assertEqual(len(actual), len(expected))
+        self.assertEqual(set(frozenset(pair) for pair in actual), expected)
+
+    def test_exact_positions(self):
+        graph = Graph()
+        use_exact_positions(graph)
+        derive_e(graph)
+        expected = derive_e()
+
+        self.assertEqual(set(graph.nodes()), set(expected.nodes()))
+        self.assertEqual(set(graph.edges()), set(expected.edges()))
+        for n, position in graph.nodes(data='position'):
+            if graph.nodes[n]['layer'] > 0:
+                self.assertTrue(is_exact(position[0]) and is_exact(position[1]))
+            self.assertTrue(is_close(float_position(position), expected.nodes[n]['position']))
+
+    def test_find_overlapping_exact_vertices(self):
+        graph = Graph()
+        graph.add_node('a', layer=1, position=(0.5, 0.5), label='E')
+        graph.add_node('b', layer=1, position=(0.5, 0.5 + 1e-12), label='E')
+        graph.add_node('c', layer=1, position=(0.5, 0.5), label='E')
+        graph.add_node('d', layer=2, position=(0.5, 0.5), label='E')
+        use_exact_positions(graph)
+
+        self.assertEqual(find_overlapping_vertices(graph), [('a', 'c')])